@@ -0,0 +1,197 @@
+"""
+An array-backed Agenda.
+
+ArrayAgenda keeps the begin and end of its appointments in two int64 NumPy
+arrays (seconds since 1970-01-01, naive local time, the clock Appt keeps in minutes)
+so union, complement, intersection and duration filtering run as a few
+batched array operations instead of a Python loop over Appt objects.
+Descriptions and statuses ride along in object arrays so an Agenda can make
+the round trip Agenda -> ArrayAgenda -> Agenda without losing anything.
+"""
+import numpy as np
+
+from Model.CalendarEvent import Appt, Agenda, FREE
+
+
+class ArrayAgenda:
+    """A set of appointments as parallel arrays: begin, end, desc, status."""
+
+    def __init__(self, begin=(), end=(), desc=None, status=None):
+        """
+        Args:
+            begin, end: sequences of int seconds since EPOCH, same length
+            desc: optional sequence of descriptions (default "")
+            status: optional sequence of statuses (default FREE)
+        """
+        self.begin = np.asarray(begin, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        if self.begin.shape != self.end.shape:
+            raise ValueError("begin and end must have the same length")
+        n = len(self.begin)
+        self.desc = _objects(desc, n, "")
+        self.status = _objects(status, n, FREE)
+
+    @classmethod
+    def from_agenda(cls, agenda):
+        """Factory: copy the appointments of an Agenda (or any iterable of Appt)"""
+        appts = list(agenda)
+        return cls([appt.begin_min * 60 for appt in appts],
+                   [appt.end_min * 60 for appt in appts],
+                   [appt.desc for appt in appts],
+                   [appt.status for appt in appts])
+
+    @classmethod
+    def daily(cls, freeblock, days):
+        """
+        Factory: the window of freeblock (an Appt) repeated on `days`
+        consecutive days, starting at freeblock's day.
+        """
+        day = 24 * 60 * 60
+        shift = np.arange(days, dtype=np.int64) * day
+        return cls(freeblock.begin_min * 60 + shift,
+                   freeblock.end_min * 60 + shift,
+                   [freeblock.desc] * days,
+                   [freeblock.status] * days)
+
+    def to_agenda(self):
+        """
+        Build an Agenda of Appt objects. Every appointment must begin
+        and end on the same day, as Appt requires; times are truncated
+        to Appt's whole minutes.
+        """
+        agenda = Agenda()
+        for begin, end, desc, status in zip((self.begin // 60).tolist(), (self.end // 60).tolist(),
+                                            self.desc, self.status):
+            agenda.append(Appt.from_minutes(begin, end, desc, status))
+        return agenda
+
+    def __len__(self):
+        """Number of appointments"""
+        return len(self.begin)
+
+    def _take(self, index):
+        """A new ArrayAgenda of the appointments selected by index (mask or indices)"""
+        return ArrayAgenda(self.begin[index], self.end[index],
+                           self.desc[index], self.status[index])
+
+    def sorted(self):
+        """A copy in order of begin time (stable)"""
+        return self._take(np.argsort(self.begin, kind="stable"))
+
+    def union(self, other=None, desc=None):
+        """
+        Merge overlapping appointments (of this agenda and other, if given),
+        like Agenda.normalize: the result is sorted with no overlaps.
+        Appointments that only touch are kept apart, as in Agenda.normalize.
+        Args:
+            other: another ArrayAgenda to merge in
+            desc: description of every result appointment; by default
+                merged appointments join their descriptions with a blank.
+        """
+        agenda = self if other is None else self.concat(other)
+        if len(agenda) == 0:
+            return ArrayAgenda()
+        agenda = agenda.sorted()
+        reach = np.maximum.accumulate(agenda.end)
+        # a new group starts where the appointment begins at or after
+        # every end seen so far
+        starts = np.empty(len(agenda), dtype=bool)
+        starts[0] = True
+        starts[1:] = agenda.begin[1:] >= reach[:-1]
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:], len(agenda)) - 1
+        begin = agenda.begin[first]
+        end = reach[last]
+        if desc is not None:
+            descs = [desc] * len(first)
+        else:
+            descs = [" ".join(group) for group in np.split(agenda.desc, first[1:])]
+        return ArrayAgenda(begin, end, descs, agenda.status[first])
+
+    normalized = union
+
+    def concat(self, other):
+        """All appointments of both agendas, unsorted"""
+        return ArrayAgenda(np.concatenate([self.begin, other.begin]),
+                           np.concatenate([self.end, other.end]),
+                           np.concatenate([self.desc, other.desc]),
+                           np.concatenate([self.status, other.status]))
+
+    def complement(self, freeblock):
+        """
+        The times within freeblock (an Appt) not covered by this agenda,
+        like Agenda.complement. Result appointments take desc and status
+        from freeblock.
+        """
+        return self.complement_window(freeblock.begin_min * 60, freeblock.end_min * 60,
+                                      freeblock.desc, freeblock.status)
+
+    def complement_window(self, window_begin, window_end, desc="", status=FREE):
+        """
+        The times within [window_begin, window_end) (int seconds) not
+        covered by this agenda.
+        """
+        merged = self.union(desc="")
+        begin = np.clip(merged.begin, window_begin, window_end)
+        end = np.clip(merged.end, window_begin, window_end)
+        gap_begin = np.concatenate([[window_begin], end])
+        gap_end = np.concatenate([begin, [window_end]])
+        keep = gap_end > gap_begin
+        count = int(keep.sum())
+        return ArrayAgenda(gap_begin[keep], gap_end[keep], [desc] * count, [status] * count)
+
+    def complement_daily(self, windows):
+        """
+        The times within each appointment of windows (an ArrayAgenda,
+        e.g. from ArrayAgenda.daily) not covered by this agenda.
+        """
+        if len(windows) == 0:
+            return ArrayAgenda()
+        windows = windows.sorted()
+        if len(self) == 0:
+            return windows
+        span_begin = min(int(windows.begin[0]), int(self.begin.min()))
+        span_end = max(int(windows.end.max()), int(self.end.max()))
+        gaps = self.complement_window(span_begin, span_end)
+        return windows.intersect(gaps)
+
+    def intersect(self, other, desc=None):
+        """
+        The periods in common between this agenda and other, like
+        Agenda.intersect. Both agendas must be normalized (sorted,
+        no overlaps). Descriptions and statuses come from this agenda
+        unless desc is given.
+        """
+        # for each of our appointments, the run of other's appointments
+        # overlapping it: ending after it begins, beginning before it ends
+        lo = np.searchsorted(other.end, self.begin, side="right")
+        hi = np.searchsorted(other.begin, self.end, side="left")
+        counts = np.maximum(hi - lo, 0)
+        mine = np.repeat(np.arange(len(self)), counts)
+        # index into other: lo of each run, plus the position within the run
+        run_start = np.repeat(np.cumsum(counts) - counts, counts)
+        theirs = np.repeat(lo, counts) + (np.arange(len(mine)) - run_start)
+        begin = np.maximum(self.begin[mine], other.begin[theirs])
+        end = np.minimum(self.end[mine], other.end[theirs])
+        keep = end > begin
+        descs = self.desc[mine][keep] if desc is None else [desc] * int(keep.sum())
+        return ArrayAgenda(begin[keep], end[keep], descs, self.status[mine][keep])
+
+    def at_least(self, seconds):
+        """Only the appointments lasting at least `seconds`"""
+        return self._take((self.end - self.begin) >= seconds)
+
+    def __eq__(self, other):
+        """Equality, ignoring descriptions --- just equal blocks of time"""
+        return (np.array_equal(self.begin, other.begin) and
+                np.array_equal(self.end, other.end))
+
+
+def _objects(values, n, default):
+    """An object array of n values, or of n defaults"""
+    array = np.empty(n, dtype=object)
+    if values is None:
+        array[:] = default
+    else:
+        array[:] = list(values)
+    return array
@@ -1,14 +1,66 @@
 """
 A class for time chunk on google calendar
 Credits: agenda.py from Professor Young
+
+Times are kept as integer minutes since 1970-01-01 (naive local time,
+"epoch minutes") in __slots__ records, so an event costs a couple of small
+ints instead of several strings or datetime objects.
 """
 import datetime
+import sys
 
 BUSY = "BUSY"
 FREE = "FREE"
 
+EPOCH = datetime.datetime(1970, 1, 1)
+MINUTE = datetime.timedelta(minutes=1)
+DAY_MINUTES = 24 * 60
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def to_minutes(dt):
+    """naive datetime -> epoch minutes"""
+    return (dt - EPOCH) // MINUTE
+
+
+def from_minutes(minutes):
+    """epoch minutes -> naive datetime"""
+    return EPOCH + datetime.timedelta(minutes=minutes)
+
+
+def date_to_minutes(date):
+    """
+    date string -> epoch minutes of its midnight
+    Example for date: "2014-01-01" (or "2014/01/01")
+    """
+    year, month, day = date.replace("/", "-").split("-")
+    days = datetime.date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+    return days * DAY_MINUTES
+
+
+def split_time(time):
+    """
+    time string -> (minutes since midnight, utc offset string)
+    Example: "14:30:00-08:00" -> (870, "-08:00")
+    """
+    fields = time.split(":", 2)
+    minutes = int(fields[0]) * 60 + int(fields[1][:2])
+    if len(fields) == 3:
+        # seconds, then the offset if any
+        offset = fields[2][2:]
+    else:
+        offset = fields[1][2:]
+    return minutes, sys.intern(offset)
+
+
+def intern_status(status):
+    """Statuses repeat on every event; share one string per value"""
+    return sys.intern(status) if status is not None else None
+
 
 class CalendarEvent(object):
+    __slots__ = ("begin_min", "end_min", "offset", "summary", "description", "id", "status")
+
     def __init__(self, start_time, end_time, date, summary=None, description=None, id=None, status=BUSY):
         """
         Initialization method for CalendarEvent
@@ -21,17 +73,54 @@ class CalendarEvent(object):
             summary: a list, the summary of the event
             status: a string, shows 'busy' or 'free'
             description: a string, the content of the event
-        Note: I use s_time and e_time to represent the time in one day. 
-              If the start/end time is like above, the s/e time will be 14:30:00-08:00
-              I use it to compute one day's event
-        """
-        self.start = start_time
-        self.end = end_time
-        self.date = date
+        Note: start and end are stored as epoch minutes on the event's date
+              (begin_min, end_min) plus the utc offset of the start time;
+              start, end and date give back the strings.
+        """
+        midnight = date_to_minutes(date)
+        start, self.offset = split_time(start_time)
+        end, _ = split_time(end_time)
+        self.begin_min = midnight + start
+        self.end_min = midnight + end
         self.summary = summary
         self.description = description
         self.id = id
-        self.status = status
+        self.status = intern_status(status)
+
+    @classmethod
+    def from_minutes(cls, begin, end, offset="", summary=None, description=None, id=None, status=BUSY):
+        """
+        Factory: an event from epoch minutes, skipping the string parsing
+        """
+        event = cls.__new__(cls)
+        event.begin_min = begin
+        event.end_min = end
+        event.offset = sys.intern(offset)
+        event.summary = summary
+        event.description = description
+        event.id = id
+        event.status = intern_status(status)
+        return event
+
+    def _format_time(self, minutes):
+        """epoch minutes -> "14:30:00-08:00" """
+        minutes = minutes % DAY_MINUTES
+        return "{:02d}:{:02d}:00{}".format(minutes // 60, minutes % 60, self.offset)
+
+    @property
+    def start(self):
+        """start time without date, e.g. "14:30:00-08:00" """
+        return self._format_time(self.begin_min)
+
+    @property
+    def end(self):
+        """end time without date, e.g. "14:30:00-08:00" """
+        return self._format_time(self.end_min)
+
+    @property
+    def date(self):
+        """date of the event, e.g. "2014-01-01" """
+        return from_minutes(self.begin_min).date().isoformat()
 
     def get_start_time(self):
         """
@@ -70,7 +159,7 @@ class CalendarEvent(object):
         Return:
             True if and only if the other is done by the time this event begins
         """
-        return self.end <= other.start
+        return self.end_min <= other.begin_min
 
     def __gt__(self, other):
         """
@@ -78,7 +167,7 @@ class CalendarEvent(object):
         Return:
             True if and only if the other is done before the time this event begins
         """
-        return self.end > other.start
+        return self.end_min > other.begin_min
 
     def overlap(self, other):
         """
@@ -86,39 +175,12 @@ class CalendarEvent(object):
         """
         return not (self < other or other < self)
 
-    # def translator_classToDict(self):
-    #     """
-    #     translate event class object to a list of dictionaries
-    #     Args:
-    #         self: a CalendarEvent object
-    #     return;
-    #         dictionary: a dictionaries, which is a event
-    #     """
-    #     event = {}
-    #     event["id"] = self.id
-    #     event["start_time"] = self.assemble_time(self.start)
-    #     event["end_time"] = self.assemble_time(self.end)
-    #     event["summary"] = self.summary
-    #     event["description"] = self.description
-    #     event["status"] = self.status
-    #     return event
-
     def translator_toAppt(self):
         """
         translate Event to Appt
-        I should re-write all but I don't have time. I have to make an interface
+        Both keep epoch minutes, so this is a copy of two ints
         """
-        hours = self.start.split(":")[0]
-        mins = self.start.split(":")[1]
-        start = datetime.time(int(hours), int(mins))
-        hours = self.end.split(":")[0]
-        mins = self.end.split(":")[1]
-        end = datetime.time(int(hours), int(mins))
-        year, month, day = self.date.split("-")
-        date = datetime.date(int(year), int(month), int(day))
-        status = self.status
-        return Appt(date, start, end, self.description, status)
-
+        return Appt.from_minutes(self.begin_min, self.end_min, self.description, self.status)
 
     def union(self, other):
         """
@@ -128,9 +190,9 @@ class CalendarEvent(object):
         Return:
             return a new unioned event
         """
-        new_start = min(self.start, other.start)
-        new_end = max(self.end, other.end)
-        return CalendarEvent(new_start, new_end, self.date)
+        new_start = min(self.begin_min, other.begin_min)
+        new_end = max(self.end_min, other.end_min)
+        return CalendarEvent.from_minutes(new_start, new_end, self.offset)
 
 
 # Class Agenda is from agenda.py whose author is Professor Young
@@ -138,14 +200,18 @@ class CalendarEvent(object):
 # so I decieded to use professor's one but revised some codes to complete my project
 # Link here: https://piazza.com/class_profile/get_resource/ihjisylll7y4az/ihjiszn8gh24ch from the prevsious piazza 322 "resource" section.
 import datetime
+import heapq
 
 class Appt:
 
     """
     A single appointment, starting on a particular
     date and time, and ending at a later time the same day.
+    Begin and end are held as epoch minutes (begin_min, end_min);
+    the begin and end properties give them back as datetimes.
     """
-    
+    __slots__ = ("begin_min", "end_min", "desc", "status")
+
     def __init__(self, day, begin, end, desc, status=FREE):
         """Create an appointment on date
         from begin time to end time.
@@ -166,14 +232,42 @@ class Appt:
                 datetime.time(17,45))
             (December 1 from 4:30pm to 5:45pm)
         """
-        self.begin = datetime.datetime.combine(day, begin)
-        self.end = datetime.datetime.combine(day, end)
-        self.status = status
+        midnight = (day.toordinal() - EPOCH_ORDINAL) * DAY_MINUTES
+        self.begin_min = midnight + begin.hour * 60 + begin.minute
+        self.end_min = midnight + end.hour * 60 + end.minute
+        self.status = intern_status(status)
         if begin >= end :
             raise ValueError("Appointment end must be after begin")
         self.desc = desc
         return
 
+    @classmethod
+    def from_minutes(cls, begin, end, desc, status=FREE):
+        """Factory: an appointment from epoch minutes, which must
+        be on the same day with begin before end.
+
+        Raises:
+            ValueError if appointment ends before it begins
+        """
+        if begin >= end or end - begin // DAY_MINUTES * DAY_MINUTES > DAY_MINUTES:
+            raise ValueError("Appointment end must be after begin")
+        appt = cls.__new__(cls)
+        appt.begin_min = begin
+        appt.end_min = end
+        appt.desc = desc
+        appt.status = intern_status(status)
+        return appt
+
+    @property
+    def begin(self):
+        """A datetime.datetime, when the appointment starts"""
+        return from_minutes(self.begin_min)
+
+    @property
+    def end(self):
+        """A datetime.datetime, when the appointment ends"""
+        return from_minutes(self.end_min)
+
     @classmethod
     def from_string(cls, txt):
         """Factory parses a string to create an Appt"""
@@ -212,7 +306,7 @@ class Appt:
         Returns: 
         	True iff this Appt is done by the time other begins.
         """
-        return self.end <= other.begin
+        return self.end_min <= other.begin_min
         
     def __gt__(self, other):
         """Does other appointment finish before this begins?
@@ -274,9 +368,9 @@ class Appt:
         # We know the day must be the same. 
         # Find overlap of times: 
         #   Later of two begin times, earlier of two end times
-        begin_time = max(self.begin.time(), other.begin.time())
-        end_time = min(self.end.time(), other.end.time())
-        return Appt(self.begin.date(), begin_time, end_time, desc)
+        begin = max(self.begin_min, other.begin_min)
+        end = min(self.end_min, other.end_min)
+        return Appt.from_minutes(begin, end, desc)
 
     def union(self, other, desc=""):
         """Return an appointment representing the combined period in
@@ -299,9 +393,9 @@ class Appt:
         # We know the day must be the same. 
         # Find overlap of times: 
         #   Earlier of two begin times, later of two end times
-        begin = min(self.begin, other.begin)
-        end = max(self.end, other.end)
-        return Appt(self.begin.date(), begin.time(), end.time(), desc)
+        begin = min(self.begin_min, other.begin_min)
+        end = max(self.end_min, other.end_min)
+        return Appt.from_minutes(begin, end, desc)
 
 class Agenda:
     """An Agenda is essentially a list of appointments,
@@ -368,6 +462,8 @@ class Agenda:
            desc:  If provided, this string becomes the title of
                 all the appointments in the result.
         """
+        if self.is_normalized() and other.is_normalized():
+            return self.merge_intersect(other, desc)
         default_desc = (desc == "")
         result = Agenda()
         for thisappt in self.appts:
@@ -379,6 +475,85 @@ class Agenda:
         
         return result
 
+    def merge_intersect(self, other, desc=""):
+        """Like intersect, but walks both agendas once with two
+        pointers instead of comparing every pair of appointments.
+        Requires both agendas to be normalized (see is_normalized).
+
+        Arguments:
+           other: Another normalized Agenda
+           desc:  If provided, this string becomes the title of
+                all the appointments in the result.
+        """
+        result = Agenda()
+        mine = self.appts
+        theirs = other.appts
+        i = 0
+        j = 0
+        while i < len(mine) and j < len(theirs):
+            thisappt = mine[i]
+            otherappt = theirs[j]
+            if thisappt.overlaps(otherappt):
+                result.append(thisappt.intersect(otherappt, desc))
+            # drop whichever appointment finishes first; it can't
+            # overlap anything later in the other agenda
+            if thisappt.end_min <= otherappt.end_min:
+                i += 1
+            else:
+                j += 1
+        return result
+
+    @classmethod
+    def intersect_all(cls, agendas, desc=""):
+        """Return a new agenda of the times covered by every one of
+        the given normalized agendas.  All agendas are swept at once
+        through a heap of their begin and end times, so the cost is
+        O(n log k) for n appointments in k agendas.
+
+        Arguments:
+           agendas: A list of normalized Agendas
+           desc:  If provided, this string becomes the title of
+                all the appointments in the result.  Otherwise titles
+                are taken from the first agenda.
+        """
+        result = cls()
+        if len(agendas) == 0:
+            return result
+
+        def boundaries(index, agenda):
+            # ends sort before begins at the same time, so appointments
+            # that only touch never count as overlapping
+            for appt in agenda.appts:
+                yield (appt.begin_min, 1, index, appt)
+                yield (appt.end_min, 0, index, appt)
+
+        streams = [boundaries(index, agenda) for index, agenda in enumerate(agendas)]
+        active = 0
+        begin = None
+        first = None
+        for time, is_begin, index, appt in heapq.merge(*streams, key=lambda b: b[:3]):
+            if index == 0:
+                first = appt
+            if is_begin:
+                active += 1
+                if active == len(agendas):
+                    begin = time
+            else:
+                if active == len(agendas) and begin < time:
+                    title = desc if desc != "" else first.desc
+                    result.append(Appt.from_minutes(begin, time, title))
+                active -= 1
+        return result
+
+    def is_normalized(self):
+        """Is this agenda in order by begin time, with no
+        overlapping appointments (as normalize leaves it)?
+        """
+        for i in range(1, len(self.appts)):
+            if not (self.appts[i - 1] < self.appts[i]):
+                return False
+        return True
+
     def normalize(self):
         """Merge overlapping events in an agenda. For example, if 
         the first appointment is from 1pm to 3pm, and the second is
@@ -390,7 +565,7 @@ class Agenda:
         if len(self.appts) == 0:
             return
 
-        ordering = lambda ap: ap.begin
+        ordering = lambda ap: ap.begin_min
         self.appts.sort(key=ordering)
 
         normalized = [ ]
@@ -443,24 +618,23 @@ class Agenda:
         """
         copy = self.normalized()
         comp = Agenda()
-        day = freeblock.begin.date()
         desc = freeblock.desc
-        cur_time = freeblock.begin
+        cur_time = freeblock.begin_min
         for appt in copy.appts:
             if appt < freeblock:
                 continue
             if appt > freeblock:
-                if cur_time < freeblock.end:
-                    comp.append(Appt(day,cur_time.time(),freeblock.end.time(), desc))
-                    cur_time = freeblock.end
+                if cur_time < freeblock.end_min:
+                    comp.append(Appt.from_minutes(cur_time, freeblock.end_min, desc))
+                    cur_time = freeblock.end_min
                 break
-            if cur_time < appt.begin:
+            if cur_time < appt.begin_min:
                 # print("Creating free time from", cur_time, "to", appt.begin)
-                comp.append(Appt(day, cur_time.time(), appt.begin.time(), desc))
-            cur_time = max(appt.end,cur_time)
-        if cur_time < freeblock.end:
+                comp.append(Appt.from_minutes(cur_time, appt.begin_min, desc))
+            cur_time = max(appt.end_min,cur_time)
+        if cur_time < freeblock.end_min:
             # print("Creating final free time from", cur_time, "to", freeblock.end)
-            comp.append(Appt(day, cur_time.time(), freeblock.end.time(), desc))
+            comp.append(Appt.from_minutes(cur_time, freeblock.end_min, desc))
         return comp
 
 
@@ -487,8 +661,8 @@ class Agenda:
         for i in range(len(self.appts)):
             mine = self.appts[i]
             theirs = other.appts[i]
-            if not (mine.begin == theirs.begin and
-                    mine.end == theirs.end):
+            if not (mine.begin_min == theirs.begin_min and
+                    mine.end_min == theirs.end_min):
                 return False
         return True
 
@@ -0,0 +1,120 @@
+"""
+Logging that costs nothing when it is off.
+
+The level comes from the configuration (LOG_LEVEL) rather than being
+fixed at DEBUG. Log calls pass their arguments separately
+("%s events", count), so nothing is formatted unless the record is
+written, and big payloads (event lists and the like) are logged as
+Summary(payload): counts and sizes, worked out only when written.
+
+Trace sampling: with TRACE_SAMPLE > 0, that fraction of requests log
+everything down to DEBUG whatever the level, each record tagged with the
+request's trace id, so the detail of a few requests is there without
+every request paying for it. Which request is traced is kept per
+thread, set by begin_request.
+"""
+import contextlib
+import logging
+import random
+import threading
+import uuid
+
+FORMAT = "%(levelname)s:%(name)s:%(trace)s: %(message)s"
+LONG_TEXT = 80
+
+_local = threading.local()
+
+
+def describe(payload):
+    """A short description of payload: its size rather than its contents"""
+    if isinstance(payload, dict):
+        return "dict of {} keys".format(len(payload))
+    if isinstance(payload, (list, tuple)):
+        if not payload:
+            return "empty {}".format(type(payload).__name__)
+        if all(isinstance(item, (list, tuple)) for item in payload):
+            return "{} lists of {} items in all".format(
+                len(payload), sum(len(item) for item in payload))
+        return "{} {} of {}".format(len(payload), type(payload).__name__,
+                                    type(payload[0]).__name__)
+    text = str(payload)
+    if len(text) > LONG_TEXT:
+        return "{}... ({} chars)".format(text[:LONG_TEXT], len(text))
+    return text
+
+
+class Summary:
+    """A log argument that describes payload, when (and only if) it is written"""
+    __slots__ = ("payload",)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return describe(self.payload)
+
+
+class TraceFilter(logging.Filter):
+    """
+    Tags records with the current trace id, and passes those at the
+    configured level or above, or of a traced request.
+    """
+
+    def __init__(self, level):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record):
+        trace = current()
+        record.trace = trace or "-"
+        return record.levelno >= self.level or trace is not None
+
+
+def configure(logger, level="INFO", sample=0.0):
+    """
+    Set up logger (the app's).
+    Args:
+        level: a level name ("DEBUG", "INFO", ...) or number
+        sample: fraction of requests traced at DEBUG (0 for none)
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            raise ValueError("Unknown log level {}".format(level))
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(FORMAT))
+    handler.addFilter(TraceFilter(level))
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    # below the level only records of traced requests get through, so the
+    # logger itself only lets debug records be made when tracing is on
+    logger.setLevel(logging.DEBUG if sample > 0 else level)
+
+
+def begin_request(sample):
+    """Decide whether the calling thread's new request is traced"""
+    if sample > 0 and random.random() < sample:
+        _local.trace = uuid.uuid4().hex[:8]
+    else:
+        _local.trace = None
+    return _local.trace
+
+
+def end_request():
+    _local.trace = None
+
+
+def current():
+    """The calling thread's trace id, or None"""
+    return getattr(_local, "trace", None)
+
+
+@contextlib.contextmanager
+def bind(trace):
+    """Log as part of trace (may be None) for the block, e.g. in a worker thread"""
+    previous = current()
+    _local.trace = trace
+    try:
+        yield
+    finally:
+        _local.trace = previous
@@ -0,0 +1,135 @@
+"""
+The app on an ASGI server, for the asyncio serving mode.
+
+    uvicorn asgi_main:app --host 127.0.0.1 --port 8000
+
+(from the meetings directory; needs uvicorn and httpx). The routes are
+flask_main's, unchanged. What differs is where the time goes: the
+Calendar calls of every request run on the server's event loop through
+one gcal_async.AsyncCalendar, so a request fetching five calendars makes
+five concurrent calls on shared connections instead of taking five
+threads with an httplib2 service each, and the process serves many
+requests at once with a thread apiece that only waits.
+
+The Flask views run on a pool of ASGI_THREADS threads. (asgiref's
+WsgiToAsgi would run them all on one thread, one request at a time.)
+Response bodies are passed on chunk by chunk, so /api/free still
+streams.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import flask_main
+import gcal_async
+
+CONFIG = flask_main.CONFIG
+
+
+class WsgiBridge:
+    """An ASGI application running a WSGI one on a thread pool."""
+
+    def __init__(self, wsgi_app, threads):
+        self.wsgi_app = wsgi_app
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            body = b""
+            more = True
+            while more:
+                message = await receive()
+                body += message.get("body", b"")
+                more = message.get("more_body", False)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.pool, self.run, scope, body, send, loop)
+
+    async def lifespan(self, receive, send):
+        """Give flask_main its asyncio Calendar client while the server runs"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                calendar = gcal_async.AsyncCalendar(
+                    CONFIG.CALENDAR_API_ROOT or None, CONFIG.ASYNC_CONNECTIONS,
+                    CONFIG.FETCH_WORKERS)
+                flask_main.CALENDAR_CLIENT = gcal_async.BlockingCalendar(
+                    calendar, asyncio.get_running_loop())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                client, flask_main.CALENDAR_CLIENT = flask_main.CALENDAR_CLIENT, None
+                if client is not None:
+                    await client.calendar.aclose()
+                self.pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def run(self, scope, body, send, loop):
+        """Run one request through the WSGI app (on a pool thread)"""
+        response = {}
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                   for name, value in headers]
+
+        def begin():
+            # status and headers go out with the first piece of the body
+            if "sent" not in response:
+                response["sent"] = True
+                emit({"type": "http.response.start", "status": response["status"],
+                      "headers": response["headers"]})
+
+        result = self.wsgi_app(environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    begin()
+                    emit({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        begin()
+        emit({"type": "http.response.body", "body": b""})
+
+
+def environ(scope, body):
+    """The WSGI environ of an ASGI http scope"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    env = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            env["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            env[key] = env[key] + "," + value if key in env else value
+    return env
+
+
+app = WsgiBridge(flask_main.app, CONFIG.ASGI_THREADS)
@@ -0,0 +1,92 @@
+"""
+Memory benchmark: bytes per event for the CalendarEvent + Appt pair
+that /_free builds for every busy event.
+
+"before" rebuilds the old layout (strings on the event, two datetimes
+on the appointment, a __dict__ on both); "after" is the current
+__slots__ / epoch-minute model.
+
+Run from the meetings directory:
+    python bench/bench_memory.py [count]
+"""
+import datetime
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Model.CalendarEvent import CalendarEvent
+
+COUNT = 100000
+
+
+class OldCalendarEvent(object):
+    """The string-holding event, as it was"""
+
+    def __init__(self, start_time, end_time, date, summary=None, description=None, id=None, status="BUSY"):
+        self.start = start_time
+        self.end = end_time
+        self.date = date
+        self.summary = summary
+        self.description = description
+        self.id = id
+        self.status = status
+
+    def translator_toAppt(self):
+        start = datetime.time(int(self.start.split(":")[0]), int(self.start.split(":")[1]))
+        end = datetime.time(int(self.end.split(":")[0]), int(self.end.split(":")[1]))
+        year, month, day = self.date.split("-")
+        date = datetime.date(int(year), int(month), int(day))
+        return OldAppt(date, start, end, self.description, self.status)
+
+
+class OldAppt:
+    """The datetime-holding appointment, as it was"""
+
+    def __init__(self, day, begin, end, desc, status="FREE"):
+        self.begin = datetime.datetime.combine(day, begin)
+        self.end = datetime.datetime.combine(day, end)
+        self.status = status
+        self.desc = desc
+
+
+def event_fields(count):
+    """The strings list_events hands us, built before measuring"""
+    fields = []
+    day = datetime.date(2017, 1, 1)
+    for i in range(count):
+        date = (day + datetime.timedelta(days=i % 365)).isoformat()
+        begin = i % 20
+        start = "{:02d}:00:00-08:00".format(begin)
+        end = "{:02d}:30:00-08:00".format(begin + 1)
+        fields.append((start, end, date, "summary", "description", "event{}".format(i), "BUSY"))
+    return fields
+
+
+def measure(cls, fields):
+    """Bytes per event for building the event and its appointment"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = []
+    for start, end, date, summary, desc, id, status in fields:
+        # status comes off the wire as a fresh string each time
+        event = cls(start, end, date, summary, desc, id, "".join(status))
+        kept.append((event, event.translator_toAppt()))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(fields)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNT
+    fields = event_fields(count)
+    old = measure(OldCalendarEvent, fields)
+    new = measure(CalendarEvent, fields)
+    print("events: {}".format(count))
+    print("before: {:.0f} bytes/event".format(old))
+    print("after:  {:.0f} bytes/event".format(new))
+    print("saved:  {:.0%}".format(1 - new / old))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Transport benchmark: a fresh httplib2.Http per request (the old
+get_gcal_service) against Http objects from HttpPool, on a local HTTPS
+stub server, so the difference is the TCP + TLS handshakes.
+
+Needs the openssl command to make a throwaway certificate.
+
+Run from the meetings directory:
+    python bench/bench_transport.py [requests]
+"""
+import http.server
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import httplib2
+from http_pool import HttpPool
+
+REQUESTS = 300
+BODY = b'{"items": []}'
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tmp):
+    """An HTTPS stub on a free local port; returns (server, url)"""
+    cert = os.path.join(tmp, "cert.pem")
+    key = os.path.join(tmp, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                    "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost"],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "https://localhost:{}/calendar/v3/users/me/calendarList".format(server.server_port)
+
+
+def fresh(url, count):
+    for i in range(count):
+        http = httplib2.Http(disable_ssl_certificate_validation=True)
+        http.request(url)
+
+
+def pooled(pool, url, count):
+    for i in range(count):
+        http = pool.acquire()
+        http.request(url)
+        pool.release(http)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    with tempfile.TemporaryDirectory() as tmp:
+        server, url = start_server(tmp)
+        start = time.perf_counter()
+        fresh(url, count)
+        fresh_time = time.perf_counter() - start
+        pool = HttpPool(disable_ssl_certificate_validation=True)
+        start = time.perf_counter()
+        pooled(pool, url, count)
+        pooled_time = time.perf_counter() - start
+        server.shutdown()
+    print("requests: {}".format(count))
+    print("fresh Http:  {:.2f} ms/request".format(fresh_time / count * 1000))
+    print("pooled Http: {:.2f} ms/request".format(pooled_time / count * 1000))
+    print("pool stats:  {}".format(pool.stats()))
+
+
+if __name__ == "__main__":
+    main()
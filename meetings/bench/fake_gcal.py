@@ -0,0 +1,295 @@
+"""
+A local stand-in for the parts of Google we use, for load tests.
+
+Serves
+    GET  /o/oauth2/auth                        sends the browser straight back with a code
+    POST /token                                trades any code for a fresh access token
+    GET  /calendar/v3/users/me/calendarList    the calendar list
+    GET  /calendar/v3/calendars/<id>/events    events in [timeMin, timeMax), paged
+    POST /calendar/v3/freeBusy                 merged busy periods per calendar
+    GET  /stats                                requests served, by endpoint
+with a configurable delay on the calendar calls. Each calendar has about
+--per-day events every day, made up from a seed the first time a day is
+asked for, so any date range works and the same day always looks the same.
+
+Run from the meetings directory:
+    python bench/fake_gcal.py [--port 8089] [--calendars 5] [--per-day 6]
+                              [--latency 50] [--jitter 20] [--secrets fake_secrets.json]
+then point the app at it, in app.ini:
+    CALENDAR_API_ROOT = http://127.0.0.1:8089/
+    GOOGLE_KEY_FILE = fake_secrets.json
+"""
+import argparse
+import collections
+import datetime
+import functools
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+
+PAGE_SIZE = 250
+DAY = datetime.timedelta(days=1)
+
+
+class FakeCalendar:
+    """The calendars of the one fake user, and request counters."""
+
+    def __init__(self, calendars=5, per_day=6, seed=0, latency=0.0, jitter=0.0):
+        """
+        Args:
+            calendars: how many calendars the user has
+            per_day: events a day in each calendar, on average
+            seed: same seed, same events
+            latency, jitter: seconds each calendar call waits before
+                answering, latency +- jitter
+        """
+        self.ids = ["cal{}@fake.example.com".format(i) for i in range(calendars)]
+        self.per_day = per_day
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+
+    def count(self, endpoint):
+        with self.lock:
+            self.counts[endpoint] += 1
+
+    def wait(self):
+        """Pretend to be far away"""
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def calendar_list(self):
+        return [{"kind": "calendar#calendarListEntry",
+                 "id": calendar_id,
+                 "summary": "Fake calendar {}".format(i),
+                 "selected": True,
+                 "primary": i == 0}
+                for i, calendar_id in enumerate(self.ids)]
+
+    @functools.lru_cache(maxsize=4096)
+    def day_blocks(self, calendar_id, ordinal):
+        """[(begin, end)] minutes after midnight of one calendar's day, sorted"""
+        rand = random.Random("{}/{}/{}".format(self.seed, calendar_id, ordinal))
+        count = sum(1 for i in range(self.per_day * 2) if rand.random() < 0.5)
+        blocks = []
+        for i in range(count):
+            begin = rand.randrange(7 * 60, 19 * 60)
+            blocks.append((begin, min(begin + rand.randrange(15, 121), 24 * 60 - 1)))
+        return sorted(blocks)
+
+    def blocks(self, calendar_id, time_min, time_max):
+        """(id, start, end) aware datetimes of the events overlapping the range"""
+        tzinfo = time_min.tzinfo
+        day = time_min.astimezone(tzinfo).date() - DAY
+        while day <= time_max.astimezone(tzinfo).date():
+            midnight = datetime.datetime.combine(day, datetime.time(), tzinfo)
+            for i, (begin, end) in enumerate(self.day_blocks(calendar_id, day.toordinal())):
+                start = midnight + datetime.timedelta(minutes=begin)
+                stop = midnight + datetime.timedelta(minutes=end)
+                if start < time_max and stop > time_min:
+                    yield "{}-{}".format(day.toordinal(), i), start, stop
+            day += DAY
+
+    def events(self, calendar_id, time_min, time_max):
+        name = calendar_id.split("@")[0]
+        events = []
+        for event_id, start, stop in self.blocks(calendar_id, time_min, time_max):
+            event = {"kind": "calendar#event",
+                     "id": "{}-{}".format(name, event_id),
+                     "status": "confirmed",
+                     "summary": "Meeting {}".format(event_id),
+                     "description": "fake",
+                     "start": {"dateTime": start.isoformat()},
+                     "end": {"dateTime": stop.isoformat()}}
+            if event_id.endswith("-0"):
+                # the first meeting of every day is one recurring series
+                event["summary"] = "Daily sync"
+                event["recurringEventId"] = "{}-daily".format(name)
+            events.append(event)
+        return events
+
+    def busy(self, calendar_id, time_min, time_max):
+        """Merged busy periods, as the freebusy endpoint gives them"""
+        periods = []
+        for event_id, start, stop in self.blocks(calendar_id, time_min, time_max):
+            if periods and start <= periods[-1][1]:
+                periods[-1][1] = max(periods[-1][1], stop)
+            else:
+                periods.append([start, stop])
+        return [{"start": start.isoformat(), "end": stop.isoformat()}
+                for start, stop in periods]
+
+
+def parse_time(text):
+    """RFC 3339 (as in timeMin) -> aware datetime"""
+    return datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Google
+    disable_nagle_algorithm = True
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def reply(self, status, body=None, headers=()):
+        content = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def error(self, status, message):
+        self.reply(status, {"error": {"code": status, "message": message}})
+
+    def authorized(self):
+        if self.headers.get("Authorization", "").startswith("Bearer "):
+            return True
+        self.error(401, "Login Required")
+        return False
+
+    def body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        parts = [urllib.parse.unquote(part) for part in url.path.strip("/").split("/")]
+        if url.path == "/o/oauth2/auth":
+            self.fake.count("auth")
+            answer = {"code": uuid.uuid4().hex}
+            if "state" in query:
+                answer["state"] = query["state"]
+            self.reply(302, headers=[("Location", "{}?{}".format(
+                query["redirect_uri"], urllib.parse.urlencode(answer)))])
+        elif url.path == "/stats":
+            with self.fake.lock:
+                self.reply(200, dict(self.fake.counts))
+        elif parts[:5] == ["calendar", "v3", "users", "me", "calendarList"]:
+            if self.authorized():
+                self.fake.count("calendarList")
+                self.fake.wait()
+                self.reply(200, {"kind": "calendar#calendarList",
+                                 "items": self.fake.calendar_list()})
+        elif len(parts) == 5 and parts[:3] == ["calendar", "v3", "calendars"] \
+                and parts[4] == "events":
+            if self.authorized():
+                self.fake.count("events")
+                self.fake.wait()
+                self.list_events(parts[3], query)
+        else:
+            self.error(404, "Not Found")
+
+    def list_events(self, calendar_id, query):
+        if calendar_id not in self.fake.ids:
+            self.error(404, "Not Found")
+            return
+        if "syncToken" in query:
+            # nothing ever changes here
+            self.reply(200, {"items": [], "nextSyncToken": query["syncToken"]})
+            return
+        far = datetime.datetime(2100, 1, 1, tzinfo=datetime.timezone.utc)
+        time_min = parse_time(query["timeMin"]) if "timeMin" in query else far.replace(year=2000)
+        time_max = parse_time(query["timeMax"]) if "timeMax" in query else far
+        items = self.fake.events(calendar_id, time_min, time_max)
+        first = int(query.get("pageToken", 0))
+        size = int(query.get("maxResults", PAGE_SIZE))
+        answer = {"kind": "calendar#events", "items": items[first:first + size]}
+        if first + size < len(items):
+            answer["nextPageToken"] = str(first + size)
+        else:
+            answer["nextSyncToken"] = "fake-sync"
+        self.reply(200, answer)
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        body = self.body()
+        if url.path == "/token":
+            self.fake.count("token")
+            self.reply(200, {"access_token": "fake-" + uuid.uuid4().hex,
+                             "refresh_token": "fake-refresh-" + uuid.uuid4().hex,
+                             "token_type": "Bearer",
+                             "expires_in": 3600})
+        elif url.path == "/calendar/v3/freeBusy":
+            if self.authorized():
+                self.fake.count("freeBusy")
+                self.fake.wait()
+                request = json.loads(body.decode("utf-8"))
+                time_min = parse_time(request["timeMin"])
+                time_max = parse_time(request["timeMax"])
+                calendars = {}
+                for item in request.get("items", []):
+                    if item["id"] in self.fake.ids:
+                        calendars[item["id"]] = {"busy": self.fake.busy(item["id"], time_min, time_max)}
+                    else:
+                        calendars[item["id"]] = {"busy": [], "errors": [{"domain": "global",
+                                                                         "reason": "notFound"}]}
+                self.reply(200, {"kind": "calendar#freeBusy", "timeMin": request["timeMin"],
+                                 "timeMax": request["timeMax"], "calendars": calendars})
+        else:
+            self.error(404, "Not Found")
+
+    def log_message(self, *args):
+        pass
+
+
+def write_secrets(path, root):
+    """A client secrets file whose OAuth endpoints are the stand-in's"""
+    with open(path, "w") as f:
+        json.dump({"web": {"client_id": "fake-client",
+                           "client_secret": "fake-secret",
+                           "redirect_uris": [],
+                           "auth_uri": root + "o/oauth2/auth",
+                           "token_uri": root + "token"}}, f, indent=1)
+
+
+def serve(fake, host="127.0.0.1", port=8089):
+    """Start serving fake in a thread; returns (server, root URL)"""
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://{}:{}/".format(host, server.server_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Google Calendar v3")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--calendars", type=int, default=5)
+    parser.add_argument("--per-day", type=int, default=6, help="events a day per calendar")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=50, help="milliseconds per call")
+    parser.add_argument("--jitter", type=float, default=20, help="milliseconds, +-")
+    parser.add_argument("--secrets", help="write a client secrets file for GOOGLE_KEY_FILE here")
+    args = parser.parse_args()
+    fake = FakeCalendar(args.calendars, args.per_day, args.seed,
+                        args.latency / 1000, args.jitter / 1000)
+    server, root = serve(fake, args.host, args.port)
+    if args.secrets:
+        write_secrets(args.secrets, root)
+    print("Fake Google Calendar at {}".format(root))
+    print("  CALENDAR_API_ROOT = {}".format(root))
+    if args.secrets:
+        print("  GOOGLE_KEY_FILE = {}".format(args.secrets))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
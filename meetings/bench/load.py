@@ -0,0 +1,143 @@
+"""
+End-to-end load test: many users at once going through
+    /setrange (and the OAuth round trip) -> /choose -> /_select -> /_free
+against a running app (gunicorn, say) that talks to bench/fake_gcal.py.
+Reports p50/p95/p99 latency of each step and the throughput.
+
+Start the stand-in and the app, then run from the meetings directory:
+    python bench/fake_gcal.py --secrets fake_secrets.json &
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:8000 flask_main:app &
+    python bench/load.py --url http://127.0.0.1:8000 [--sessions 200] [--concurrency 20]
+(with CALENDAR_API_ROOT and GOOGLE_KEY_FILE set as fake_gcal.py prints,
+and RESULT_STORE = sqlite:<path> when there is more than one worker).
+"""
+import argparse
+import collections
+import datetime
+import http.cookiejar
+import json
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+STEPS = ["login", "choose", "select", "free"]
+CALENDAR = re.compile(r'name="token" id="token" value=([^\s>]+)')
+EVENT = re.compile(r'name="mark" id="mark" value=([^\s>]+)')
+
+
+def percentile(times, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not times:
+        return float("nan")
+    return times[min(len(times) - 1, max(0, int(round(p / 100 * len(times))) - 1))]
+
+
+class Session:
+    """One user with their own cookies, going through the app once."""
+
+    def __init__(self, url, days, calendars, marks):
+        self.url = url.rstrip("/")
+        self.days = days
+        self.calendars = calendars
+        self.marks = marks
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(self, path, form=None):
+        data = urllib.parse.urlencode(form, doseq=True).encode("ascii") if form else None
+        with self.opener.open(self.url + path, data) as response:
+            return response.read().decode("utf-8")
+
+    def run(self):
+        """{step: seconds} for one pass"""
+        times = {}
+        begin = datetime.date.today() + datetime.timedelta(days=1)
+        end = begin + datetime.timedelta(days=self.days - 1)
+        self.call("/index")
+
+        start = time.perf_counter()
+        # sets the range, then redirects through the OAuth round trip to /choose
+        self.call("/setrange", {"daterange": "{} 8:00 - {} 17:00".format(
+            begin.strftime("%m/%d/%Y"), end.strftime("%m/%d/%Y"))})
+        times["login"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        page = self.call("/choose")
+        times["choose"] = time.perf_counter() - start
+        calendars = CALENDAR.findall(page)[:self.calendars]
+        if not calendars:
+            raise RuntimeError("no calendars on /choose")
+
+        start = time.perf_counter()
+        page = self.call("/_select", {"token": calendars})
+        times["select"] = time.perf_counter() - start
+        marks = EVENT.findall(page)[:self.marks]
+
+        start = time.perf_counter()
+        self.call("/_free", {"mark": marks})
+        times["free"] = time.perf_counter() - start
+        return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--days", type=int, default=7, help="days in each date range")
+    parser.add_argument("--calendars", type=int, default=3, help="calendars selected")
+    parser.add_argument("--marks", type=int, default=1, help="events marked free")
+    parser.add_argument("--out", help="also write the report here, as JSON")
+    args = parser.parse_args()
+
+    times = collections.defaultdict(list)
+    errors = collections.Counter()
+    lock = threading.Lock()
+
+    def one(i):
+        session = Session(args.url, args.days, args.calendars, args.marks)
+        try:
+            result = session.run()
+        except Exception as error:
+            with lock:
+                errors[type(error).__name__ + ": " + str(error)[:80]] += 1
+            return
+        with lock:
+            for step, seconds in result.items():
+                times[step].append(seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.sessions)))
+    wall = time.perf_counter() - start
+
+    done = len(times["free"])
+    report = {"sessions": args.sessions,
+              "concurrency": args.concurrency,
+              "completed": done,
+              "errors": dict(errors),
+              "seconds": wall,
+              "sessions_per_second": done / wall,
+              "steps": {}}
+    print("{} sessions, {} at a time: {} completed in {:.1f} s, {:.1f} sessions/s".format(
+        args.sessions, args.concurrency, done, wall, done / wall))
+    print("{:8} {:>10} {:>10} {:>10} {:>10}".format("step", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for step in STEPS:
+        ordered = sorted(times[step])
+        stats = {"p50": percentile(ordered, 50), "p95": percentile(ordered, 95),
+                 "p99": percentile(ordered, 99), "max": ordered[-1] if ordered else float("nan")}
+        report["steps"][step] = stats
+        print("{:8} {:10.1f} {:10.1f} {:10.1f} {:10.1f}".format(
+            step, *(stats[k] * 1000 for k in ("p50", "p95", "p99", "max"))))
+    for error, count in errors.items():
+        print("error x{}: {}".format(count, error))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Serving modes compared: the app under gunicorn (synchronous, the
+Calendar calls on httplib2 threads) and under uvicorn through asgi_main
+(the Calendar calls on one asyncio client), both talking to
+bench/fake_gcal.py, put through the same bench/load.py sessions.
+
+Prefetching and the free time views are turned off unless --keep-caches
+is given, so that every /choose and /_select waits for Google and the
+difference is the serving mode.
+
+Run from the meetings directory:
+    python bench/modes.py [--sessions 200] [--concurrency 20] [--threads 8]
+                          [--latency 50] [--out FILE]
+The servers are started with --sync-cmd and --async-cmd, run in a
+scratch directory holding the configuration; {port}, {threads} and
+{meetings} are filled in.
+"""
+import argparse
+import collections
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MEETINGS = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+import fake_gcal
+import load
+
+SYNC_CMD = ("{python} -m gunicorn -w 1 --threads {threads} -b 127.0.0.1:{port} "
+            "--pythonpath {meetings} flask_main:app")
+ASYNC_CMD = ("{python} -m uvicorn --app-dir {meetings} --host 127.0.0.1 --port {port} "
+             "--log-level warning asgi_main:app")
+
+CONFIG_INI = """[DEFAULT]
+SECRET_KEY = modes
+DEBUG = False
+PORT = 5000
+LOG_LEVEL = WARNING
+GOOGLE_KEY_FILE = {secrets}
+CALENDAR_API_ROOT = {root}
+ASGI_THREADS = {threads}
+"""
+
+
+def start_server(command, port, threads, workdir):
+    """Start one server and wait until it answers"""
+    argv = shlex.split(command.format(python=sys.executable, port=port, threads=threads,
+                                      meetings=MEETINGS))
+    server = subprocess.Popen(argv, cwd=workdir, stdout=subprocess.DEVNULL,
+                              stderr=open(os.path.join(workdir, "server-{}.log".format(port)), "w"))
+    url = "http://127.0.0.1:{}".format(port)
+    for i in range(100):
+        try:
+            urllib.request.urlopen(url + "/metrics").read()
+            return server, url
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("{} exited; see server-{}.log".format(argv[0], port))
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("{} did not start".format(command))
+
+
+def drive(url, args):
+    """load.py's sessions against url; {step: sorted seconds}, wall seconds, errors"""
+    times = collections.defaultdict(list)
+    errors = collections.Counter()
+    lock = threading.Lock()
+
+    def one(i):
+        try:
+            result = load.Session(url, args.days, args.calendars, args.marks).run()
+        except Exception as error:
+            with lock:
+                errors[type(error).__name__ + ": " + str(error)[:80]] += 1
+            return
+        with lock:
+            for step, seconds in result.items():
+                times[step].append(seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.sessions)))
+    wall = time.perf_counter() - start
+    return {step: sorted(seconds) for step, seconds in times.items()}, wall, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync and asyncio serving modes compared")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8,
+                        help="request threads of each server (gunicorn --threads, ASGI_THREADS)")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--calendars", type=int, default=3)
+    parser.add_argument("--marks", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=50, help="milliseconds per Google call")
+    parser.add_argument("--jitter", type=float, default=10)
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="leave prefetching and the free time views on")
+    parser.add_argument("--sync-cmd", default=SYNC_CMD)
+    parser.add_argument("--async-cmd", default=ASYNC_CMD)
+    parser.add_argument("--out", help="also write the report here, as JSON")
+    args = parser.parse_args()
+
+    fake = fake_gcal.FakeCalendar(latency=args.latency / 1000, jitter=args.jitter / 1000)
+    google, root = fake_gcal.serve(fake, port=0)
+    workdir = tempfile.mkdtemp()
+    secrets = os.path.join(workdir, "fake_secrets.json")
+    fake_gcal.write_secrets(secrets, root)
+    with open(os.path.join(workdir, "credentials.ini"), "w") as f:
+        f.write(CONFIG_INI.format(secrets=secrets, root=root, threads=args.threads))
+        if not args.keep_caches:
+            f.write("PREFETCH = False\nFREE_VIEWS = False\n")
+
+    report = {"sessions": args.sessions, "concurrency": args.concurrency,
+              "threads": args.threads, "latency_ms": args.latency, "modes": {}}
+    for mode, command, port in (("sync", args.sync_cmd, 8301), ("async", args.async_cmd, 8302)):
+        server, url = start_server(command, port, args.threads, workdir)
+        try:
+            times, wall, errors = drive(url, args)
+        finally:
+            server.terminate()
+            server.wait()
+        done = len(times.get("free", []))
+        report["modes"][mode] = {
+            "completed": done, "seconds": wall, "sessions_per_second": done / wall,
+            "errors": dict(errors),
+            "steps": {step: {"p50": load.percentile(times.get(step, []), 50),
+                             "p95": load.percentile(times.get(step, []), 95)}
+                      for step in load.STEPS}}
+    google.shutdown()
+
+    print("{} sessions, {} at a time, {} threads, Google {} ms away".format(
+        args.sessions, args.concurrency, args.threads, args.latency))
+    print("{:8} {:>12} {:>12} {:>12} {:>12}".format(
+        "step", "sync p50", "async p50", "sync p95", "async p95"))
+    sync, async_ = report["modes"]["sync"], report["modes"]["async"]
+    for step in load.STEPS:
+        print("{:8} {:12.1f} {:12.1f} {:12.1f} {:12.1f}".format(
+            step, sync["steps"][step]["p50"] * 1000, async_["steps"][step]["p50"] * 1000,
+            sync["steps"][step]["p95"] * 1000, async_["steps"][step]["p95"] * 1000))
+    print("{:8} {:12.1f} {:12.1f}   sessions/s".format(
+        "all", sync["sessions_per_second"], async_["sessions_per_second"]))
+    for mode in ("sync", "async"):
+        for error, count in report["modes"][mode]["errors"].items():
+            print("{} error x{}: {}".format(mode, count, error))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
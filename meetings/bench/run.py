@@ -0,0 +1,189 @@
+"""
+Benchmark suite for the free time computation.
+
+For every synthetic scenario (see synthetic.py) this times
+    translator_dictToObject   event dicts -> CalendarEvent
+    Agenda.normalize          merging one agenda of every busy Appt
+    Agenda.complement         each day's busy agenda against the daily window
+    Agenda.intersect          two normalized agendas
+    free listing              the free slots of the range as /_free lists them:
+                              freetime.free_times and translating each slot,
+                              or freetime.free_entries with a new DayCache
+    /_free                    the whole request, through Flask's test client
+and writes the timings to a JSON file, so runs can be compared later.
+
+Run from the meetings directory:
+    python bench/run.py [--scenario NAME ...] [--repeat N] [--seed N] [--out FILE]
+    python bench/run.py --compare OLD.json NEW.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+import synthetic
+from Model.CalendarEvent import Agenda, Appt, DAY_MINUTES
+import freetime
+
+CONFIG_INI = """[DEFAULT]
+SECRET_KEY = benchmark
+DEBUG = False
+GOOGLE_KEY_FILE = none
+PORT = 5000
+LOG_LEVEL = WARNING
+"""
+
+
+def load_app():
+    """
+    Import flask_main. It configures itself from the working directory
+    when imported, so import it from a throwaway directory holding just
+    enough configuration.
+    """
+    cwd = os.getcwd()
+    tmp = tempfile.mkdtemp()
+    with open(os.path.join(tmp, "credentials.ini"), "w") as f:
+        f.write(CONFIG_INI)
+    os.chdir(tmp)
+    try:
+        import flask_main
+    finally:
+        os.chdir(cwd)
+    return flask_main
+
+
+def measure(fn, repeat):
+    """Best and median seconds of repeat calls to fn"""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "median": statistics.median(times)}
+
+
+def day_agendas(appts, days):
+    """(busy agenda, daily window) for each day of the range"""
+    window = Appt(synthetic.FIRST_DAY, datetime.time(8, 0), datetime.time(17, 0), None)
+    midnight = window.begin_min - window.begin_min % DAY_MINUTES
+    agendas = []
+    for offset in range(days):
+        agendas.append((Agenda(), Appt.from_minutes(window.begin_min + offset * DAY_MINUTES,
+                                                    window.end_min + offset * DAY_MINUTES, None)))
+    for appt in appts:
+        offset = (appt.begin_min - midnight) // DAY_MINUTES
+        if 0 <= offset < days:
+            agendas[offset][0].append(appt)
+    return agendas
+
+
+def bench_scenario(flask_main, name, seed, repeat):
+    """Timings of every case for one scenario"""
+    generate, days = synthetic.SCENARIOS[name]
+    calendars = generate(seed)
+    events = [event for calendar in calendars for event in calendar]
+    appts = [flask_main.translator_dictToObject(event).translator_toAppt() for event in events]
+    results = []
+
+    def case(label, fn):
+        timing = measure(fn, repeat)
+        timing.update({"scenario": name, "case": label, "events": len(events), "days": days})
+        results.append(timing)
+        print("{:16} {:26} {:10.2f} ms".format(name, label, timing["best"] * 1000))
+
+    case("translator_dictToObject",
+         lambda: [flask_main.translator_dictToObject(event) for event in events])
+
+    def normalize():
+        agenda = Agenda()
+        agenda.appts = list(appts)
+        agenda.normalize()
+    case("Agenda.normalize", normalize)
+
+    per_day = day_agendas(appts, days)
+    case("Agenda.complement",
+         lambda: [agenda.complement(window) for agenda, window in per_day])
+
+    halves = (Agenda(), Agenda())
+    for i, appt in enumerate(appts):
+        halves[i % 2].append(appt)
+    first, second = halves[0].normalized(), halves[1].normalized()
+    case("Agenda.intersect", lambda: first.intersect(second))
+
+    window = per_day[0][1] if per_day else None
+    case("free listing (translate)",
+         lambda: [appt.translator_classToDict() for appt in freetime.free_times(appts, window, days)])
+    case("free listing (day cache)",
+         lambda: freetime.free_entries(appts, window, days, freetime.DayCache()))
+
+    client = flask_main.app.test_client()
+    end_day = synthetic.FIRST_DAY + datetime.timedelta(days=days)
+    with client.session_transaction() as session:
+        session["real_start_time"] = synthetic.iso(synthetic.FIRST_DAY, 8 * 60)
+        session["real_end_time"] = synthetic.iso(end_day, 17 * 60)
+        session["events_handle"] = flask_main.RESULTS.put(calendars)
+
+    def free_path():
+        # one mark, so the events path runs (no Google behind us)
+        response = client.post("/_free", data={"mark": events[0]["id"] if events else ""})
+        assert response.status_code == 200
+    case("/_free", free_path)
+    return results
+
+
+def compare(old_path, new_path):
+    """Print new/old ratios of the best times of two result files"""
+    with open(old_path) as f:
+        old = {(r["scenario"], r["case"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    for result in new:
+        before = old.get((result["scenario"], result["case"]))
+        if before is None:
+            continue
+        print("{:16} {:26} {:10.2f} -> {:10.2f} ms  x{:.2f}".format(
+            result["scenario"], result["case"], before["best"] * 1000,
+            result["best"] * 1000, result["best"] / before["best"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Free time benchmarks")
+    parser.add_argument("--scenario", action="append", choices=sorted(synthetic.SCENARIOS),
+                        help="scenario to run (repeatable; default all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="result file (default bench/results/<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    flask_main = load_app()
+    results = []
+    for name in args.scenario or sorted(synthetic.SCENARIOS):
+        results += bench_scenario(flask_main, name, args.seed, args.repeat)
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    out = args.out or os.path.join(HERE, "results", "{}.json".format(stamp))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"time": stamp,
+                   "python": platform.python_version(),
+                   "seed": args.seed,
+                   "repeat": args.repeat,
+                   "results": results}, f, indent=1)
+    print("Results in {}".format(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Seeded synthetic calendars for the benchmarks.
+
+Every generator returns a list of calendars, each a list of event dicts
+shaped like the ones list_events produces (id, summary, description,
+begin, end, offset), so they can go anywhere real events go. The same
+seed always gives the same calendars.
+"""
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import timeparse
+
+FIRST_DAY = datetime.date(2017, 11, 16)
+OFFSET = "-08:00"
+OFFSET_SECONDS = timeparse.offset_seconds(OFFSET)
+
+
+def iso(day, minutes):
+    """day + minutes since midnight -> "2017-11-16T09:30:00-08:00" """
+    return "{}T{:02d}:{:02d}:00{}".format(day.isoformat(), minutes // 60, minutes % 60, OFFSET)
+
+
+def calendar(rand, name, days, per_day, min_length, max_length, first=7 * 60, last=19 * 60):
+    """
+    One calendar: about per_day events a day (Poisson-ish), starting
+    between first and last, lasting min_length to max_length minutes,
+    never past midnight.
+    """
+    events = []
+    for offset in range(days):
+        day = FIRST_DAY + datetime.timedelta(days=offset)
+        midnight = timeparse.day_seconds(day.isoformat()) - OFFSET_SECONDS
+        count = sum(1 for i in range(per_day * 2) if rand.random() < 0.5)
+        for i in range(count):
+            begin = rand.randrange(first, last)
+            end = min(begin + rand.randrange(min_length, max_length + 1), 24 * 60 - 1)
+            events.append({"id": "{}-{}-{}".format(name, offset, i),
+                           "summary": "event {}".format(i),
+                           "description": "synthetic",
+                           "begin": midnight + begin * 60,
+                           "end": midnight + end * 60,
+                           "offset": OFFSET_SECONDS})
+    events.sort(key=lambda e: e["begin"])
+    return events
+
+
+def dense(seed=0, days=14):
+    """A packed two weeks: ~20 short meetings a day"""
+    rand = random.Random(seed)
+    return [calendar(rand, "dense", days, 20, 15, 60)]
+
+
+def sparse(seed=0, days=90):
+    """A quiet quarter: about one meeting a day"""
+    rand = random.Random(seed)
+    return [calendar(rand, "sparse", days, 1, 30, 90)]
+
+
+def overlapping(seed=0, days=14):
+    """Many long events piled on each other"""
+    rand = random.Random(seed)
+    return [calendar(rand, "overlap", days, 40, 60, 240)]
+
+
+def multi_calendar(seed=0, days=30, calendars=10):
+    """Ten calendars (people, rooms, teams) over a month"""
+    rand = random.Random(seed)
+    return [calendar(rand, "cal{}".format(i), days, 4, 15, 120) for i in range(calendars)]
+
+
+def year_long(seed=0, days=365):
+    """A year of a busy person's calendar"""
+    rand = random.Random(seed)
+    return [calendar(rand, "year", days, 6, 15, 90)]
+
+
+def recurring(seed=0, days=365):
+    """
+    A year of routine: a standup every weekday, a weekly planning
+    meeting and the odd one-off meeting, weekends free
+    """
+    rand = random.Random(seed)
+    events = []
+    for offset in range(days):
+        day = FIRST_DAY + datetime.timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        midnight = timeparse.day_seconds(day.isoformat()) - OFFSET_SECONDS
+        slots = [(9 * 60, 9 * 60 + 15), (12 * 60, 13 * 60)]
+        if day.weekday() == 0:
+            slots.append((14 * 60, 15 * 60 + 30))
+        if rand.random() < 0.1:
+            begin = rand.randrange(8 * 60, 16 * 60)
+            slots.append((begin, begin + 60))
+        for i, (begin, end) in enumerate(sorted(slots)):
+            events.append({"id": "routine-{}-{}".format(offset, i),
+                           "summary": "routine {}".format(i),
+                           "description": "synthetic",
+                           "begin": midnight + begin * 60,
+                           "end": midnight + end * 60,
+                           "offset": OFFSET_SECONDS})
+    return [events]
+
+
+# name -> (generator, number of days it covers)
+SCENARIOS = {
+    "dense": (dense, 14),
+    "sparse": (sparse, 90),
+    "overlapping": (overlapping, 14),
+    "multi_calendar": (multi_calendar, 30),
+    "year_long": (year_long, 365),
+    "recurring": (recurring, 365),
+}
@@ -31,6 +31,70 @@ logging.basicConfig(format='%(levelname)s:%(message)s',
 log = logging.getLogger(__name__)
 HERE = os.path.dirname(__file__)
 
+# Settings with a sensible value even when no configuration file sets them.
+# Configuration files and the command line override these.
+DEFAULTS = {
+    # most calendars fetched at once for one /_select request
+    "FETCH_WORKERS": 4,
+    # SQLite file for the incremental event sync store; empty turns it off
+    "SYNC_DB": "",
+    # where fetched events wait between /_select and /_free:
+    # "memory" (one process) or "sqlite:<path>" (shared by gunicorn workers)
+    "RESULT_STORE": "memory",
+    # seconds they are kept, and how many result sets at most
+    "RESULT_TTL": 3600,
+    "RESULT_MAX": 256,
+    # file holding the calendar API discovery document (written on first
+    # use if missing); empty uses the client library's copy or downloads it
+    "DISCOVERY_DOC": "",
+    # authorized calendar services kept for reuse, and seconds kept idle
+    "SERVICE_POOL_MAX": 32,
+    "SERVICE_POOL_IDLE": 300,
+    # kept-alive HTTP connections to Google: how many kept, and seconds
+    # an unused connection may still be reused
+    "HTTP_POOL_SIZE": 16,
+    "HTTP_IDLE_TIMEOUT": 120,
+    # root URL of the calendar API; empty for Google's. Point it at a
+    # local stand-in (bench/fake_gcal.py) to load test without Google
+    "CALENDAR_API_ROOT": "",
+    # add a Server-Timing header with the phase timings to every response
+    "SERVER_TIMING": False,
+    # log level of the app (DEBUG, INFO, WARNING, ...)
+    "LOG_LEVEL": "INFO",
+    # fraction of requests (0 to 1) logged at DEBUG whatever LOG_LEVEL is
+    "TRACE_SAMPLE": 0.0,
+    # SQLite file for users' rules of events to treat as free; empty
+    # keeps them in memory, for the life of the process
+    "EXCLUSION_DB": "",
+    # ask Google for each recurring event once, with its rule, and work
+    # out the instances here instead of having Google send every one
+    "LOCAL_RECURRENCE": False,
+    # keep the plain /_free listing of each user's view (calendars, dates,
+    # hours) worked out in the background, rebuilt when its events change;
+    # how many views are kept, and how many rebuilds may wait. While on,
+    # /_free doesn't use the freebusy fast path
+    "FREE_VIEWS": True,
+    "VIEW_MAX": 256,
+    "VIEW_QUEUE": 64,
+    # start fetching the primary and shown calendars as soon as /choose
+    # lists them; threads doing it, seconds a prefetched calendar may be
+    # used for, and how many are kept
+    "PREFETCH": True,
+    "PREFETCH_WORKERS": 4,
+    "PREFETCH_TTL": 300,
+    "PREFETCH_MAX": 256,
+    # served by asgi_main (uvicorn): threads running the views, and most
+    # connections to Google open at once for the whole process
+    "ASGI_THREADS": 32,
+    "ASYNC_CONNECTIONS": 100,
+    # bytes of rendered /_select and /_free pages kept for repeats (and
+    # answered 304 when the browser has them); 0 turns it off
+    "PAGE_CACHE_BYTES": 16 * 1024 * 1024,
+    # /_free slots of this many day shapes (the window and the busy time in
+    # it, from midnight) kept, so alike days are worked out once; 0 turns it off
+    "DAY_CACHE_MAX": 4096,
+}
+
 
 def command_line_args():
     """Returns namespace with settings from command line"""
@@ -138,6 +202,11 @@ def configuration(proxied=False):
             log.debug("Storing in cli")
             cli_vars[var_upper] = ini[var_lower]
 
+    for var in DEFAULTS:
+        if cli_vars.get(var) is None:
+            log.debug("Default for '{}'".format(var))
+            cli_vars[var] = DEFAULTS[var]
+
     imply_types(cli_vars)
 
     return cli
@@ -0,0 +1,155 @@
+"""
+A local copy of users' calendars, kept up to date with Google's
+incremental sync.
+
+The first sync of a calendar downloads all of its events and keeps the
+nextSyncToken Google sends with the last page. Later syncs send that
+token back and get only what changed since: new and updated events are
+written over the stored ones, and "cancelled" events (tombstones) are
+deleted. If Google answers 410 Gone the token has expired, so we drop
+what we have for that calendar and sync it in full again.
+
+Events are stored (SQLite) per user and calendar as the JSON Google
+sent, next to their begin/end as UTC epoch seconds for range queries.
+"""
+import json
+import logging
+import sqlite3
+import threading
+
+from googleapiclient.errors import HttpError
+
+from gapi import iter_pages
+import timeparse
+
+log = logging.getLogger(__name__)
+
+# what we keep of each event, plus what incremental sync needs
+SYNC_FIELDS = ("nextPageToken,nextSyncToken,"
+               "items(id,summary,description,start,end,status,recurringEventId)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    user TEXT, calendar TEXT, id TEXT,
+    begin INTEGER, end INTEGER, event TEXT,
+    PRIMARY KEY (user, calendar, id));
+CREATE INDEX IF NOT EXISTS events_by_time ON events (user, calendar, begin);
+CREATE TABLE IF NOT EXISTS sync (
+    user TEXT, calendar TEXT, token TEXT,
+    PRIMARY KEY (user, calendar));
+"""
+
+
+def epoch(when):
+    """
+    The start or end of a Google event as UTC epoch seconds.
+    Args:
+        when: {"dateTime": ISO format} or, for all day events, {"date": "2017-11-16"}
+    """
+    if "dateTime" in when:
+        return timeparse.parse(when["dateTime"])
+    return timeparse.day_seconds(when["date"])
+
+
+class EventSyncStore:
+    """Events of (user, calendar) pairs, with their sync tokens."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: the SQLite database file (":memory:" for a throwaway store)
+        """
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def token(self, user, calendar_id):
+        """The stored sync token, or None if the calendar was never synced"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT token FROM sync WHERE user = ? AND calendar = ?",
+                (user, calendar_id)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, service, user, calendar_id):
+        """
+        Bring the stored copy of a calendar up to date: a full download
+        the first time (or after a 410), only the changes afterwards.
+        Args:
+            service: a google calendar service object
+            user: a key for the signed-in user
+            calendar_id: a calendarId
+        """
+        token = self.token(user, calendar_id)
+        try:
+            self._sync(service, user, calendar_id, token)
+        except HttpError as err:
+            if token is None or err.resp.status != 410:
+                raise
+            log.info("Sync token of {} expired, syncing in full".format(calendar_id))
+            self.reset(user, calendar_id)
+            self._sync(service, user, calendar_id, None)
+
+    def _sync(self, service, user, calendar_id, token):
+        """One pass of sync from token (None for a full sync)"""
+        kwargs = {"calendarId": calendar_id,
+                  "singleEvents": True,
+                  "fields": SYNC_FIELDS}
+        if token is None:
+            # a full sync must not look like a delta: start from nothing
+            self.reset(user, calendar_id)
+        else:
+            kwargs["syncToken"] = token
+        events = service.events()
+        changed = 0
+        for response in iter_pages(events.list(**kwargs), events.list_next):
+            items = response.get("items", [])
+            changed += len(items)
+            self.apply(user, calendar_id, items)
+            if "nextSyncToken" in response:
+                self._save_token(user, calendar_id, response["nextSyncToken"])
+        log.debug("Synced {} ({} changes)".format(calendar_id, changed))
+
+    def apply(self, user, calendar_id, items):
+        """
+        Write a page of changes: insert or update events, delete the
+        cancelled ones.
+        """
+        with self.lock, self.db:
+            for item in items:
+                if item.get("status") == "cancelled":
+                    self.db.execute(
+                        "DELETE FROM events WHERE user = ? AND calendar = ? AND id = ?",
+                        (user, calendar_id, item["id"]))
+                    continue
+                if "start" not in item or "end" not in item:
+                    continue
+                self.db.execute(
+                    "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                    (user, calendar_id, item["id"],
+                     epoch(item["start"]), epoch(item["end"]), json.dumps(item)))
+
+    def _save_token(self, user, calendar_id, token):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO sync VALUES (?, ?, ?)",
+                            (user, calendar_id, token))
+
+    def reset(self, user, calendar_id):
+        """Forget a calendar: its events and its sync token"""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM events WHERE user = ? AND calendar = ?",
+                            (user, calendar_id))
+            self.db.execute("DELETE FROM sync WHERE user = ? AND calendar = ?",
+                            (user, calendar_id))
+
+    def events(self, user, calendar_id, begin, end):
+        """
+        The stored events of a calendar overlapping [begin, end)
+        (UTC epoch seconds), in order of start time, as Google's dicts.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT event FROM events WHERE user = ? AND calendar = ?"
+                " AND begin < ? AND end > ? ORDER BY begin",
+                (user, calendar_id, end, begin)).fetchall()
+        return [json.loads(row[0]) for row in rows]
@@ -0,0 +1,104 @@
+"""
+Events to treat as free.
+
+Marks (event ids ticked on the page) count for one request. Rules are
+kept per user (SQLite) and apply on every visit:
+    id       one event
+    series   every instance of a recurring event (its recurringEventId)
+    summary  every event whose summary matches a pattern, shell style
+             and ignoring case ("*standup*", "lunch")
+A Matcher puts a user's rules and marks together: ids and series in
+sets, the patterns in one compiled regex, so each event is checked in
+constant time (plus one regex search when there are patterns) as the
+events go by, before any free time is worked out.
+"""
+import fnmatch
+import re
+import sqlite3
+import threading
+
+KINDS = ("id", "series", "summary")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    user TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user, kind, value)
+);
+"""
+
+
+class Matcher:
+    """Does an event (a dict from list_events) count as free?"""
+
+    def __init__(self, ids=(), series=(), patterns=()):
+        self.ids = set(ids)
+        self.series = set(series)
+        self.summary = None
+        if patterns:
+            self.summary = re.compile("|".join(
+                "(?:{})".format(fnmatch.translate(pattern)) for pattern in patterns),
+                re.IGNORECASE)
+
+    def __bool__(self):
+        return bool(self.ids or self.series or self.summary)
+
+    def excludes(self, event):
+        if event["id"] in self.ids:
+            return True
+        if self.series and event.get("recurringEventId") in self.series:
+            return True
+        return self.summary is not None and self.summary.match(event.get("summary") or "") is not None
+
+    def filter(self, events):
+        """The events that stay busy"""
+        if not self:
+            return list(events)
+        return [event for event in events if not self.excludes(event)]
+
+
+class ExclusionRules:
+    """Users' rules for events to treat as free."""
+
+    def __init__(self, path=":memory:"):
+        """
+        Args:
+            path: the SQLite database file (":memory:" keeps the rules
+                only as long as the process)
+        """
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def add(self, user, kind, value):
+        if kind not in KINDS:
+            raise ValueError("Unknown kind of rule {}".format(kind))
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO rules VALUES (?, ?, ?)", (user, kind, value))
+
+    def remove(self, user, kind, value):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM rules WHERE user = ? AND kind = ? AND value = ?",
+                            (user, kind, value))
+
+    def rules(self, user):
+        """[(kind, value)] of a user, sorted"""
+        with self.lock:
+            return self.db.execute(
+                "SELECT kind, value FROM rules WHERE user = ? ORDER BY kind, value",
+                (user,)).fetchall()
+
+    def matcher(self, user, marks=()):
+        """A Matcher for the user's rules (none if user is None) and marks"""
+        ids = set(marks)
+        series = []
+        patterns = []
+        for kind, value in (self.rules(user) if user is not None else []):
+            if kind == "id":
+                ids.add(value)
+            elif kind == "series":
+                series.append(value)
+            else:
+                patterns.append(value)
+        return Matcher(ids, series, patterns)
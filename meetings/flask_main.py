@@ -3,9 +3,11 @@ from flask import render_template
 from flask import request
 from flask import url_for
 import uuid
+import hashlib
 
 import json
-import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Date handling
 import arrow  # Replacement for datetime, based on moment.js
@@ -22,6 +24,21 @@ from apiclient import discovery
 
 # import Data structure
 from Model import CalendarEvent
+import freetime
+import group
+from gapi import iter_items, accept_gzip
+import event_sync
+import result_store
+import service_pool
+import http_pool
+import metrics
+import applog
+import timeparse
+import exclusions
+import recurrence
+import views
+import prefetch
+import page_cache
 
 ###
 # Globals
@@ -35,12 +52,61 @@ else:
 
 app = flask.Flask(__name__)
 app.debug = CONFIG.DEBUG
-app.logger.setLevel(logging.DEBUG)
+# share of requests logged in full (configuration files give it as text)
+TRACE_SAMPLE = float(CONFIG.TRACE_SAMPLE)
+applog.configure(app.logger, CONFIG.LOG_LEVEL, TRACE_SAMPLE)
 app.secret_key = CONFIG.SECRET_KEY
 
 SCOPES = 'https://www.googleapis.com/auth/calendar.readonly'
 CLIENT_SECRET_FILE = CONFIG.GOOGLE_KEY_FILE  # You'll need this
 APPLICATION_NAME = 'MeetMe class project'
+# the users' time zone: dates and times picked are read on its clock,
+# and busy times Google gives in UTC are put back on it
+LOCAL_ZONE = tz.tzlocal()
+# local copy of the calendars, synced incrementally (off unless SYNC_DB is set)
+SYNC_STORE = event_sync.EventSyncStore(CONFIG.SYNC_DB) if CONFIG.SYNC_DB else None
+# users' standing rules for events to treat as free
+EXCLUSIONS = exclusions.ExclusionRules(CONFIG.EXCLUSION_DB or ":memory:")
+# fetched events, kept server side between /_select and /_free
+RESULTS = result_store.make_store(CONFIG.RESULT_STORE, CONFIG.RESULT_TTL, CONFIG.RESULT_MAX)
+# the calendar API description, read once instead of on every request
+DISCOVERY = service_pool.load_discovery(CONFIG.DISCOVERY_DOC or None,
+                                        CONFIG.CALENDAR_API_ROOT or None)
+# kept-alive connections to Google, shared by all threads
+HTTP_POOL = http_pool.HttpPool(CONFIG.HTTP_POOL_SIZE, CONFIG.HTTP_IDLE_TIMEOUT)
+# most calendars the freebusy endpoint takes in one query
+FREEBUSY_MAX_CALENDARS = 50
+# the asyncio Calendar client when served by asgi_main (see gcal_async.py);
+# None calls Google through discovery-built services, on threads
+CALENDAR_CLIENT = None
+# the parts of an event we use, everything else stays on Google's side
+EVENT_FIELDS = "nextPageToken,items(id,summary,description,start,end,status,recurringEventId)"
+# the same, plus what it takes to expand recurring events here (LOCAL_RECURRENCE)
+MASTER_FIELDS = ("nextPageToken,items(id,summary,description,start,end,status,"
+                 "recurringEventId,recurrence,originalStartTime)")
+# timings and counts for /metrics
+METRICS = metrics.Registry()
+PHASE_SECONDS = METRICS.histogram(
+    "freetime_phase_seconds", "Time spent in each phase of a request", ["route", "phase"])
+REQUEST_SECONDS = METRICS.histogram(
+    "freetime_request_seconds", "Time to answer a request", ["route"])
+EVENTS_FETCHED = METRICS.counter(
+    "freetime_events_fetched_total", "Events fetched from Google")
+CALENDARS_QUERIED = METRICS.counter(
+    "freetime_calendars_queried_total", "Calendars asked for events or free/busy", ["method"])
+# seconds; from a view built just now up to one fetched hours ago
+AGE_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 14400)
+VIEW_AGE = METRICS.histogram(
+    "freetime_view_age_seconds", "Age of the events behind free time views served",
+    buckets=AGE_BUCKETS)
+VIEW_LAG = METRICS.histogram(
+    "freetime_view_lag_seconds", "Time from asking for a free time view to having it")
+NOT_MODIFIED = METRICS.counter(
+    "freetime_not_modified_total", "Pages answered 304 Not Modified", ["route"])
+# rendered /_select and /_free pages by a hash of their inputs (see page_cache.py)
+PAGES = page_cache.PageCache(CONFIG.PAGE_CACHE_BYTES)
+# each day's free slots for /_free by the day's shape (see freetime.py)
+DAYS = freetime.DayCache(CONFIG.DAY_CACHE_MAX) if CONFIG.DAY_CACHE_MAX else None
 
 
 #############################
@@ -49,13 +115,65 @@ APPLICATION_NAME = 'MeetMe class project'
 #
 #############################
 
+@app.before_request
+def start_timer():
+    flask.g.started = time.perf_counter()
+    metrics.start()
+    applog.begin_request(TRACE_SAMPLE)
+
+
+@app.after_request
+def record_timer(response):
+    """
+    Phase timings of the request into /metrics (and Server-Timing, if
+    configured). A streamed response does its work after this, and
+    records its timings itself when it ends (see observe_timer).
+    """
+    timer = metrics.current()
+    if timer is None or flask.g.get("streamed"):
+        return response
+    total = observe_timer(timer)
+    if CONFIG.SERVER_TIMING:
+        response.headers["Server-Timing"] = timer.server_timing(total)
+    return response
+
+
+def observe_timer(timer):
+    """The request's phases and total time into /metrics; returns the total"""
+    total = time.perf_counter() - flask.g.started
+    route = flask.request.url_rule.rule if flask.request.url_rule else "unmatched"
+    for name, seconds in timer.items():
+        PHASE_SECONDS.observe(seconds, route, name)
+    REQUEST_SECONDS.observe(total, route)
+    return total
+
+
+@app.teardown_request
+def stop_timer(exception):
+    metrics.stop()
+    applog.end_request()
+
+
+@app.route("/metrics")
+def metrics_page():
+    """Timings, counters and pool statistics, in the Prometheus text format"""
+    extra = (metrics.stats_lines("freetime_results", RESULTS.stats()) +
+             metrics.stats_lines("freetime_services", SERVICES.stats()) +
+             metrics.stats_lines("freetime_http", HTTP_POOL.stats()) +
+             metrics.stats_lines("freetime_views", VIEWS.stats()) +
+             metrics.stats_lines("freetime_prefetch", PREFETCH.stats()) +
+             metrics.stats_lines("freetime_pages", PAGES.stats()) +
+             (metrics.stats_lines("freetime_days", DAYS.stats()) if DAYS else []))
+    return flask.Response(METRICS.render(extra), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/")
 @app.route("/index")
 def index():
     app.logger.debug("Entering index")
     if 'begin_date' not in flask.session:
         init_session_values()
-    return render_template('index.html')
+    return render('index.html')
 
 
 @app.route("/choose")
@@ -69,10 +187,21 @@ def choose():
     if not credentials:
         app.logger.debug("Redirecting to authorization")
         return flask.redirect(flask.url_for('oauth2callback'))
-    gcal_service = get_gcal_service(credentials)
-    app.logger.debug("Returned from get_gcal_service")
-    flask.g.calendars = list_calendars(gcal_service)
-    return render_template('index.html')
+    if CALENDAR_CLIENT is not None:
+        with metrics.phase("google"):
+            calendar_list = CALENDAR_CLIENT.calendar_list(credentials.access_token)
+        flask.g.calendars = calendar_entries(calendar_list)
+    else:
+        with SERVICES.service(credentials) as gcal_service:
+            app.logger.debug("Returned from get_gcal_service")
+            flask.g.calendars = list_calendars(gcal_service)
+    if CONFIG.PREFETCH and 'real_start_time' in flask.session:
+        # the user will likely pick these; fetch them while they look
+        prefetch_calendars(credentials,
+                           [cal["id"] for cal in flask.g.calendars
+                            if cal["primary"] or cal["selected"]],
+                           flask.session['real_start_time'], flask.session['real_end_time'])
+    return render('index.html')
 
 
 ####
@@ -113,8 +242,9 @@ def valid_credentials():
     if 'credentials' not in flask.session:
         return None
 
-    credentials = client.OAuth2Credentials.from_json(
-        flask.session['credentials'])
+    with metrics.phase("credentials"):
+        credentials = client.OAuth2Credentials.from_json(
+            flask.session['credentials'])
 
     if (credentials.invalid or
             credentials.access_token_expired):
@@ -122,6 +252,19 @@ def valid_credentials():
     return credentials
 
 
+def user_key(credentials):
+    """
+    A stable key for the user behind some credentials, to file their
+    data under: the account id when we have an id token, otherwise a
+    hash of the refresh token (which lasts as long as the grant).
+    """
+    id_token = credentials.id_token or {}
+    if "sub" in id_token:
+        return id_token["sub"]
+    secret = credentials.refresh_token or credentials.access_token
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()[:32]
+
+
 def get_gcal_service(credentials):
     """
     We need a Google calendar 'service' object to obtain
@@ -131,14 +274,31 @@ def get_gcal_service(credentials):
     control flow will be interrupted by authorization, and we'll
     end up redirected back to /choose *without a service object*.
     Then the second call will succeed without additional authorization.
+    Update: the service is built from the discovery document we loaded
+    at startup, on a kept-alive connection from HTTP_POOL, and routes get
+    one through SERVICES, which reuses them.
     """
     app.logger.debug("Entering get_gcal_service")
-    http_auth = credentials.authorize(httplib2.Http())
-    service = discovery.build('calendar', 'v3', http=http_auth)
+    with metrics.phase("build"):
+        http_auth = HTTP_POOL.authorize(credentials)
+        service = discovery.build_from_document(DISCOVERY, http=http_auth)
     app.logger.debug("Returning service")
     return service
 
 
+def release_gcal_service(service):
+    """
+    A service is done for good: give its connection back to HTTP_POOL
+    """
+    HTTP_POOL.release(service._http)
+
+
+# authorized services, reused across requests with the same access token
+SERVICES = service_pool.ServicePool(
+    get_gcal_service, CONFIG.SERVICE_POOL_MAX, CONFIG.SERVICE_POOL_IDLE,
+    discard=release_gcal_service)
+
+
 @app.route('/oauth2callback')
 def oauth2callback():
     """
@@ -204,7 +364,7 @@ def setrange():
     daterange = request.form.get('daterange')
     flask.session['daterange'] = daterange
     daterange_parts = daterange.split()
-    app.logger.debug(daterange_parts)
+    app.logger.debug("Daterange parts %s", daterange_parts)
 
     # Sample format for date range_parts:
     # ['11/16/2017', '5:00', '-', '12/29/2017', '4:30']
@@ -222,75 +382,288 @@ def setrange():
     flask.session['real_end_time'] = splice_real_time(
         flask.session['end_date'], flask.session['end_time'])
 
-    app.logger.debug("Setrange parsed {} - {}  dates as {} - {}".format(
-        daterange_parts[0], daterange_parts[3],
-        flask.session['begin_date'], flask.session['end_date']))
-    app.logger.debug("Setrange parsed {} - {}  time as {} - {}".format(
-        daterange_parts[1], daterange_parts[4],
-        flask.session['start_time'], flask.session['end_time']))
-    app.logger.debug("real time is {} - {}".format(
-        flask.session['real_start_time'], flask.session['real_end_time']))
+    app.logger.debug("Setrange parsed %s - %s  dates as %s - %s",
+                     daterange_parts[0], daterange_parts[3],
+                     flask.session['begin_date'], flask.session['end_date'])
+    app.logger.debug("Setrange parsed %s - %s  time as %s - %s",
+                     daterange_parts[1], daterange_parts[4],
+                     flask.session['start_time'], flask.session['end_time'])
+    app.logger.debug("real time is %s - %s",
+                     flask.session['real_start_time'], flask.session['real_end_time'])
     return flask.redirect(flask.url_for("choose"))
 
 
-@app.route("/_select", methods=["POST"])
+@app.route("/_select", methods=["GET", "POST"])
 def select():
     """
     According to marked checkbox, re-direct to index.html
+    POST fetches and keeps the events of the picked calendars, then
+    redirects to GET /_select, which lists them from RESULTS: a repeat
+    is a page lookup (or a 304) without asking Google again.
     """
     credentials = valid_credentials()
     if not credentials:
         app.logger.debug("Redirecting to authorization")
         return flask.redirect(flask.url_for('oauth2callback'))
-    gcal_service = get_gcal_service(credentials)
+    user = user_key(credentials)
+    if flask.request.method == "GET":
+        return selected_page(user)
     app.logger.debug("Select calendars")
     tokens = flask.request.form.getlist("token")
-    app.logger.debug("The token: {}".format(tokens))
-    events_list_bycalendar = []  # store all events for every selected calendar
-    for token in tokens:
-        new_event_list = []
-        for event in list_events(gcal_service, token):
-            new_event_list.append(event)
-        events_list_bycalendar.append(new_event_list)
-    app.logger.debug(events_list_bycalendar)
-    flask.session["translated_events"] = events_list_bycalendar
+    app.logger.debug("The token: %s", applog.Summary(tokens))
+    # store all events for every selected calendar, in the order of tokens
+    events_list_bycalendar = fetch_calendars(
+        credentials, tokens,
+        flask.session['real_start_time'], flask.session['real_end_time'])
+    app.logger.debug("Fetched %s", applog.Summary(events_list_bycalendar))
+    # what these events are, for the keys of the pages made from them
+    flask.session["events_version"] = page_cache.fingerprint(events_list_bycalendar)
+    # the events stay on the server; the session only keeps their handle
+    flask.session["events_handle"] = RESULTS.put(
+        events_list_bycalendar, flask.session.get("events_handle"))
+    flask.session["events_fetched"] = time.time()
+    flask.session["selected_calendars"] = tokens
+    if CONFIG.FREE_VIEWS:
+        # work out the plain /_free listing now, in the background
+        VIEWS.refresh(view_key(user), flask.session["events_handle"],
+                      flask.session["events_fetched"])
+    return flask.redirect(flask.url_for("select"))
+
+
+def selected_page(user):
+    """The events of the selected calendars, as /_select last fetched them"""
+    if "events_handle" not in flask.session:
+        return flask.redirect(flask.url_for("choose"))
+    flask.g.rules = EXCLUSIONS.rules(user)
+    key = page_key("select", user, flask.session.get("selected_calendars", []))
+    cached = cached_page(key)
+    if cached is not None:
+        return cached
+    events_list_bycalendar = RESULTS.get(flask.session["events_handle"])
+    if events_list_bycalendar is None:
+        flask.flash("Your calendar events have expired, please select calendars again")
+        return flask.redirect(flask.url_for("choose"))
     flask.g.events = events_list_bycalendar
-    return render_template('index.html')
+    return render_page('index.html', key)
 
 
-@app.route("/_free", methods=["POST"])
+@app.route("/_free", methods=["GET", "POST"])
 def free():
     """
-    According to marked checkbox in busy assignment, list free time for users
+    According to marked checkbox in busy assignment, list free time for users.
+    The form POSTs here to keep the rules asked for, then is redirected
+    to GET /_free?mark=..., which lists the free time and can be
+    revalidated with its ETag.
     """
     app.logger.debug("Checking credentials for searching free events")
 
     app.logger.debug("Search free time")
-    marks = flask.request.form.getlist("mark")
-    app.logger.debug("The mark: {}".format(marks))
-    free_naive_events_list = []
-    free_events_list = []
-    busy_lists = flask.session["translated_events"]
+    marks = flask.request.values.getlist("mark")
+    app.logger.debug("The mark: %s", applog.Summary(marks))
+    user = current_user()
+    if flask.request.method == "POST":
+        if user is not None and save_rules(user, flask.request.form):
+            VIEWS.invalidate(lambda key: key[0] == user)
+        return flask.redirect(flask.url_for("free", mark=marks))
+    if user is not None:
+        flask.g.rules = EXCLUSIONS.rules(user)
+    key = None
+    if "events_version" in flask.session:
+        key = page_key("free", user, flask.session.get("selected_calendars", []),
+                       sorted(marks))
+    cached = cached_page(key)
+    if cached is not None:
+        return cached
+    # with nothing marked, the view may be built already
+    plain = CONFIG.FREE_VIEWS and user is not None and not marks
+    if plain:
+        view = VIEWS.get(view_key(user))
+        if view is not None:
+            VIEW_AGE.observe(time.time() - view.fetched)
+            flask.g.free_events = view.value
+            return render_page('index.html', key)
+        # worked out as the view is, from the events, so that a hit and a
+        # miss show the same listing
+        free_naive_appt_list = marked_busy_appts(EXCLUSIONS.matcher(user))
+    else:
+        free_naive_appt_list = busy_appts(marks)
+    if free_naive_appt_list is None:
+        flask.flash("Your calendar events have expired, please select calendars again")
+        return flask.redirect(flask.url_for("choose"))
+    flask.g.free_events = free_listing(free_naive_appt_list)
+    if plain and "events_handle" in flask.session:
+        # so that the next time it is a lookup
+        VIEWS.want(view_key(user), flask.session["events_handle"],
+                   flask.session.get("events_fetched"))
+    return render_page('index.html', key)
+
+
+@app.route("/_unexclude", methods=["POST"])
+def unexclude():
+    """
+    Drop one of the user's rules for events to treat as free
+    """
+    user = current_user()
+    if user is None:
+        return flask.redirect(flask.url_for('oauth2callback'))
+    kind = flask.request.form.get("kind")
+    value = flask.request.form.get("value")
+    EXCLUSIONS.remove(user, kind, value)
+    VIEWS.invalidate(lambda key: key[0] == user)
+    flask.flash("No longer treated as free: {} {}".format(kind, value))
+    return flask.redirect(flask.url_for("choose"))
 
-    # get all selected events into a single list
-    for calendar in busy_lists:
-        free_events_list += calendar
-    app.logger.debug(free_events_list)
-    # translate these events back to object
-    for event in free_events_list:
-        free_naive_events_list.append(translator_dictToObject(event))
-    app.logger.debug(free_naive_events_list)
-    # we remove some events which are not in the right meeting time also some events which are marked as free time
-    for mark in marks:
-        for event in free_naive_events_list:
-            if event.get_id() == mark:
-                free_naive_events_list.remove(event)
 
-    free_naive_appt_list = []
-    # translate CalendarEvent to appt
-    for event in free_naive_events_list:
-        free_naive_appt_list.append(event.translator_toAppt())
-        app.logger.debug(event)
+@app.route("/_group", methods=["POST"])
+def group_free():
+    """
+    Common free time of a group: everyone listed in the participants box
+    (calendar ids or email addresses, separated by blanks, commas or new
+    lines) over the session's date and time range
+    """
+    credentials = valid_credentials()
+    if not credentials:
+        app.logger.debug("Redirecting to authorization")
+        return flask.redirect(flask.url_for('oauth2callback'))
+    text = flask.request.form.get("participants", "")
+    participants = []
+    for participant in text.replace(",", " ").split():
+        if participant not in participants:
+            participants.append(participant)
+    if not participants:
+        flask.flash("List the calendars of the people who should meet")
+        return flask.redirect(flask.url_for("choose"))
+    real_start = flask.session['real_start_time']
+    real_end = flask.session['real_end_time']
+    busy = query_busy_by_calendar(credentials, participants, real_start, real_end)
+    streams = []
+    for participant in participants:
+        if busy[participant] is None:
+            flask.flash("Can't see the calendar of {}; left out".format(participant))
+        else:
+            streams.append(busy_minutes(busy[participant]))
+
+    whole_day_appt, days = session_window()
+    with metrics.phase("complement"):
+        free_list = group.group_free(streams, whole_day_appt, days)
+    flask.g.free_events = [appt.translator_classToDict() for appt in free_list]
+    flask.g.participants = participants
+    return render('index.html')
+
+
+@app.route("/api/free")
+def api_free():
+    """
+    Free and busy time of the selected calendars as newline-delimited
+    JSON, streamed day by day: each line is one slot, shaped like the
+    entries of the /_free page, and the whole stream lists what /_free
+    does. Events to treat as free are given as "mark" query parameters.
+    """
+    if 'real_start_time' not in flask.session:
+        return flask.jsonify(error="no date range, choose a date range first"), 409
+    marks = flask.request.args.getlist("mark")
+    busy = busy_appts(marks)
+    if busy is None:
+        return flask.jsonify(error="no selected calendars, select calendars first"), 409
+    whole_day_appt, days = session_window()
+    timer = metrics.current()
+    flask.g.streamed = True
+
+    def generate():
+        # the days are worked out as they are sent, so time them here
+        # (outside the yields) and record the timings once all are sent
+        try:
+            with metrics.bind(timer):
+                sweep = freetime.iter_days(busy, whole_day_appt, days)
+                while True:
+                    with metrics.phase("complement"):
+                        entry = next(sweep, None)
+                    if entry is None:
+                        break
+                    day, busy_today, free_today = entry
+                    with metrics.phase("translate"):
+                        lines = "".join(json.dumps(appt.translator_classToDict()) + "\n"
+                                        for appt in busy_today + free_today)
+                    yield lines
+        finally:
+            if timer is not None:
+                observe_timer(timer)
+
+    return flask.Response(flask.stream_with_context(generate()),
+                          mimetype="application/x-ndjson")
+
+
+def render(template):
+    """render_template, timed as the render phase"""
+    with metrics.phase("render"):
+        return render_template(template)
+
+
+def page_key(route, user, *inputs):
+    """
+    The key (and ETag) of a page made from the session's events: a hash
+    of the route, user, inputs, date range, the user's rules and the
+    events' fingerprint. None if the page can't be kept: it would show
+    flashed messages, which are only shown once.
+    """
+    if flask.session.get("_flashes"):
+        return None
+    return page_cache.fingerprint(
+        route, user, inputs, flask.session['real_start_time'], flask.session['real_end_time'],
+        flask.session.get("daterange"), flask.session.get("events_version"),
+        flask.g.get("rules"))
+
+
+def cached_page(key):
+    """
+    The response for a page with key that needs no work: 304 if the
+    browser has it already (If-None-Match, on GET and HEAD only), the
+    kept page if PAGES has it; otherwise None
+    """
+    if key is None or not CONFIG.PAGE_CACHE_BYTES:
+        return None
+    if conditional() and flask.request.if_none_match.contains(key):
+        NOT_MODIFIED.inc(flask.request.url_rule.rule)
+        response = flask.Response(status=304)
+    else:
+        body = PAGES.get(key)
+        if body is None:
+            return None
+        response = flask.Response(body, content_type="text/html; charset=utf-8")
+    return tagged(response, key)
+
+
+def render_page(template, key):
+    """render, keeping the page in PAGES under key (and sending it as the ETag)"""
+    page = render(template)
+    if key is None or not CONFIG.PAGE_CACHE_BYTES:
+        return page
+    body = page.encode("utf-8")
+    PAGES.put(key, body)
+    return tagged(flask.Response(body, content_type="text/html; charset=utf-8"), key)
+
+
+def conditional():
+    """Is the request one that may be answered 304 (GET or HEAD)?"""
+    return flask.request.method in ("GET", "HEAD")
+
+
+def tagged(response, key):
+    """response with key as its ETag, if the request can revalidate it"""
+    if conditional():
+        response.set_etag(key)
+    return response
+
+
+def free_listing(busy, real_start=None, real_end=None):
+    """
+    The busy appointments and the free time between them, day by day
+    over the range, as dicts for the page
+    Args:
+        busy: a list of Appt
+        real_start, real_end: the range, ISO format; taken from the
+            session if not given
+    """
     # My idea is pretty straightforward but takes long time
     # traverse the date range users picked. For each day, we find the free time
     # then append the free time into free_event_list
@@ -298,41 +671,248 @@ def free():
     # update: 12/06/2017, since my class is not suitable for professor's method
     # I have to make an interface between two class.
 
-    start_date, start_time = flask.session['real_start_time'].split("T")
-    end_date, end_time = flask.session['real_end_time'].split("T")
-    days = diff_days(start_date, end_date)
-    app.logger.debug(days)
-    # Reminder: ISO format "2017/01/01T08:00:00-8:00"
-    arrow_date = arrow.get(flask.session['real_start_time'])
-    for i in range(days):
-        # get the whole day object for each day
-        new_arrow_date = arrow_date.shift(days=+i)
-        date = new_arrow_date.isoformat().split("T")[0]
-        whole_day = CalendarEvent.CalendarEvent(start_time, end_time, date, status="FREE")
-        whole_day_appt = whole_day.translator_toAppt()
-
-        # grab busy events in the same date
-        single_day_events = CalendarEvent.Agenda()
-        for event in free_naive_events_list:
-            if event.get_date() == whole_day.get_date():
-                appt = event.translator_toAppt()
-                single_day_events.append(appt)
-
-        app.logger.debug(single_day_events)
-
-        # get the free time list for each single day
-        free_time = single_day_events.complement(whole_day_appt)
-        app.logger.debug(free_time)
-        for event in free_time:
-            free_naive_appt_list.append(event)
-    app.logger.debug(free_naive_appt_list)
+    whole_day_appt, days = session_window(real_start, real_end)
+    app.logger.debug("%d days", days)
+    # update: sort the busy appts once and sweep the whole range in one pass
+    with metrics.phase("complement"):
+        if DAYS is None:
+            busy = busy + freetime.free_times(busy, whole_day_appt, days)
+            free = []
+        else:
+            # free slots as the page shows them, alike days looked up
+            free = freetime.free_entries(busy, whole_day_appt, days, DAYS)
 
     free_translated_list = []
-    for event in free_naive_appt_list:
-        free_translated_list.append(event.translator_classToDict())
-    app.logger.debug(free_translated_list)
-    flask.g.free_events = free_translated_list
-    return render_template('index.html')
+    with metrics.phase("translate"):
+        for event in busy:
+            free_translated_list.append(event.translator_classToDict())
+    free_translated_list += free
+    app.logger.debug("Busy and free: %s", applog.Summary(free_translated_list))
+    return free_translated_list
+
+
+def view_key(user):
+    """The key of the session's free time view: whose, which calendars, what range"""
+    return (user, tuple(flask.session.get("selected_calendars", [])),
+            flask.session['real_start_time'], flask.session['real_end_time'])
+
+
+def build_view(key, handle):
+    """
+    The /_free listing of a view with nothing marked, from the events
+    stored under handle; runs on the VIEWS thread, outside any request
+    """
+    user, calendar_ids, real_start, real_end = key
+    busy_lists = RESULTS.get(handle)
+    if busy_lists is None:
+        return None
+    window = session_range(real_start, real_end)
+    busy = events_busy_appts(busy_lists, EXCLUSIONS.matcher(user), window)
+    return free_listing(busy, real_start, real_end)
+
+
+# finished /_free listings, rebuilt in the background when their events
+# or the user's rules change
+VIEWS = views.ViewMaterializer(build_view, CONFIG.VIEW_MAX, CONFIG.VIEW_QUEUE,
+                               on_built=VIEW_LAG.observe)
+
+
+def busy_appts(marks):
+    """
+    The busy appointments to compute free time from: straight from
+    freebusy when nothing is to be treated as free, otherwise from the
+    events fetched by /_select. With FREE_VIEWS on (the default), plain
+    listings come from the views instead, so the freebusy path is only
+    taken with it off.
+    Args:
+        marks: a list of event ids to treat as free, on top of the
+            user's standing rules
+    return:
+        a list of Appt, or None if there are no events to use
+    """
+    matcher = EXCLUSIONS.matcher(current_user(), marks)
+    busy = None
+    if not matcher:
+        # fast path: with nothing marked as free, the busy blocks are all we
+        # need, and freebusy gives them for every calendar in one call
+        busy = freebusy_appts(
+            flask.session.get("selected_calendars", []),
+            flask.session['real_start_time'], flask.session['real_end_time'])
+    if busy is None:
+        busy = marked_busy_appts(matcher)
+    return busy
+
+
+def current_user():
+    """user_key of the session's credentials, or None if there are none"""
+    if "user" not in flask.g:
+        credentials = valid_credentials()
+        flask.g.user = user_key(credentials) if credentials else None
+    return flask.g.user
+
+
+def save_rules(user, form):
+    """
+    Keep the rules asked for on the /_free form: events always free
+    ("always", event ids), whole recurring series ("series", their
+    recurringEventId) and a summary pattern ("exclude_summary")
+    return:
+        True if any rule was asked for
+    """
+    added = False
+    for event_id in form.getlist("always"):
+        EXCLUSIONS.add(user, "id", event_id)
+        added = True
+    for series in form.getlist("series"):
+        EXCLUSIONS.add(user, "series", series)
+        added = True
+    pattern = form.get("exclude_summary", "").strip()
+    if pattern:
+        EXCLUSIONS.add(user, "summary", pattern)
+        added = True
+    return added
+
+
+def session_window(real_start=None, real_end=None):
+    """
+    The daily window of the session's range (or of real_start to
+    real_end), as an Appt on the first day, and the number of days
+    in the range
+    """
+    offset, first, last = session_range(real_start, real_end)
+    days = last // CalendarEvent.DAY_MINUTES - first // CalendarEvent.DAY_MINUTES
+    # the first day, from the start time to the end time of the range
+    end = first - first % CalendarEvent.DAY_MINUTES + last % CalendarEvent.DAY_MINUTES
+    return CalendarEvent.Appt.from_minutes(first, end, None, CalendarEvent.FREE), days
+
+
+def session_range(real_start=None, real_end=None):
+    """
+    The picked range as ints: (utc offset of real_start in seconds,
+    local epoch minutes of real_start, and of real_end). Each end is
+    on the wall clock of its own date, at the offset it was written in,
+    so the daily hours stay put across a daylight saving change; times
+    compared with them go on their own date's clock too.
+    Args:
+        real_start, real_end: the range, ISO format; taken from the
+            session if not given
+    """
+    if real_start is None:
+        real_start = flask.session['real_start_time']
+        real_end = flask.session['real_end_time']
+    start, offset = timeparse.split(real_start)
+    end, end_offset = timeparse.split(real_end)
+    return (offset, timeparse.local_minutes(start, offset),
+            timeparse.local_minutes(end, end_offset))
+
+
+def marked_busy_appts(matcher):
+    """
+    The busy appointments of the events fetched by /_select,
+    leaving out the events to treat as free
+    Args:
+        matcher: an exclusions.Matcher of the marks and the user's rules
+    return:
+        a list of Appt, or None if the events are no longer stored
+    """
+    busy_lists = RESULTS.get(flask.session.get("events_handle"))
+    if busy_lists is None:
+        return None
+    return events_busy_appts(busy_lists, matcher, session_range())
+
+
+def events_busy_appts(busy_lists, matcher, window):
+    """
+    The busy appointments of some fetched events, cut to the range's
+    days and daily hours as freebusy blocks are (see window_appts)
+    Args:
+        busy_lists: event lists, one per calendar, as list_events gives them
+        matcher: an exclusions.Matcher of the events to leave out
+        window: the range, as session_range gives it
+    return:
+        a list of Appt
+    """
+    free_events_list = []
+
+    # get all selected events into a single list, leaving out those
+    # marked or ruled free (a set lookup per event)
+    for calendar in busy_lists:
+        free_events_list += matcher.filter(calendar)
+    app.logger.debug("Busy events: %s", applog.Summary(free_events_list))
+    free_naive_appt_list = []
+    with metrics.phase("translate"):
+        for event in free_events_list:
+            # on the clock the event was written in, as event_filter has it
+            offset = event["offset"]
+            free_naive_appt_list += window_appts(
+                timeparse.local_minutes(event["begin"], offset),
+                timeparse.local_minutes(event["end"], offset),
+                window, event["description"])
+    return free_naive_appt_list
+
+
+def window_appts(begin, end, window, desc):
+    """
+    Busy time from begin to end (epoch minutes) as Appts within the
+    range's days and daily hours, one per day: left out where it is
+    outside them, cut to them where it is partly in (event_filter's rule).
+    Events and freebusy blocks both go through here, so that the two
+    paths give the same free time.
+    """
+    offset, first, last = window
+    day = CalendarEvent.DAY_MINUTES
+    return freetime.clip_days(max(begin, first), min(end, last),
+                              first % day, last % day, desc, CalendarEvent.BUSY)
+
+
+def freebusy_appts(calendar_ids, real_start, real_end):
+    """
+    The busy appointments of some calendars, straight from the
+    freebusy endpoint: no summaries or descriptions, one call for all
+    calendars. Busy blocks are cut to the range's days and daily hours,
+    as the events are.
+    Args:
+        calendar_ids: a list of calendarId
+        real_start, real_end: the date range, ISO format
+    return:
+        a list of Appt, or None if freebusy can't answer (no credentials,
+        no calendars, or an error on one of the calendars)
+    """
+    if not calendar_ids:
+        return None
+    credentials = valid_credentials()
+    if not credentials:
+        return None
+    busy = query_busy(credentials, calendar_ids, real_start, real_end)
+    if busy is None:
+        return None
+    return freebusy_blocks(busy, real_start, real_end)
+
+
+def freebusy_blocks(busy, real_start, real_end):
+    """Busy periods from freebusy as Appts, through window_appts"""
+    window = session_range(real_start, real_end)
+    appts = []
+    for begin, end in busy_minutes(busy):
+        appts += window_appts(begin, end, window, "busy")
+    return appts
+
+
+def busy_minutes(busy):
+    """
+    Busy periods from freebusy as (begin, end) epoch minutes, sorted.
+    Busy times come back in UTC; each goes onto the clock LOCAL_ZONE
+    has at that time, as the range does.
+    """
+    minutes = []
+    with metrics.phase("translate"):
+        for period in busy:
+            begin = timeparse.parse(period["start"])
+            end = timeparse.parse(period["end"])
+            minutes.append((timeparse.local_minutes(begin, timeparse.zone_offset(begin, LOCAL_ZONE)),
+                            timeparse.local_minutes(end, timeparse.zone_offset(end, LOCAL_ZONE))))
+        minutes.sort()
+    return minutes
 
 
 ####
@@ -388,10 +968,10 @@ def interpret_time(text):
     case it will also flash a message explaining accepted formats.
     """
     # I still keep these codes because I use splice_real_time to deal with this case
-    app.logger.debug("Decoding time '{}'".format(text))
+    app.logger.debug("Decoding time '%s'", text)
     time_formats = ["ha", "h:mma", "h:mm a", "H:mm"]
     try:
-        as_arrow = arrow.get(text, time_formats).replace(tzinfo=tz.tzlocal())
+        as_arrow = arrow.get(text, time_formats).replace(tzinfo=LOCAL_ZONE)
         as_arrow = as_arrow.replace(year=2016)  # HACK see below
         app.logger.debug("Succeeded interpreting time")
     except:
@@ -417,7 +997,7 @@ def interpret_date(text):
     """
     try:
         as_arrow = arrow.get(text, "MM/DD/YYYY").replace(
-            tzinfo=tz.tzlocal())
+            tzinfo=LOCAL_ZONE)
     except:
         flask.flash("Date '{}' didn't fit expected format 12/31/2001")
         raise
@@ -432,15 +1012,6 @@ def next_day(isotext):
     return as_arrow.replace(days=+1).isoformat()
 
 
-def diff_days(date1, date2):
-    """
-    return the days between two dates
-    """
-    d1 = datetime.strptime(date1, "%Y-%m-%d")
-    d2 = datetime.strptime(date2, "%Y-%m-%d")
-    return abs((d2 - d1).days)
-
-
 ####
 #
 #  Functions (NOT pages) that return some information
@@ -456,8 +1027,17 @@ def list_calendars(service):
     Google Calendars web app) calendars before unselected calendars.
     """
     app.logger.debug("Entering list_calendars")
-    calendar_list = service.calendarList().list().execute()["items"]
-    app.logger.debug(calendar_list)
+    with metrics.phase("google"):
+        calendar_list = service.calendarList().list().execute()["items"]
+    return calendar_entries(calendar_list)
+
+
+def calendar_entries(calendar_list):
+    """
+    The calendars of a calendarList response's items, as list_calendars
+    gives them
+    """
+    app.logger.debug("Calendar list: %s", applog.Summary(calendar_list))
     result = []
     for cal in calendar_list:
         kind = cal["kind"]
@@ -479,24 +1059,167 @@ def list_calendars(service):
              "primary": primary,
              "description": desc
              })
-    app.logger.debug(result)
     return sorted(result, key=cal_sort_key)
 
 
-def list_events(service, calendar_id):
+def fetch_calendars(credentials, calendar_ids, real_start, real_end):
     """
-    Given a specified calendar, return a list of events which belong
-    to this calendar
+    Fetch the events of several calendars at once, on a thread pool of at
+    most CONFIG.FETCH_WORKERS threads. Each fetch takes its own service
+    object, since an httplib2 connection can't be shared between threads.
+    Calendars prefetched after /choose are taken from PREFETCH instead
+    (waiting for them if they are still on their way).
+    Args:
+        credentials: OAuth2 credentials
+        calendar_ids: a list of calendarId
+        real_start, real_end: the date range, ISO format
+    return:
+        a list of event lists, one per calendar in the order of calendar_ids
+    """
+    user = user_key(credentials)
+    timer = metrics.current()
+    trace = applog.current()
+
+    def fetch(calendar_id):
+        # worker threads add their time and log lines to the request's
+        with metrics.bind(timer), applog.bind(trace):
+            return fetch_events(credentials, user, calendar_id, real_start, real_end)
+
+    calendars = [None] * len(calendar_ids)
+    if CONFIG.PREFETCH:
+        with metrics.phase("prefetch"):
+            for i, calendar_id in enumerate(calendar_ids):
+                calendars[i] = PREFETCH.take((user, calendar_id, real_start, real_end))
+    missing = [i for i, events in enumerate(calendars) if events is None]
+    workers = min(CONFIG.FETCH_WORKERS, len(missing))
+    if async_events(user):
+        fetched = fetch_events_async(credentials, [calendar_ids[i] for i in missing],
+                                     real_start, real_end)
+    elif workers <= 1:
+        fetched = [fetch(calendar_ids[i]) for i in missing]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fetched = list(pool.map(fetch, [calendar_ids[i] for i in missing]))
+    for i, events in zip(missing, fetched):
+        calendars[i] = events
+    EVENTS_FETCHED.inc(amount=sum(len(events) for events in calendars))
+    return calendars
+
+
+def fetch_events(credentials, user, calendar_id, real_start, real_end):
+    """All the events of one calendar in the range, as a list (see list_events)"""
+    if async_events(user):
+        return fetch_events_async(credentials, [calendar_id], real_start, real_end)[0]
+    CALENDARS_QUERIED.inc("events")
+    with SERVICES.service(credentials) as service:
+        return list(list_events(service, calendar_id, real_start, real_end, user))
+
+
+def async_events(user):
+    """Do events come through CALENDAR_CLIENT? (The sync store needs a service)"""
+    return CALENDAR_CLIENT is not None and (SYNC_STORE is None or user is None)
+
+
+def fetch_events_async(credentials, calendar_ids, real_start, real_end):
+    """
+    The events of several calendars, all fetched at once on CALENDAR_CLIENT,
+    as lists in the order of calendar_ids (see list_events)
+    """
+    if not calendar_ids:
+        return []
+    CALENDARS_QUERIED.inc("events", amount=len(calendar_ids))
+    with metrics.phase("google"):
+        pages = CALENDAR_CLIENT.events(credentials.access_token, calendar_ids,
+                                       events_query(real_start, real_end))
+    window = session_range(real_start, real_end)
+    calendars = []
+    for items in pages:
+        if CONFIG.LOCAL_RECURRENCE:
+            items = recurrence.expand_items(
+                items, timeparse.parse(real_start), timeparse.parse(real_end))
+        calendars.append(list(slim_events(items, window)))
+    return calendars
+
+
+def prefetch_calendars(credentials, calendar_ids, real_start, real_end):
+    """
+    Start fetching the events of some calendars in the background, for
+    fetch_calendars to take later
+    """
+    user = user_key(credentials)
+    for calendar_id in calendar_ids:
+        PREFETCH.start((user, calendar_id, real_start, real_end), fetch_events,
+                       credentials, user, calendar_id, real_start, real_end)
+
+
+# calendars fetched after /choose, before /_select asks for them
+PREFETCH = prefetch.Prefetcher(CONFIG.PREFETCH_WORKERS, CONFIG.PREFETCH_TTL,
+                               CONFIG.PREFETCH_MAX)
+
+
+def list_events(service, calendar_id, real_start=None, real_end=None, user=None):
+    """
+    Given a specified calendar, return an iterator of the events which belong
+    to this calendar, one at a time, in order of start time.
+    Only the session's date range is asked for, with just the fields
+    we use, one page at a time (the next page is only fetched when
+    the caller gets that far).
     Args
         service: a google calendar service object
         calendar: a specified calendarId
+        real_start, real_end: the date range, ISO format; taken from
+            the session if not given (they must be given off the request thread)
+        user: a key for the signed-in user (see user_key); with a sync store
+            configured, the calendar is synced into it and read back from it
+    With LOCAL_RECURRENCE set (and no sync store), recurring events come
+    as one master each and are expanded here (see recurrence.py).
     return:
-        events, a sorted list of event according to start time
+        events, dictionaries in order of start time; times are parsed here,
+        once, into UTC epoch seconds ("begin", "end") and the utc offset
+        they were given in, in seconds ("offset", for display)
     """
     app.logger.debug("Begin to retrieve events of calendar")
-    event_list = service.events().list(calendarId=calendar_id).execute()["items"]
-    events = []
-    for event in event_list:
+    if real_start is None:
+        real_start = flask.session['real_start_time']
+        real_end = flask.session['real_end_time']
+    if SYNC_STORE is not None and user is not None:
+        SYNC_STORE.sync(service, user, calendar_id)
+        source = SYNC_STORE.events(user, calendar_id,
+                                   timeparse.parse(real_start), timeparse.parse(real_end))
+    else:
+        request = service.events().list(calendarId=calendar_id,
+                                        **events_query(real_start, real_end))
+        source = iter_items(request, service.events().list_next)
+        if CONFIG.LOCAL_RECURRENCE:
+            source = recurrence.expand_items(
+                source, timeparse.parse(real_start), timeparse.parse(real_end))
+    return slim_events(source, session_range(real_start, real_end))
+
+
+def events_query(real_start, real_end):
+    """The arguments of our events.list calls, but the calendarId"""
+    if CONFIG.LOCAL_RECURRENCE:
+        # each series once, with only its changed instances; expanded here
+        return {"timeMin": real_start,
+                "timeMax": real_end,
+                "singleEvents": False,
+                "fields": MASTER_FIELDS}
+    return {"timeMin": real_start,
+            "timeMax": real_end,
+            "singleEvents": True,  # recurring events as instances, so the server can sort
+            "orderBy": "startTime",
+            "fields": EVENT_FIELDS}
+
+
+def slim_events(source, window):
+    """
+    Yield the events of source (Google's event items) that we show, in
+    the shape list_events gives them
+    Args:
+        source: event items, in order of start time
+        window: the range, as session_range gives it
+    """
+    for event in source:
 
         # Deal with some non-standard event entries
         if event["status"] == "cancelled":
@@ -522,55 +1245,133 @@ def list_events(service, calendar_id):
         except KeyError:
             continue
         id = event["id"]
-        app.logger.debug(event_filter(start_time, end_time))
-        if event_filter(start_time, end_time):
-            # start_time sample: 2017/01/01T14:00:00-8:00
-            events.append(
-                {"id": id,
-                 "summary": summary,
-                 "description": desc,
-                 "start_time": start_time,
-                 "end_time": end_time,
-                 }
-            )
-    events.sort(key=lambda e: e["start_time"])
-    app.logger.debug(events)
-    return events
-
-
-def event_filter(event_start, event_end):
-    """
-    A event filter. Return true events if and only if the event happens or ends during the start/end date/time where users picked
+        # start_time sample: 2017-01-01T14:00:00-08:00
+        begin, offset = timeparse.split(start_time)
+        end = timeparse.parse(end_time)
+        if event_filter(begin, end, window, offset):
+            slim = {"id": id,
+                    "summary": summary,
+                    "description": desc,
+                    "begin": begin,
+                    "end": end,
+                    "offset": offset,
+                    }
+            if "recurringEventId" in event:
+                # instances of one series share it; rules can match on it
+                slim["recurringEventId"] = event["recurringEventId"]
+            yield slim
+
+
+def query_busy(credentials, calendar_ids, real_start, real_end):
+    """
+    Ask the freebusy endpoint for the busy times of several calendars
     Args:
-        event_start: a specified event time to start, ISO format
-        event_end: a specified event time to end, ISO format
+        credentials: OAuth2 credentials
+        calendar_ids: a list of calendarId
+        real_start, real_end: the date range, ISO format
     return:
-        True if the event is in the right time otherwise false
+        a list of {"start": ..., "end": ...} busy periods of all the
+        calendars, or None if any calendar reports errors
     """
-    e_start_date, e_start_time = event_start.split("T")
-    e_end_date, e_end_time = event_end.split("T")
-    start_date, start_time = flask.session['real_start_time'].split("T")
-    end_date, end_time = flask.session['real_end_time'].split("T")
-    return ((start_date <= e_start_date <= e_end_date <= end_date) and
-            (start_time <= e_start_time <= e_end_time <= end_time))
+    busy = []
+    for calendar_id, periods in query_busy_by_calendar(
+            credentials, calendar_ids, real_start, real_end).items():
+        if periods is None:
+            return None
+        busy += periods
+    return busy
 
 
-def translator_dictToObject(event):
+def query_busy_by_calendar(credentials, calendar_ids, real_start, real_end):
+    """
+    Ask the freebusy endpoint for the busy times of each of several
+    calendars, FREEBUSY_MAX_CALENDARS per call (all calls at once on
+    CALENDAR_CLIENT, if there is one)
+    Args:
+        credentials: OAuth2 credentials
+        calendar_ids: a list of calendarId
+        real_start, real_end: the date range, ISO format
+    return:
+        a dict calendarId -> list of {"start": ..., "end": ...} busy periods,
+        or -> None for a calendar that reports errors (e.g. not shared with
+        us) or isn't in the response, whose busy times we don't know
+    """
+    app.logger.debug("Query free/busy of %d calendars", len(calendar_ids))
+    chunks = [calendar_ids[first:first + FREEBUSY_MAX_CALENDARS]
+              for first in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS)]
+    bodies = [{"timeMin": real_start,
+               "timeMax": real_end,
+               "items": [{"id": calendar_id} for calendar_id in chunk]}
+              for chunk in chunks]
+    CALENDARS_QUERIED.inc("freebusy", amount=len(calendar_ids))
+    if CALENDAR_CLIENT is not None:
+        with metrics.phase("google"):
+            responses = CALENDAR_CLIENT.freebusy(credentials.access_token, bodies)
+    else:
+        responses = []
+        with SERVICES.service(credentials) as service:
+            for body in bodies:
+                with metrics.phase("google"):
+                    responses.append(accept_gzip(service.freebusy().query(body=body)).execute())
+    result = {}
+    for chunk, response in zip(chunks, responses):
+        for calendar_id in chunk:
+            calendar = response.get("calendars", {}).get(calendar_id)
+            if calendar is None:
+                app.logger.debug("Free/busy left out %s", calendar_id)
+                result[calendar_id] = None
+            elif calendar.get("errors"):
+                app.logger.debug("Free/busy failed for %s: %s",
+                                 calendar_id, applog.Summary(calendar["errors"]))
+                result[calendar_id] = None
+            else:
+                result[calendar_id] = calendar.get("busy", [])
+    return result
+
+
+def event_filter(begin, end, window=None, offset=None):
+    """
+    A event filter. Return true events if and only if some of the event falls within the start/end date/time where users picked
+    Args:
+        begin, end: the event's start and end, UTC epoch seconds
+        window: the picked range, as session_range gives it; the
+            session's if not given
+        offset: the utc offset (seconds) of the event's clock, the one
+            its start was written in; LOCAL_ZONE's then if not given
+    return:
+        True if the event is in the right time otherwise false
+    """
+    first, last = (window or session_range())[1:]
+    if offset is None:
+        offset = timeparse.zone_offset(begin, LOCAL_ZONE)
+    begin = max(timeparse.local_minutes(begin, offset), first)
+    end = min(timeparse.local_minutes(end, offset), last)
+    day = CalendarEvent.DAY_MINUTES
+    # meets the daily hours of one of the range's days (the busy time
+    # shown is cut to them; see window_appts)
+    return begin < end and freetime.overlaps_days(begin, end, first % day, last % day)
+
+
+def translator_dictToObject(event, offset=None):
     """
     translate events whose type is dictionary in python to type "Event"
     Args:
         event: a dictionary, which contains infos of an event
+            (as list_events gives them)
+        offset: the utc offset (seconds) of the clock to put it on;
+            the event's own if not given
     return:
-        event_obj: an Event object
+        event_obj: an Event object, on the start day from the start
+            time to the end time
     """
-    s_time = event["start_time"].split("T")[1]
-    e_time = event["end_time"].split("T")[1]
-    date = event["start_time"].split("T")[0]
-    id = event["id"]
-    summary = event["summary"]
-    desc = event["description"]
-    event_obj = CalendarEvent.CalendarEvent(s_time, e_time, date, summary, desc, id)
-    return event_obj
+    if offset is None:
+        offset = event["offset"]
+    begin = timeparse.local_minutes(event["begin"], offset)
+    end = timeparse.local_minutes(event["end"], offset)
+    end = begin - begin % CalendarEvent.DAY_MINUTES + end % CalendarEvent.DAY_MINUTES
+    return CalendarEvent.CalendarEvent.from_minutes(
+        begin, end, timeparse.offset_text(offset),
+        event["summary"], event["description"], event["id"])
 
 
 def cal_sort_key(cal):
@@ -596,6 +1397,12 @@ def cal_sort_key(cal):
 #
 #################
 
+@app.template_filter('localtime')
+def format_local_time(epoch, offset):
+    """UTC epoch seconds -> ISO format on the clock at offset (seconds)"""
+    return timeparse.format_local(epoch, offset)
+
+
 @app.template_filter('fmtdate')
 def format_arrow_date(date):
     try:
@@ -0,0 +1,281 @@
+"""
+Free time engine for a whole date range.
+
+The old way computed free time one day at a time: build an Agenda of the
+day's busy events (scanning every event for every day), then complement it
+(sorting a copy every time). Here we sort all busy appointments once and
+walk the date range with a single pointer, so the whole range costs
+O(n log n + days + n) instead of O(days * n).
+
+For the /_free page, most days of a long range look alike (empty, or the
+same standup). free_entries keeps each day's finished free slots in a
+DayCache by the day's shape, as minutes from its midnight; a day shaped
+like one seen before only puts its date in front of the stored times.
+"""
+import collections
+import datetime
+import threading
+
+from Model.CalendarEvent import Appt, DAY_MINUTES
+
+
+def iter_free_days(busy_appts, freeblock, days):
+    """
+    Sweep the busy appointments over `days` consecutive days and
+    yield the free appointments of each day.
+    Args:
+        busy_appts: an iterable of Appt, in any order
+        freeblock: an Appt, the daily window on the first day
+            Example: 2017-11-16 from 08:00 to 17:00
+        days: number of days to sweep, starting at freeblock's day
+    Yield:
+        (date, free), date is a datetime.date and free is a list of Appt
+        covering the parts of that day's window not covered by busy time.
+        Free appointments take their description and status from freeblock.
+    """
+    busy = sorted(busy_appts, key=lambda appt: appt.begin_min)
+    desc = freeblock.desc
+    status = freeblock.status
+    window_begin = freeblock.begin_min
+    window_end = freeblock.end_min
+    first_day = freeblock.begin.date()
+    i = 0
+    carry = None  # latest end among the appointments already swept
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        # everything starting before the window can only push its start back
+        while i < len(busy) and busy[i].begin_min <= window_begin:
+            if carry is None or busy[i].end_min > carry:
+                carry = busy[i].end_min
+            i += 1
+        cur_time = window_begin
+        if carry is not None and carry > cur_time:
+            cur_time = carry
+        free = []
+        while i < len(busy) and busy[i].begin_min < window_end:
+            appt = busy[i]
+            if cur_time < appt.begin_min:
+                free.append(Appt.from_minutes(cur_time, appt.begin_min, desc, status))
+            if appt.end_min > cur_time:
+                cur_time = appt.end_min
+            if carry is None or appt.end_min > carry:
+                carry = appt.end_min
+            i += 1
+        if cur_time < window_end:
+            free.append(Appt.from_minutes(cur_time, window_end, desc, status))
+        yield day, free
+        window_begin += DAY_MINUTES
+        window_end += DAY_MINUTES
+
+
+def free_times(busy_appts, freeblock, days):
+    """
+    Free appointments of the whole range, in order, as one list.
+    See iter_free_days for the arguments.
+    """
+    result = []
+    for day, free in iter_free_days(busy_appts, freeblock, days):
+        result += free
+    return result
+
+
+def iter_days(busy_appts, freeblock, days):
+    """
+    Like iter_free_days, but with each day's busy appointments too.
+    Yield:
+        (date, busy, free): the busy appointments starting that day
+        (those before the first day come with it) and the free ones.
+        Busy appointments starting after the last day follow, by the
+        day they start on, with no free time, so all of busy_appts is
+        given as free_times' callers list it.
+    """
+    busy = sorted(busy_appts, key=lambda appt: appt.begin_min)
+    j = 0
+    midnight = freeblock.begin_min - freeblock.begin_min % DAY_MINUTES
+    for day, free in iter_free_days(busy, freeblock, days):
+        midnight += DAY_MINUTES
+        today = []
+        while j < len(busy) and busy[j].begin_min < midnight:
+            today.append(busy[j])
+            j += 1
+        yield day, today, free
+    while j < len(busy):
+        day = busy[j].begin.date()
+        midnight = busy[j].begin_min - busy[j].begin_min % DAY_MINUTES + DAY_MINUTES
+        today = []
+        while j < len(busy) and busy[j].begin_min < midnight:
+            today.append(busy[j])
+            j += 1
+        yield day, today, []
+
+
+class DayCache:
+    """LRU of a day's free slots, as the page shows them, by the day's shape."""
+
+    def __init__(self, max_entries=4096):
+        """
+        Args:
+            max_entries: most day shapes kept
+        """
+        self.max_entries = max_entries
+        self.days = collections.OrderedDict()  # shape -> (("-HH:MM", "-HH:MM"), ...)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def slots(self, shape):
+        """
+        The free slots of a day shape (see iter_day_shapes), as pairs
+        of their times of day, "-HH:MM"
+        """
+        with self.lock:
+            slots = self.days.get(shape)
+            if slots is not None:
+                self.days.move_to_end(shape)
+                self.hits += 1
+                return slots
+            self.misses += 1
+        slots = tuple((clock(begin), clock(end))
+                      for begin, end in day_gaps(shape[0], shape[1],
+                                                 zip(shape[2::2], shape[3::2])))
+        with self.lock:
+            self.days[shape] = slots
+            while len(self.days) > self.max_entries:
+                self.days.popitem(last=False)
+                self.evictions += 1
+        return slots
+
+    def stats(self):
+        """Counters and day shapes kept, as a dict"""
+        with self.lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": len(self.days)}
+
+
+def day_gaps(start, end, blocks):
+    """
+    The parts of [start, end) not covered by blocks, an iterable of
+    (begin, end) sorted by begin, as a list of (begin, end)
+    """
+    gaps = []
+    cur_time = start
+    for begin, finish in blocks:
+        if cur_time < begin:
+            gaps.append((cur_time, begin))
+        if finish > cur_time:
+            cur_time = finish
+    if cur_time < end:
+        gaps.append((cur_time, end))
+    return gaps
+
+
+def clock(minutes):
+    """minutes from midnight -> "-HH:MM", the time part of the page's times"""
+    return "-{:02d}:{:02d}".format(minutes // 60, minutes % 60)
+
+
+def iter_day_shapes(busy_appts, freeblock, days):
+    """
+    The sweep of iter_free_days, yielding each day's shape instead of
+    its free time.
+    Yield:
+        (date, shape), shape is (start, end, begin, end, begin, end, ...)
+        in minutes from that day's midnight: where free time may start
+        (after busy time carried over), where the window ends, and the
+        busy blocks in the window, cut at its end, in order
+    """
+    busy = sorted(busy_appts, key=lambda appt: appt.begin_min)
+    window_begin = freeblock.begin_min
+    window_end = freeblock.end_min
+    midnight = window_begin - window_begin % DAY_MINUTES
+    first_day = freeblock.begin.date()
+    i = 0
+    carry = None  # latest end among the appointments already swept
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        while i < len(busy) and busy[i].begin_min <= window_begin:
+            if carry is None or busy[i].end_min > carry:
+                carry = busy[i].end_min
+            i += 1
+        start = window_begin
+        if carry is not None and carry > start:
+            start = carry if carry < window_end else window_end
+        shape = [start - midnight, window_end - midnight]
+        while i < len(busy) and busy[i].begin_min < window_end:
+            end = busy[i].end_min
+            shape.append(busy[i].begin_min - midnight)
+            shape.append((end if end < window_end else window_end) - midnight)
+            if carry is None or end > carry:
+                carry = end
+            i += 1
+        yield day, tuple(shape)
+        window_begin += DAY_MINUTES
+        window_end += DAY_MINUTES
+        midnight += DAY_MINUTES
+
+
+def free_entries(busy_appts, freeblock, days, cache):
+    """
+    The free slots of the whole range as the /_free page lists them
+    (dicts, as Appt.translator_classToDict gives them), each day shape
+    worked out once through cache, a DayCache.
+    See iter_free_days for the other arguments.
+    """
+    desc = freeblock.desc
+    status = freeblock.status
+    entries = []
+    for day, shape in iter_day_shapes(busy_appts, freeblock, days):
+        date = "{:04d}/{:02d}/{:02d}".format(day.year, day.month, day.day)
+        for begin, end in cache.slots(shape):
+            entries.append({"start_time": date + begin,
+                            "end_time": date + end,
+                            "description": desc,
+                            "status": status})
+    return entries
+
+
+def clip_days(begin, end, opens, closes, desc, status):
+    """
+    Appointments covering [begin, end) (epoch minutes) within the daily
+    hours [opens, closes) (minutes from midnight), one per day
+    """
+    appts = []
+    midnight = begin - begin % DAY_MINUTES
+    while midnight < end:
+        start = max(begin, midnight + opens)
+        stop = min(end, midnight + closes)
+        if start < stop:
+            appts.append(Appt.from_minutes(start, stop, desc, status))
+        midnight += DAY_MINUTES
+    return appts
+
+
+def overlaps_days(begin, end, opens, closes):
+    """
+    Does [begin, end) (epoch minutes) meet the daily hours [opens,
+    closes) (minutes from midnight) of any of its days, i.e. would
+    clip_days give any appointment?
+    """
+    midnight = begin - begin % DAY_MINUTES
+    while midnight < end:
+        if max(begin, midnight + opens) < min(end, midnight + closes):
+            return True
+        midnight += DAY_MINUTES
+    return False
+
+
+def split_days(begin, end, desc, status):
+    """
+    Appointments covering [begin, end) (epoch minutes), cut at each
+    midnight, since an Appt can't run past the end of its day.
+    """
+    appts = []
+    while begin < end:
+        midnight = (begin // DAY_MINUTES + 1) * DAY_MINUTES
+        stop = min(end, midnight)
+        appts.append(Appt.from_minutes(begin, stop, desc, status))
+        begin = stop
+    return appts
@@ -0,0 +1,44 @@
+"""
+Helpers for Google API requests: paging and compression.
+These work on any googleapiclient request object, so they are
+shared by the event listing and the sync store.
+"""
+
+import metrics
+
+USER_AGENT = "MeetMe class project"
+
+
+def iter_pages(request, list_next):
+    """
+    Yield the responses of a paged Google API list request, asking for
+    the next page (with list_next) only after the previous one is used up.
+    Args:
+        request: the request for the first page
+        list_next: the collection's *_next method, e.g. service.events().list_next
+    """
+    while request is not None:
+        with metrics.phase("google"):
+            response = accept_gzip(request).execute()
+        yield response
+        request = list_next(request, response)
+
+
+def iter_items(request, list_next):
+    """
+    Yield the items of a paged Google API list request, one page at a time.
+    See iter_pages for the arguments.
+    """
+    for response in iter_pages(request, list_next):
+        for item in response.get("items", []):
+            yield item
+
+
+def accept_gzip(request):
+    """
+    Ask for a gzip-compressed response. Google only compresses
+    when the User-Agent also mentions gzip.
+    """
+    request.headers["accept-encoding"] = "gzip"
+    request.headers["user-agent"] = USER_AGENT + " (gzip)"
+    return request
@@ -0,0 +1,122 @@
+"""
+A non-blocking client for the Calendar calls we make, for asgi_main.
+
+The discovery-built service talks through httplib2, one blocking call
+at a time, so fetching several calendars takes a thread (and a service
+and a connection) each. AsyncCalendar makes the same few REST calls
+(calendar list, events, freebusy) with httpx on an asyncio event loop:
+every calendar of a request, every freebusy chunk, and the calls of all
+the requests in flight share one loop and one pool of kept-alive
+connections, with at most `concurrency` calls per request at once.
+
+The Flask views stay as they are, synchronous, on the threads of the
+ASGI bridge. They reach the loop through a BlockingCalendar, which runs
+a coroutine there and waits for its result.
+
+Errors come back as httpx.HTTPStatusError (the discovery client raises
+HttpError); pages are fetched in order, as each one names the next.
+"""
+import asyncio
+import urllib.parse
+
+import httpx
+
+import gapi
+
+GOOGLE_ROOT = "https://www.googleapis.com/"
+API_PATH = "calendar/v3/"
+
+
+class AsyncCalendar:
+    """The calendar list, events and freebusy, over one httpx.AsyncClient."""
+
+    def __init__(self, root=None, connections=100, concurrency=8, timeout=30.0):
+        """
+        Args:
+            root: root URL of the API (CALENDAR_API_ROOT); Google's if None
+            connections: most connections open at once, for all requests
+            concurrency: most calls at once for one request
+            timeout: seconds to wait for any one call
+        """
+        self.base = (root or GOOGLE_ROOT) + API_PATH
+        self.concurrency = concurrency
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=connections,
+                                max_keepalive_connections=connections),
+            headers={"user-agent": gapi.USER_AGENT + " (gzip)",
+                     "accept-encoding": "gzip"})
+
+    async def call(self, token, method, path, params=None, body=None):
+        """One API call; the decoded JSON response"""
+        response = await self.client.request(
+            method, self.base + path, params=params, json=body,
+            headers={"authorization": "Bearer " + token})
+        response.raise_for_status()
+        return response.json()
+
+    async def items(self, token, path, params):
+        """The items of every page of a list call"""
+        params = dict(params)
+        items = []
+        while True:
+            response = await self.call(token, "GET", path, params)
+            items += response.get("items", [])
+            if "nextPageToken" not in response:
+                return items
+            params["pageToken"] = response["nextPageToken"]
+
+    async def calendar_list(self, token):
+        return await self.items(token, "users/me/calendarList", {})
+
+    async def events(self, token, calendar_ids, params):
+        """
+        The raw event items of each calendar, in the order of
+        calendar_ids, fetched concurrently
+        Args:
+            params: the events.list query (timeMin, timeMax, ...)
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def one(calendar_id):
+            async with limit:
+                path = "calendars/{}/events".format(urllib.parse.quote(calendar_id, safe=""))
+                return await self.items(token, path, params)
+        return await asyncio.gather(*(one(calendar_id) for calendar_id in calendar_ids))
+
+    async def freebusy(self, token, bodies):
+        """The responses to several freebusy queries, fetched concurrently"""
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def one(body):
+            async with limit:
+                return await self.call(token, "POST", "freeBusy", body=body)
+        return await asyncio.gather(*(one(body) for body in bodies))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class BlockingCalendar:
+    """An AsyncCalendar for code on other threads: each call waits for the loop"""
+
+    def __init__(self, calendar, loop):
+        """
+        Args:
+            calendar: an AsyncCalendar
+            loop: the running event loop it belongs to
+        """
+        self.calendar = calendar
+        self.loop = loop
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def calendar_list(self, token):
+        return self.run(self.calendar.calendar_list(token))
+
+    def events(self, token, calendar_ids, params):
+        return self.run(self.calendar.events(token, calendar_ids, params))
+
+    def freebusy(self, token, bodies):
+        return self.run(self.calendar.freebusy(token, bodies))
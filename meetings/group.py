@@ -0,0 +1,60 @@
+"""
+Common free time of a group.
+
+Each participant's busy times come as a stream sorted by begin (as the
+freebusy endpoint returns them). The streams are merged with a heap
+(heapq.merge), k at a time, and overlapping blocks are joined as they
+go by, like Agenda.normalize. The group's free time is then the
+complement of that merged busy time within the daily window, which is
+the same as intersecting every participant's free time (Agenda.intersect)
+without ever pairing one participant's blocks with another's.
+Cost: O(n log k) for n busy blocks among k participants.
+"""
+import heapq
+
+import freetime
+from Model.CalendarEvent import BUSY
+
+
+def merge_busy(streams):
+    """
+    Union of several busy streams, in order.
+    Args:
+        streams: iterables of (begin, end) epoch minutes, each sorted by begin
+    Yield:
+        (begin, end), sorted and not overlapping; blocks that only touch
+        are kept apart, as in Agenda.normalize
+    """
+    cur_begin = None
+    cur_end = None
+    for begin, end in heapq.merge(*streams):
+        if cur_end is None:
+            cur_begin, cur_end = begin, end
+        elif begin < cur_end:
+            cur_end = max(cur_end, end)
+        else:
+            yield cur_begin, cur_end
+            cur_begin, cur_end = begin, end
+    if cur_end is not None:
+        yield cur_begin, cur_end
+
+
+def group_busy(streams, desc="busy"):
+    """The merged busy time of everyone, as Appts cut at midnight"""
+    appts = []
+    for begin, end in merge_busy(streams):
+        appts += freetime.split_days(begin, end, desc, BUSY)
+    return appts
+
+
+def group_free(streams, freeblock, days):
+    """
+    Free appointments common to everyone, over `days` days.
+    Args:
+        streams: one iterable of (begin, end) epoch minutes per participant,
+            each sorted by begin
+        freeblock: an Appt, the daily window on the first day
+        days: number of days
+    """
+    # already in order, so the sweep's sort is a single pass
+    return freetime.free_times(group_busy(streams), freeblock, days)
@@ -0,0 +1,115 @@
+"""
+Keep-alive HTTP transport for the Google API calls.
+
+An httplib2.Http keeps its connections open between requests, but a new
+Http per request throws them away, so every call paid for a new TCP and
+TLS handshake to googleapis.com. HttpPool keeps finished Http objects,
+with their open connections, and hands them out again.
+
+An Http object is not thread safe, so the pool gives each one to a
+single user at a time. Credentials are attached with
+credentials.authorize(http) as before; release() takes them off again
+so the next user starts clean. Connections left idle longer than the
+idle timeout are closed rather than reused.
+"""
+import threading
+import time
+
+import httplib2
+
+
+class PooledHttp(httplib2.Http):
+    """An httplib2.Http that reports new and reused connections to its pool"""
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.last_used = {}  # connection key -> time of last request
+
+    def _conn_request(self, conn, request_uri, method, body, headers):
+        self.pool.count(fresh=conn.sock is None)
+        try:
+            return super()._conn_request(conn, request_uri, method, body, headers)
+        finally:
+            self.last_used[id(conn)] = time.time()
+
+    def close_idle(self, idle_timeout):
+        """Close connections nobody used for idle_timeout seconds"""
+        now = time.time()
+        for conn in self.connections.values():
+            if conn.sock is not None and now - self.last_used.get(id(conn), 0) > idle_timeout:
+                conn.close()
+
+    def unauthorize(self):
+        """
+        Undo credentials.authorize(self): it replaces the request method
+        on the instance, so dropping that puts back the plain one.
+        """
+        self.__dict__.pop("request", None)
+
+
+class HttpPool:
+    """A pool of PooledHttp objects shared by all threads of the app."""
+
+    def __init__(self, size=16, idle_timeout=120, **http_kwargs):
+        """
+        Args:
+            size: most idle Http objects kept; more can be in use at once,
+                but the extra ones are closed when released
+            idle_timeout: seconds a connection may sit unused and still be reused
+            http_kwargs: passed on to httplib2.Http (e.g. timeout, ca_certs)
+        """
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.http_kwargs = http_kwargs
+        self.idle = []
+        self.lock = threading.Lock()
+        self.created = 0
+        self.handshakes = 0
+        self.reused = 0
+
+    def acquire(self):
+        """An Http object for the caller only, until it is released"""
+        with self.lock:
+            if self.idle:
+                http = self.idle.pop()  # most recent first: warmest connections
+            else:
+                http = None
+                self.created += 1
+        if http is None:
+            http = PooledHttp(self, **self.http_kwargs)
+        http.close_idle(self.idle_timeout)
+        return http
+
+    def authorize(self, credentials):
+        """An Http object from the pool, authorized with credentials"""
+        return credentials.authorize(self.acquire())
+
+    def release(self, http):
+        """Give back an Http object from acquire or authorize"""
+        http.unauthorize()
+        http.close_idle(self.idle_timeout)
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(http)
+                return
+        for conn in http.connections.values():
+            conn.close()
+
+    def count(self, fresh):
+        """Record one request, on a new connection or a reused one"""
+        with self.lock:
+            if fresh:
+                self.handshakes += 1
+            else:
+                self.reused += 1
+
+    def stats(self):
+        """Counters, as a dict"""
+        with self.lock:
+            requests = self.handshakes + self.reused
+            return {"created": self.created,
+                    "idle": len(self.idle),
+                    "handshakes": self.handshakes,
+                    "reused": self.reused,
+                    "reuse_ratio": self.reused / requests if requests else 0.0}
@@ -0,0 +1,209 @@
+"""
+Per-request phase timing and Prometheus metrics.
+
+A RequestTimer adds up the time a request spends in each phase
+(credentials, build, google, translate, complement, render, ...). The
+timer of the running request is kept per thread, so code deep in the
+call stack only says
+
+    with metrics.phase("google"):
+        response = request.execute()
+
+and that costs one perf_counter pair, or nothing when no request is
+being timed. Worker threads of a request join its timer with bind();
+phases that run on several threads at once are summed.
+
+Histogram and Counter keep labeled series in memory and render them in
+the Prometheus text format for /metrics. They count for this process
+only; with several gunicorn workers, each answers for itself.
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# seconds; from a cache hit up to a slow Google round trip
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Seconds spent in each phase of one request."""
+
+    def __init__(self):
+        self.phases = {}  # phase -> seconds, in the order first seen
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def items(self):
+        with self.lock:
+            return list(self.phases.items())
+
+    def server_timing(self, total=None):
+        """The phases as a Server-Timing header value (milliseconds)"""
+        entries = ["{};dur={:.1f}".format(name, seconds * 1000) for name, seconds in self.items()]
+        if total is not None:
+            entries.append("total;dur={:.1f}".format(total * 1000))
+        return ", ".join(entries)
+
+
+def start():
+    """A new timer, current for the calling thread"""
+    timer = RequestTimer()
+    _local.timer = timer
+    return timer
+
+
+def stop():
+    """The calling thread no longer times anything"""
+    _local.timer = None
+
+
+def current():
+    """The calling thread's timer, or None"""
+    return getattr(_local, "timer", None)
+
+
+@contextlib.contextmanager
+def bind(timer):
+    """Make timer (may be None) the calling thread's for the block, e.g. in a worker thread"""
+    previous = current()
+    _local.timer = timer
+    try:
+        yield timer
+    finally:
+        _local.timer = previous
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Add the time the block takes to phase name of the current timer"""
+    timer = current()
+    if timer is None:
+        yield
+        return
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - begin)
+
+
+def label_text(names, values):
+    """{a="x",b="y"}, escaped as the text format wants"""
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append('{}="{}"'.format(name, value))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """A monotonic count per label values."""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self.lock:
+            self.series[values] = self.series.get(values, 0) + amount
+
+    def value(self, *values):
+        with self.lock:
+            return self.series.get(values, 0)
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.help),
+                 "# TYPE {} counter".format(self.name)]
+        with self.lock:
+            for values, count in sorted(self.series.items()):
+                lines.append("{}{} {}".format(self.name, label_text(self.labels, values), count))
+        return lines
+
+
+class Histogram:
+    """Observations in cumulative buckets, with their sum and count, per label values."""
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # values -> [count per bucket (+Inf last), sum]
+        self.lock = threading.Lock()
+
+    def observe(self, amount, *values):
+        index = bisect.bisect_left(self.buckets, amount)
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += amount
+
+    def count(self, *values):
+        with self.lock:
+            series = self.series.get(values)
+            return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.help),
+                 "# TYPE {} histogram".format(self.name)]
+        labels = self.labels + ("le",)
+        with self.lock:
+            for values, (counts, total) in sorted(self.series.items()):
+                running = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    running += count
+                    lines.append("{}_bucket{} {}".format(
+                        self.name, label_text(labels, values + (bound,)), running))
+                text = label_text(self.labels, values)
+                lines.append("{}_sum{} {}".format(self.name, text, total))
+                lines.append("{}_count{} {}".format(self.name, text, running))
+        return lines
+
+
+class Registry:
+    """The metrics of the app, rendered together."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra=()):
+        """The text format; extra: more lines, e.g. from stats_lines"""
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        lines += extra
+        return "\n".join(lines) + "\n"
+
+
+def stats_lines(prefix, stats):
+    """A stats() dict of one of the pools or stores, as untyped samples"""
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append("# TYPE {}_{} untyped".format(prefix, key))
+            lines.append("{}_{} {}".format(prefix, key, value))
+    return lines
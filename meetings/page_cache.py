@@ -0,0 +1,78 @@
+"""
+Rendered pages, kept by a hash of everything they are made from.
+
+The /_select and /_free pages depend only on their inputs (the user, the
+calendars, the date range, the marks, the user's rules) and on the events
+behind them. fingerprint() hashes those into a key; the same inputs over
+the same events give the same key, so the key doubles as the page's
+ETag on GET. A GET whose key the browser already has (If-None-Match)
+gets an empty 304; a request whose key is in the PageCache gets the
+stored page; only a new key is worked out and rendered.
+
+The events are part of the key by their own fingerprint, taken once when
+/_select fetches them, so new or changed events give new keys and stale
+pages are simply never asked for again; the LRU bound on the total size
+of the pages kept clears them out.
+"""
+import collections
+import hashlib
+import json
+import threading
+
+
+def fingerprint(*parts):
+    """A stable hex digest of JSON-able parts"""
+    text = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """LRU of page bodies by key, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: most bytes of pages kept; 0 keeps none
+        """
+        self.max_bytes = max_bytes
+        self.pages = collections.OrderedDict()  # key -> body (bytes)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """The body stored under key, or None"""
+        with self.lock:
+            body = self.pages.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        """Keep body (bytes) under key, unless it is bigger than the whole cache"""
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.pages.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.pages[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                evicted, old = self.pages.popitem(last=False)
+                self.size -= len(old)
+                self.evictions += 1
+
+    def stats(self):
+        """Counters, pages and bytes kept, as a dict"""
+        with self.lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": len(self.pages),
+                    "bytes": self.size}
@@ -0,0 +1,111 @@
+"""
+Events fetched before they are asked for.
+
+After /choose lists the calendars, the user takes a while to tick some
+and press select, and the server has nothing to do. A Prefetcher starts
+fetching the calendars they are likely to pick (the primary one and
+those shown in Google Calendar) right then, on a few background threads,
+and /_select takes what it finds: finished results at once, fetches
+still running by waiting for them. Calendars nobody started are fetched
+as before.
+
+A prefetched result is used once, and only within ttl seconds of being
+started; past that, or when more than max_entries are kept, it is thrown
+away (and counted as wasted), so what /_select gets is never much older
+than the page the user picked from.
+"""
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Fetches in the background, kept by key until taken."""
+
+    def __init__(self, workers=4, ttl=300, max_entries=256):
+        """
+        Args:
+            workers: most fetches running at once
+            ttl: seconds a prefetched result may be used after it is started
+            max_entries: most results (running or done) kept; the oldest go first
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # key -> (started, future)
+        self.lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.waited = 0
+        self.wasted = 0
+        self.failed = 0
+
+    def start(self, key, fn, *args):
+        """
+        Start fn(*args) in the background, to be taken as key; nothing
+        happens if key was started within ttl already.
+        Returns True if it was started.
+        """
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            if key in self.entries:
+                return False
+            self.entries[key] = (now, self.pool.submit(fn, *args))
+            self.started += 1
+            while len(self.entries) > self.max_entries:
+                old, (started, future) = self.entries.popitem(last=False)
+                future.cancel()
+                self.wasted += 1
+        return True
+
+    def take(self, key):
+        """
+        The result for key, waiting for it if it is still being fetched;
+        None if it wasn't started (or is too old, or failed)
+        """
+        with self.lock:
+            self._expire(time.time())
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            started, future = entry
+            if not future.done():
+                self.waited += 1
+        try:
+            result = future.result()
+        except Exception:
+            log.exception("Prefetch of %s failed", key)
+            with self.lock:
+                self.failed += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return result
+
+    def stats(self):
+        """Counters and results kept, as a dict"""
+        with self.lock:
+            return {"started": self.started,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "waited": self.waited,
+                    "wasted": self.wasted,
+                    "failed": self.failed,
+                    "entries": len(self.entries)}
+
+    def _expire(self, now):
+        """Throw away results started more than ttl ago (lock held)"""
+        while self.entries:
+            key, (started, future) = next(iter(self.entries.items()))
+            if started + self.ttl >= now:
+                break
+            del self.entries[key]
+            future.cancel()
+            self.wasted += 1
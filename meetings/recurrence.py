@@ -0,0 +1,132 @@
+"""
+Recurring events, expanded here instead of by Google.
+
+Asked for with singleEvents=True, Google sends every instance of every
+recurring event in the range, each a full copy of the event. Asked for
+with singleEvents=False it sends each series once: the master, with its
+RRULE/RDATE/EXDATE lines, plus only the instances that differ from it
+(moved or edited ones, and cancelled ones). expand_items turns such a
+listing back into the stream of instances the rest of the app expects,
+in order of start time, working out each master's occurrences with
+dateutil's rrule one at a time (xafter) and only within the window.
+
+Instances are shaped like Google's own: the id is the master's id plus
+the UTC start ("abc_20171120T170000Z"), and recurringEventId is the
+master's id, so marks and series rules work the same either way.
+"""
+import datetime
+import heapq
+import logging
+
+from dateutil import rrule, tz
+
+import timeparse
+
+log = logging.getLogger(__name__)
+
+UTC = datetime.timezone.utc
+
+
+def start_epoch(event):
+    """UTC epoch seconds of an event's start (midnight UTC for all day events)"""
+    start = event.get("start", {})
+    if "dateTime" in start:
+        return timeparse.parse(start["dateTime"])
+    if "date" in start:
+        return timeparse.day_seconds(start["date"])
+    return None
+
+
+def original_epoch(event):
+    """UTC epoch seconds an overridden instance was first planned for"""
+    original = event.get("originalStartTime", {})
+    if "dateTime" in original:
+        return timeparse.parse(original["dateTime"])
+    if "date" in original:
+        return timeparse.day_seconds(original["date"])
+    return None
+
+
+def occurrences(master, begin, end):
+    """
+    Yield (start, end, offset) of a master's occurrences that overlap
+    [begin, end), in order: UTC epoch seconds, and the utc offset of the
+    event's time zone at the start.
+    """
+    start = master["start"]
+    if "dateTime" not in start:
+        # all day series; we don't show all day events
+        return
+    first, offset = timeparse.split(start["dateTime"])
+    duration = timeparse.parse(master["end"]["dateTime"]) - first
+    # the rule repeats on the wall clock of the event's own time zone
+    zone = tz.gettz(start["timeZone"]) if "timeZone" in start else None
+    dtstart = datetime.datetime.fromtimestamp(first, zone or timeparse.zone(offset))
+    try:
+        rules = rrule.rrulestr("\n".join(master["recurrence"]), dtstart=dtstart, forceset=True)
+    except (ValueError, TypeError) as err:
+        log.info("Can't expand recurrence of %s: %s", master.get("id"), err)
+        return
+    after = datetime.datetime.fromtimestamp(begin - duration, UTC)
+    for moment in rules.xafter(after, inc=False):
+        occurrence = int(moment.timestamp())
+        if occurrence >= end:
+            return
+        yield occurrence, occurrence + duration, int(moment.utcoffset().total_seconds())
+
+
+def instance(master, occurrence, finish, offset):
+    """A Google style instance of master at (occurrence, finish), UTC epoch seconds"""
+    stamp = datetime.datetime.fromtimestamp(occurrence, UTC).strftime("%Y%m%dT%H%M%SZ")
+    event = {key: value for key, value in master.items()
+             if key not in ("recurrence", "start", "end", "id")}
+    event["id"] = "{}_{}".format(master["id"], stamp)
+    event["recurringEventId"] = master["id"]
+    event["start"] = {"dateTime": timeparse.format_local(occurrence, offset)}
+    event["end"] = {"dateTime": timeparse.format_local(finish, offset)}
+    return event
+
+
+def expand_master(master, begin, end, overridden):
+    """
+    Yield (start, instance) for a master's occurrences in [begin, end),
+    skipping those in overridden (their UTC epoch starts)
+    """
+    for occurrence, finish, offset in occurrences(master, begin, end):
+        if occurrence not in overridden:
+            yield occurrence, instance(master, occurrence, finish, offset)
+
+
+def expand_items(items, begin, end):
+    """
+    Yield the events of a singleEvents=False listing as single events:
+    masters expanded, overridden instances in place of the occurrences
+    they replace, cancelled ones left out; in order of start time.
+    Args:
+        items: the listing's items (all pages; an override can come
+            after its master)
+        begin, end: the window, UTC epoch seconds
+    """
+    masters = []
+    singles = []
+    overridden = {}  # master id -> {original start}
+    for item in items:
+        if item.get("recurrence"):
+            if item.get("status") != "cancelled":
+                masters.append(item)
+            continue
+        if "recurringEventId" in item:
+            original = original_epoch(item)
+            if original is not None:
+                overridden.setdefault(item["recurringEventId"], set()).add(original)
+        if item.get("status") == "cancelled":
+            continue
+        at = start_epoch(item)
+        if at is not None:
+            singles.append((at, item))
+    singles.sort(key=lambda pair: pair[0])
+    streams = [singles]
+    for master in masters:
+        streams.append(expand_master(master, begin, end, overridden.get(master["id"], ())))
+    for at, event in heapq.merge(*streams, key=lambda pair: pair[0]):
+        yield event
@@ -0,0 +1,154 @@
+"""
+Server-side storage for results that are too big for the session.
+
+Flask's session is a signed cookie, so whatever we put in it travels with
+every request (and breaks past ~4 KB). Instead we keep results here and put
+only their key (a short handle) in the session.
+
+Two stores:
+    MemoryStore: an LRU dict with a time-to-live, for a single process
+    SQLiteStore: a file shared by several worker processes (e.g. gunicorn)
+Both count hits, misses and evictions.
+"""
+import collections
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class ResultStore:
+    """
+    Key/value store of JSON-able results with a time-to-live.
+    Subclasses implement _get, _put and _size.
+    """
+
+    def __init__(self, ttl, max_entries):
+        """
+        Args:
+            ttl: seconds a result is kept after it is stored
+            max_entries: most results kept; the least recently used go first
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, value, key=None):
+        """
+        Store value and return its key (a new one unless key is given).
+        """
+        if key is None:
+            key = uuid.uuid4().hex
+        with self.lock:
+            self._put(key, value, time.time() + self.ttl)
+        return key
+
+    def get(self, key):
+        """The value stored under key, or None if it is missing or expired"""
+        if key is None:
+            value = None
+        else:
+            with self.lock:
+                value = self._get(key, time.time())
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def stats(self):
+        """Counters and current size, as a dict"""
+        with self.lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "entries": self._size()}
+
+
+class MemoryStore(ResultStore):
+    """In-process LRU store"""
+
+    def __init__(self, ttl=3600, max_entries=256):
+        super().__init__(ttl, max_entries)
+        self.entries = collections.OrderedDict()  # key -> (expires, value)
+
+    def _put(self, key, value, expires):
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < now:
+            del self.entries[key]
+            self.evictions += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def _size(self):
+        return len(self.entries)
+
+
+class SQLiteStore(ResultStore):
+    """Store in a SQLite file, shared by every process that opens it"""
+
+    def __init__(self, path, ttl=3600, max_entries=256):
+        super().__init__(ttl, max_entries)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS results ("
+                            " key TEXT PRIMARY KEY, expires REAL, used REAL, value TEXT)")
+
+    def _put(self, key, value, expires):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                            (key, expires, time.time(), json.dumps(value)))
+            # drop the expired, then the least recently used past the limit
+            dropped = self.db.execute("DELETE FROM results WHERE expires < ?",
+                                      (time.time(),)).rowcount
+            dropped += self.db.execute(
+                "DELETE FROM results WHERE key NOT IN"
+                " (SELECT key FROM results ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,)).rowcount
+        self.evictions += dropped
+
+    def _get(self, key, now):
+        row = self.db.execute("SELECT expires, value FROM results WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None:
+            return None
+        expires, value = row
+        with self.db:
+            if expires < now:
+                self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            self.db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def _size(self):
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def make_store(spec, ttl, max_entries):
+    """
+    Build the store named by a configuration value:
+        "memory"            -> MemoryStore
+        "sqlite:<path>"     -> SQLiteStore in file <path>
+    """
+    if spec == "memory":
+        return MemoryStore(ttl, max_entries)
+    if spec.startswith("sqlite:"):
+        return SQLiteStore(spec[len("sqlite:"):], ttl, max_entries)
+    raise ValueError("Unknown result store '{}'".format(spec))
@@ -0,0 +1,159 @@
+"""
+Calendar service objects without the per-request setup cost.
+
+discovery.build downloads and parses the Calendar API's discovery
+document every time it is called. Here the document is loaded once per
+process: from a file on disk if we have one (so it works offline), from
+the copy bundled with google-api-python-client, or else downloaded once
+and written to that file. flask_main builds services from it with
+build_from_document.
+
+Built services are then reused: ServicePool keeps idle services per
+access token, hands each one to one thread at a time (an httplib2
+connection must not be shared) and drops those left idle too long.
+"""
+import collections
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import httplib2
+
+log = logging.getLogger(__name__)
+
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/calendar/v3/rest"
+
+
+def bundled_discovery():
+    """The discovery document shipped with google-api-python-client, if any"""
+    try:
+        from googleapiclient import discovery_cache
+        return discovery_cache.get_static_doc("calendar", "v3")
+    except (ImportError, AttributeError):
+        # older client libraries don't bundle documents
+        return None
+
+
+def load_discovery(path=None, root=None):
+    """
+    The Calendar v3 discovery document, parsed.
+    Args:
+        path: a file to read it from; if the file doesn't exist the
+            document is taken from the client library or downloaded,
+            and written there for next time
+        root: root URL to send API calls to instead of Google's
+            (e.g. a local stand-in server for load tests)
+    """
+    doc = read_discovery(path)
+    if root:
+        log.info("Calendar API calls go to {}".format(root))
+        doc["rootUrl"] = root
+        doc["baseUrl"] = root + doc.get("servicePath", "")
+    return doc
+
+
+def read_discovery(path=None):
+    """The discovery document as load_discovery finds it, unchanged"""
+    if path and os.path.exists(path):
+        log.info("Calendar discovery document from {}".format(path))
+        with open(path) as f:
+            return json.load(f)
+    text = bundled_discovery()
+    if text is None:
+        log.info("Downloading calendar discovery document")
+        response, content = httplib2.Http().request(DISCOVERY_URL)
+        if response.status != 200:
+            raise RuntimeError("Can't get the calendar discovery document: {}"
+                               .format(response.status))
+        text = content.decode("utf-8")
+    if path:
+        with open(path, "w") as f:
+            f.write(text)
+    return json.loads(text)
+
+
+def credentials_key(credentials):
+    """Services are authorized for one access token; key them by its hash"""
+    return hashlib.sha256(credentials.access_token.encode("utf-8")).hexdigest()
+
+
+class ServicePool:
+    """Idle authorized Calendar services, by access token."""
+
+    def __init__(self, build, max_idle=32, idle_timeout=300, discard=None):
+        """
+        Args:
+            build: function(credentials) -> a new service object
+            max_idle: most idle services kept in all
+            idle_timeout: seconds an idle service is kept
+            discard: optional function(service), called on each service
+                the pool drops (e.g. to give back its transport)
+        """
+        self.build = build
+        self.discard = discard
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.idle = collections.OrderedDict()  # (key, serial) -> (last used, service)
+        self.serial = 0
+        self.lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+        self.evicted = 0
+
+    @contextlib.contextmanager
+    def service(self, credentials):
+        """
+        Use a service for credentials, reused if one is idle:
+            with pool.service(credentials) as service:
+                ...
+        """
+        service = self.acquire(credentials)
+        try:
+            yield service
+        finally:
+            self.release(credentials, service)
+
+    def acquire(self, credentials):
+        """A service for credentials, for this thread only until released"""
+        key = credentials_key(credentials)
+        with self.lock:
+            self._evict(time.time())
+            for idle_key in reversed(self.idle):
+                if idle_key[0] == key:
+                    used, service = self.idle.pop(idle_key)
+                    self.reused += 1
+                    return service
+            self.built += 1
+        return self.build(credentials)
+
+    def release(self, credentials, service):
+        """Give back a service from acquire"""
+        key = credentials_key(credentials)
+        with self.lock:
+            self.serial += 1
+            self.idle[(key, self.serial)] = (time.time(), service)
+            self._evict(time.time())
+
+    def _evict(self, now):
+        """Drop services idle too long, then the oldest past max_idle"""
+        while self.idle:
+            idle_key = next(iter(self.idle))
+            used, service = self.idle[idle_key]
+            if len(self.idle) <= self.max_idle and now - used < self.idle_timeout:
+                break
+            del self.idle[idle_key]
+            self.evicted += 1
+            if self.discard is not None:
+                self.discard(service)
+
+    def stats(self):
+        """Counters and current size, as a dict"""
+        with self.lock:
+            return {"built": self.built,
+                    "reused": self.reused,
+                    "evicted": self.evicted,
+                    "idle": len(self.idle)}
@@ -0,0 +1,95 @@
+"""
+Nose tests for Agenda intersection
+"""
+import sys
+sys.path.append("..")
+import datetime
+import random
+
+from Model.CalendarEvent import Appt, Agenda
+
+day1 = datetime.date(2017, 11, 16)
+
+
+def random_agenda(seed, count):
+    rand = random.Random(seed)
+    agenda = Agenda()
+    for i in range(count):
+        begin = rand.randrange(0, 23 * 60)
+        end = rand.randrange(begin + 1, 24 * 60)
+        agenda.append(Appt(day1, datetime.time(begin // 60, begin % 60),
+                           datetime.time(end // 60, end % 60), "appt{}".format(i)))
+    return agenda
+
+
+def nested_intersect(a, b):
+    """The pairwise loop, for unsorted agendas"""
+    result = []
+    for x in a:
+        for y in b:
+            if x.overlaps(y):
+                result.append((x.begin, x.end, y.begin, y.end))
+    return result
+
+
+def spans(agenda):
+    return [(appt.begin, appt.end) for appt in agenda]
+
+
+def test_is_normalized():
+    agenda = random_agenda(1, 20)
+    assert not agenda.is_normalized()
+    assert agenda.normalized().is_normalized()
+
+
+def test_merge_intersect_matches_pairwise():
+    for seed in range(10):
+        a = random_agenda(seed, 15).normalized()
+        b = random_agenda(seed + 100, 15).normalized()
+        expected = [x.intersect(y) for x in a for y in b if x.overlaps(y)]
+        merged = a.merge_intersect(b)
+        assert spans(merged) == spans(expected)
+        assert [m.desc for m in merged] == [e.desc for e in expected]
+        assert spans(a.intersect(b)) == spans(expected)
+
+
+def test_intersect_unsorted_fallback():
+    a = random_agenda(3, 10)
+    b = random_agenda(4, 10)
+    assert len(a.intersect(b)) == len(nested_intersect(a, b))
+
+
+def test_intersect_all():
+    agendas = [random_agenda(seed, 12).normalized() for seed in range(5)]
+    expected = agendas[0]
+    for agenda in agendas[1:]:
+        expected = expected.merge_intersect(agenda)
+    assert spans(Agenda.intersect_all(agendas)) == spans(expected)
+    assert spans(Agenda.intersect_all(agendas[:1])) == spans(agendas[0])
+    assert len(Agenda.intersect_all([])) == 0
+
+
+def test_touching_does_not_intersect():
+    a = Agenda()
+    a.append(Appt(day1, datetime.time(8, 0), datetime.time(9, 0), "a"))
+    b = Agenda()
+    b.append(Appt(day1, datetime.time(9, 0), datetime.time(10, 0), "b"))
+    assert len(a.merge_intersect(b)) == 0
+    assert len(Agenda.intersect_all([a, b])) == 0
+
+
+def test_appt_minutes():
+    appt = Appt(day1, datetime.time(8, 30), datetime.time(9, 15), "a")
+    assert appt.end_min - appt.begin_min == 45
+    assert appt.begin == datetime.datetime(2017, 11, 16, 8, 30)
+    same = Appt.from_minutes(appt.begin_min, appt.end_min, "a")
+    assert (same.begin, same.end) == (appt.begin, appt.end)
+    assert not hasattr(appt, "__dict__")
+
+
+def test_appt_from_minutes_rejects_backwards():
+    try:
+        Appt.from_minutes(100, 100, "a")
+    except ValueError:
+        return
+    assert False, "expected ValueError"
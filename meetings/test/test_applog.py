@@ -0,0 +1,55 @@
+"""
+Nose tests for the logging layer: summaries, levels and trace sampling
+"""
+import sys
+sys.path.append("..")
+import io
+import logging
+
+import applog
+
+
+class Loud:
+    """Fails the test if anything formats it"""
+
+    def __str__(self):
+        raise AssertionError("formatted although not logged")
+
+
+def logger_to(stream, level, sample):
+    logger = logging.getLogger("test_applog")
+    applog.configure(logger, level, sample)
+    logger.handlers[0].stream = stream
+    return logger
+
+
+def test_describe():
+    assert applog.describe([{"a": 1}] * 3) == "3 list of dict"
+    assert applog.describe([[1, 2], [3]]) == "2 lists of 3 items in all"
+    assert applog.describe({"a": 1}) == "dict of 1 keys"
+    assert applog.describe([]) == "empty list"
+    assert applog.describe("x" * 100).endswith("(100 chars)")
+
+
+def test_nothing_formatted_below_level():
+    stream = io.StringIO()
+    logger = logger_to(stream, "INFO", 0.0)
+    logger.debug("payload %s", Loud())
+    logger.info("%s", applog.Summary([1, 2]))
+    assert stream.getvalue() == "INFO:test_applog:-: 2 list of int\n"
+
+
+def test_sampled_request_logs_debug():
+    stream = io.StringIO()
+    logger = logger_to(stream, "INFO", 1.0)
+    trace = applog.begin_request(1.0)
+    logger.debug("traced")
+    applog.end_request()
+    logger.debug("not traced")
+    assert stream.getvalue() == "DEBUG:test_applog:{}: traced\n".format(trace)
+
+
+def test_bind_carries_trace():
+    with applog.bind("abc"):
+        assert applog.current() == "abc"
+    assert applog.current() is None
@@ -0,0 +1,79 @@
+"""
+Nose tests for the array-backed agenda
+"""
+import sys
+sys.path.append("..")
+import datetime
+import random
+
+from Model.CalendarEvent import Appt, Agenda
+from Model.ArrayAgenda import ArrayAgenda
+
+day1 = datetime.date(2017, 11, 16)
+
+
+def random_agenda(seed, count, days=1):
+    rand = random.Random(seed)
+    agenda = Agenda()
+    for i in range(count):
+        day = day1 + datetime.timedelta(days=rand.randrange(days))
+        begin = rand.randrange(0, 23 * 60)
+        end = rand.randrange(begin + 1, 24 * 60)
+        agenda.append(Appt(day, datetime.time(begin // 60, begin % 60),
+                           datetime.time(end // 60, end % 60), "appt{}".format(i), "BUSY"))
+    return agenda
+
+
+def spans(agenda):
+    return [(appt.begin, appt.end) for appt in agenda]
+
+
+def test_round_trip():
+    agenda = random_agenda(1, 50)
+    back = ArrayAgenda.from_agenda(agenda).to_agenda()
+    assert spans(back) == spans(agenda)
+    assert [a.desc for a in back] == [a.desc for a in agenda]
+    assert [a.status for a in back] == [a.status for a in agenda]
+
+
+def test_union_matches_normalize():
+    agenda = random_agenda(2, 80)
+    merged = ArrayAgenda.from_agenda(agenda).union().to_agenda()
+    assert spans(merged) == spans(agenda.normalized())
+
+
+def test_complement_matches():
+    agenda = random_agenda(3, 10)
+    block = Appt(day1, datetime.time(8, 0), datetime.time(17, 0), "free", "FREE")
+    comp = ArrayAgenda.from_agenda(agenda).complement(block).to_agenda()
+    assert spans(comp) == spans(agenda.complement(block))
+    assert all(a.desc == "free" and a.status == "FREE" for a in comp)
+
+
+def test_complement_daily():
+    agenda = random_agenda(4, 40, days=10)
+    block = Appt(day1, datetime.time(8, 0), datetime.time(17, 0), "free", "FREE")
+    windows = ArrayAgenda.daily(block, 10)
+    comp = ArrayAgenda.from_agenda(agenda).complement_daily(windows).to_agenda()
+    expected = []
+    for window in windows.to_agenda():
+        day = Agenda()
+        for appt in agenda:
+            if appt.begin.date() == window.begin.date():
+                day.append(appt)
+        expected += spans(day.complement(window))
+    assert spans(comp) == expected
+
+
+def test_intersect_matches():
+    a = random_agenda(5, 30).normalized()
+    b = random_agenda(6, 30).normalized()
+    both = ArrayAgenda.from_agenda(a).intersect(ArrayAgenda.from_agenda(b)).to_agenda()
+    assert spans(both) == spans(a.intersect(b))
+
+
+def test_at_least():
+    agenda = random_agenda(7, 30)
+    long_ones = ArrayAgenda.from_agenda(agenda).at_least(60 * 60).to_agenda()
+    assert spans(long_ones) == [s for s in spans(agenda)
+                                if s[1] - s[0] >= datetime.timedelta(hours=1)]
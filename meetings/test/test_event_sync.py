@@ -0,0 +1,95 @@
+"""
+Nose tests for the incremental event sync store
+"""
+import sys
+sys.path.append("..")
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from event_sync import EventSyncStore
+
+
+def event(id, start, end, status="confirmed"):
+    return {"id": id, "status": status, "summary": id,
+            "start": {"dateTime": start}, "end": {"dateTime": end}}
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+        self.headers = {}
+
+    def execute(self):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeEvents:
+    """events() of a service: answers from a dict of syncToken -> response"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs.get("syncToken"))
+        return FakeRequest(self.answers[kwargs.get("syncToken")])
+
+    def list_next(self, request, response):
+        return None
+
+
+class FakeService:
+    def __init__(self, answers):
+        self._events = FakeEvents(answers)
+
+    def events(self):
+        return self._events
+
+
+def ids(events):
+    return [e["id"] for e in events]
+
+
+def test_full_then_delta():
+    store = EventSyncStore(":memory:")
+    service = FakeService({
+        None: {"items": [event("a", "2017-11-16T09:00:00-08:00", "2017-11-16T10:00:00-08:00"),
+                         event("b", "2017-11-17T09:00:00-08:00", "2017-11-17T10:00:00-08:00")],
+               "nextSyncToken": "t1"},
+        "t1": {"items": [event("a", "", "", status="cancelled"),
+                         event("c", "2017-11-16T08:00:00-08:00", "2017-11-16T08:30:00-08:00")],
+               "nextSyncToken": "t2"}})
+    store.sync(service, "me", "cal")
+    assert store.token("me", "cal") == "t1"
+    everything = (0, 2 ** 40)
+    assert ids(store.events("me", "cal", *everything)) == ["a", "b"]
+    store.sync(service, "me", "cal")
+    assert service.events().calls == [None, "t1"]
+    assert store.token("me", "cal") == "t2"
+    assert ids(store.events("me", "cal", *everything)) == ["c", "b"]
+    assert ids(store.events("other", "cal", *everything)) == []
+
+
+def test_window():
+    store = EventSyncStore(":memory:")
+    store.apply("me", "cal", [event("a", "2017-11-16T09:00:00-08:00", "2017-11-16T10:00:00-08:00"),
+                              event("b", "2017-11-17T09:00:00Z", "2017-11-17T10:00:00Z")])
+    nov16_utc = 1510790400
+    assert ids(store.events("me", "cal", nov16_utc, nov16_utc + 24 * 3600)) == ["a"]
+
+
+def test_gone_resyncs():
+    store = EventSyncStore(":memory:")
+    gone = HttpError(httplib2.Response({"status": 410}), b"gone")
+    service = FakeService({
+        None: {"items": [event("a", "2017-11-16T09:00:00-08:00", "2017-11-16T10:00:00-08:00")],
+               "nextSyncToken": "t1"},
+        "t1": gone})
+    store.sync(service, "me", "cal")
+    store.apply("me", "cal", [event("stale", "2017-11-16T11:00:00-08:00", "2017-11-16T12:00:00-08:00")])
+    store.sync(service, "me", "cal")
+    assert service.events().calls == [None, "t1", None]
+    assert ids(store.events("me", "cal", 0, 2 ** 40)) == ["a"]
@@ -0,0 +1,53 @@
+"""
+Nose tests for marks and standing rules of events to treat as free
+"""
+import sys
+sys.path.append("..")
+
+import exclusions
+
+
+def event(id, summary="meeting", series=None):
+    event = {"id": id, "summary": summary}
+    if series:
+        event["recurringEventId"] = series
+    return event
+
+
+def test_matcher():
+    matcher = exclusions.Matcher(ids=["a"], series=["weekly"], patterns=["*lunch*"])
+    assert matcher.excludes(event("a"))
+    assert matcher.excludes(event("b", series="weekly"))
+    assert matcher.excludes(event("c", summary="Team LUNCH"))
+    assert not matcher.excludes(event("d", summary="standup", series="daily"))
+    assert not exclusions.Matcher()
+
+
+def test_filter_keeps_order():
+    events = [event(str(i)) for i in range(6)]
+    kept = exclusions.Matcher(ids=["1", "4", "1"]).filter(events)
+    assert [e["id"] for e in kept] == ["0", "2", "3", "5"]
+
+
+def test_rules_per_user():
+    rules = exclusions.ExclusionRules()
+    rules.add("ann", "series", "weekly")
+    rules.add("ann", "summary", "lunch")
+    rules.add("ann", "summary", "lunch")
+    rules.add("bob", "id", "x")
+    assert rules.rules("ann") == [("series", "weekly"), ("summary", "lunch")]
+    matcher = rules.matcher("ann", marks=["m"])
+    assert matcher.excludes(event("m"))
+    assert matcher.excludes(event("z", series="weekly"))
+    assert not matcher.excludes(event("x"))
+    rules.remove("ann", "series", "weekly")
+    assert rules.rules("ann") == [("summary", "lunch")]
+    assert not rules.matcher(None)
+
+
+def test_unknown_kind():
+    try:
+        exclusions.ExclusionRules().add("ann", "color", "red")
+    except ValueError:
+        return
+    assert False, "expected ValueError"
@@ -0,0 +1,331 @@
+"""
+Nose tests for the routes and helpers of flask_main, without Google:
+the app is configured from a scratch credentials.ini
+"""
+import sys
+sys.path.append("..")
+import json
+import os
+import tempfile
+import time
+
+# flask_main is imported from the scratch directory, so its path can't be relative
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCRATCH = tempfile.mkdtemp()
+with open(os.path.join(SCRATCH, "credentials.ini"), "w") as f:
+    f.write("[DEFAULT]\nSECRET_KEY = test\nDEBUG = False\nGOOGLE_KEY_FILE = none.json\n")
+HERE = os.getcwd()
+os.chdir(SCRATCH)
+try:
+    import flask_main
+finally:
+    os.chdir(HERE)
+import event_sync
+import exclusions
+from dateutil import tz
+
+REAL_START = "2017-11-16T08:00:00-08:00"
+REAL_END = "2017-11-18T17:00:00-08:00"
+PACIFIC = tz.gettz("America/Los_Angeles")
+
+
+def item(id, begin, end, summary="meeting"):
+    """An event item as Google sends it, on -08:00"""
+    return {"id": id, "summary": summary, "status": "confirmed",
+            "start": {"dateTime": begin + "-08:00"}, "end": {"dateTime": end + "-08:00"}}
+
+
+ITEMS = [item("before", "2017-11-15T10:00:00", "2017-11-15T11:00:00"),
+         dict(item("standup_20171116", "2017-11-16T08:30:00", "2017-11-16T08:45:00"),
+              recurringEventId="standup"),
+         item("a", "2017-11-16T09:00:00", "2017-11-16T10:00:00"),
+         item("evening", "2017-11-16T20:00:00", "2017-11-16T21:00:00"),
+         item("b", "2017-11-17T12:00:00", "2017-11-17T13:30:00"),
+         item("c", "2017-11-17T13:00:00", "2017-11-17T14:00:00"),
+         item("late", "2017-11-17T16:30:00", "2017-11-17T18:00:00"),
+         item("night", "2017-11-17T23:00:00", "2017-11-18T07:00:00"),
+         item("d", "2017-11-18T16:00:00", "2017-11-18T17:00:00")]
+
+
+class MaskedEvents:
+    """events() of a service giving ITEMS with only the fields asked for"""
+
+    def list(self, **kwargs):
+        fields = kwargs["fields"].split("items(")[1].rstrip(")").split(",")
+        items = [{name: entry[name] for name in fields if name in entry} for entry in ITEMS]
+        return MaskedRequest({"items": items, "nextSyncToken": "t1"})
+
+    def list_next(self, request, response):
+        return None
+
+
+class MaskedRequest:
+    def __init__(self, response):
+        self.response = response
+        self.headers = {}
+
+    def execute(self):
+        return self.response
+
+
+class MaskedService:
+    def events(self):
+        return MaskedEvents()
+
+
+def listing_times(listing):
+    """A /_free listing without the descriptions, which only events have"""
+    return [(entry["start_time"], entry["end_time"], entry["status"]) for entry in listing]
+
+
+def stubbed(replacements, fn):
+    """fn() with some of flask_main's names replaced for the while"""
+    saved = {name: getattr(flask_main, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(flask_main, name, value)
+    try:
+        return fn()
+    finally:
+        for name, value in saved.items():
+            setattr(flask_main, name, value)
+
+
+def test_freebusy_path_matches_event_path():
+    window = flask_main.session_range(REAL_START, REAL_END)
+    events = list(flask_main.slim_events(ITEMS, window))
+    # partly in the window ("late") is kept, and cut to it on both paths
+    assert [event["id"] for event in events] == ["standup_20171116", "a", "b", "c", "late", "d"]
+    by_events = flask_main.events_busy_appts([events], exclusions.Matcher(), window)
+    periods = [{"start": entry["start"]["dateTime"], "end": entry["end"]["dateTime"]}
+               for entry in ITEMS]
+    by_freebusy = stubbed({"LOCAL_ZONE": PACIFIC},
+                          lambda: flask_main.freebusy_blocks(periods, REAL_START, REAL_END))
+    assert listing_times(flask_main.free_listing(by_freebusy, REAL_START, REAL_END)) == \
+        listing_times(flask_main.free_listing(by_events, REAL_START, REAL_END))
+
+
+def test_freebusy_blocks_clipped_to_window():
+    periods = [{"start": "2017-11-16T07:00:00-08:00", "end": "2017-11-16T09:00:00-08:00"},
+               {"start": "2017-11-16T16:00:00-08:00", "end": "2017-11-17T10:00:00-08:00"}]
+    blocks = stubbed({"LOCAL_ZONE": PACIFIC},
+                     lambda: flask_main.freebusy_blocks(periods, REAL_START, REAL_END))
+    assert [(appt.begin.day, appt.begin.hour, appt.end.hour) for appt in blocks] == \
+        [(16, 8, 9), (16, 16, 17), (17, 8, 10)]
+
+
+def test_range_across_dst_change():
+    # 09:00 to 17:00 each day, on PDT (-07:00) until Nov 5, then on PST
+    real_start = "2017-11-01T09:00:00-07:00"
+    real_end = "2017-11-10T17:00:00-08:00"
+    items = [{"id": id, "summary": "meeting", "status": "confirmed",
+              "start": {"dateTime": begin}, "end": {"dateTime": end}}
+             for id, begin, end in [
+                 ("in_pdt", "2017-11-02T10:00:00-07:00", "2017-11-02T11:00:00-07:00"),
+                 ("after_pdt", "2017-11-02T17:15:00-07:00", "2017-11-02T17:45:00-07:00"),
+                 ("before_pst", "2017-11-07T08:00:00-08:00", "2017-11-07T08:30:00-08:00"),
+                 ("in_pst", "2017-11-07T16:00:00-08:00", "2017-11-07T17:00:00-08:00")]]
+    window = flask_main.session_range(real_start, real_end)
+    events = list(flask_main.slim_events(items, window))
+    assert [event["id"] for event in events] == ["in_pdt", "in_pst"]
+    by_events = flask_main.free_listing(
+        flask_main.events_busy_appts([events], exclusions.Matcher(), window), real_start, real_end)
+    listing = listing_times(by_events)
+    assert ("2017/11/02-10:00", "2017/11/02-11:00", "BUSY") in listing
+    assert ("2017/11/07-16:00", "2017/11/07-17:00", "BUSY") in listing
+    assert ("2017/11/02-11:00", "2017/11/02-17:00", "FREE") in listing
+    assert ("2017/11/07-09:00", "2017/11/07-16:00", "FREE") in listing
+    assert ("2017/11/08-09:00", "2017/11/08-17:00", "FREE") in listing
+    # freebusy sends the same times in UTC
+    periods = [{"start": "2017-11-02T17:00:00Z", "end": "2017-11-02T18:00:00Z"},
+               {"start": "2017-11-03T00:15:00Z", "end": "2017-11-03T00:45:00Z"},
+               {"start": "2017-11-07T16:00:00Z", "end": "2017-11-07T16:30:00Z"},
+               {"start": "2017-11-08T00:00:00Z", "end": "2017-11-08T01:00:00Z"}]
+    by_freebusy = stubbed({"LOCAL_ZONE": PACIFIC},
+                          lambda: flask_main.freebusy_blocks(periods, real_start, real_end))
+    assert listing_times(flask_main.free_listing(by_freebusy, real_start, real_end)) == listing
+
+
+def stored_session(client, events=None):
+    """Give client's session the range, and the events if any, as /_select leaves them"""
+    with client.session_transaction() as session:
+        session["real_start_time"] = REAL_START
+        session["real_end_time"] = REAL_END
+        session["daterange"] = "11/16/2017 8:00 - 11/18/2017 17:00"
+        if events is not None:
+            session["events_handle"] = flask_main.RESULTS.put(events)
+            session["selected_calendars"] = ["primary"]
+
+
+def test_api_free_needs_range_and_calendars():
+    client = flask_main.app.test_client()
+    response = client.get("/api/free")
+    assert response.status_code == 409
+    assert "date range" in response.get_json()["error"]
+    stored_session(client)
+    response = client.get("/api/free")
+    assert response.status_code == 409
+    assert "calendars" in response.get_json()["error"]
+
+
+def test_api_free_streams_day_by_day():
+    window = flask_main.session_range(REAL_START, REAL_END)
+    client = flask_main.app.test_client()
+    stored_session(client, [list(flask_main.slim_events(ITEMS, window))])
+    streams = flask_main.PHASE_SECONDS.count("/api/free", "complement")
+    response = client.get("/api/free?mark=c")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert all(set(line) == {"start_time", "end_time", "description", "status"}
+               for line in lines)
+    # each day's busy slots, then its free ones; the last date has only
+    # busy slots, as on /_free
+    assert [(line["start_time"], line["end_time"], line["status"]) for line in lines] == [
+        ("2017/11/16-08:30", "2017/11/16-08:45", "BUSY"),
+        ("2017/11/16-09:00", "2017/11/16-10:00", "BUSY"),
+        ("2017/11/16-08:00", "2017/11/16-08:30", "FREE"),
+        ("2017/11/16-08:45", "2017/11/16-09:00", "FREE"),
+        ("2017/11/16-10:00", "2017/11/16-17:00", "FREE"),
+        ("2017/11/17-12:00", "2017/11/17-13:30", "BUSY"),
+        ("2017/11/17-16:30", "2017/11/17-17:00", "BUSY"),
+        ("2017/11/17-08:00", "2017/11/17-12:00", "FREE"),
+        ("2017/11/17-13:30", "2017/11/17-16:30", "FREE"),
+        ("2017/11/18-16:00", "2017/11/18-17:00", "BUSY")]
+    # the days were timed as they were sent
+    assert flask_main.PHASE_SECONDS.count("/api/free", "complement") == streams + 1
+
+
+def test_synced_events_keep_series():
+    store = event_sync.EventSyncStore(":memory:")
+    store.sync(MaskedService(), "me", "cal")
+    window = flask_main.session_range(REAL_START, REAL_END)
+    events = list(flask_main.slim_events(store.events("me", "cal", 0, 2 ** 40), window))
+    assert events[0]["recurringEventId"] == "standup"
+    matcher = exclusions.Matcher(series=["standup"])
+    assert [event["id"] for event in matcher.filter(events)] == ["a", "b", "c", "late", "d"]
+
+
+class Credentials:
+    """Enough of OAuth2Credentials for user_key"""
+    id_token = {"sub": "ann"}
+    access_token = "token"
+
+
+class FreebusyClient:
+    """A CALENDAR_CLIENT whose freebusy answer leaves out the calendar gone"""
+
+    def freebusy(self, token, bodies):
+        busy = [{"start": "2017-11-16T09:00:00-08:00", "end": "2017-11-16T10:00:00-08:00"}]
+        return [{"calendars": {entry["id"]: {"busy": busy} for entry in body["items"]
+                               if entry["id"] != "gone"}}
+                for body in bodies]
+
+
+def test_freebusy_missing_calendar_unknown():
+    busy = stubbed({"CALENDAR_CLIENT": FreebusyClient()},
+                   lambda: flask_main.query_busy_by_calendar(
+                       Credentials, ["primary", "gone"], REAL_START, REAL_END))
+    assert len(busy["primary"]) == 1
+    assert busy["gone"] is None
+    # so the events are used rather than taking it for free
+    assert stubbed({"CALENDAR_CLIENT": FreebusyClient()},
+                   lambda: flask_main.query_busy(
+                       Credentials, ["primary", "gone"], REAL_START, REAL_END)) is None
+
+
+def test_free_view_hit_and_miss_agree():
+    window = flask_main.session_range(REAL_START, REAL_END)
+    client = flask_main.app.test_client()
+    stored_session(client, [list(flask_main.slim_events(ITEMS, window))])
+    periods = [{"start": entry["start"]["dateTime"], "end": entry["end"]["dateTime"]}
+               for entry in ITEMS]
+
+    def free_twice():
+        with client.session_transaction() as session:
+            key = ("ann", tuple(session["selected_calendars"]), REAL_START, REAL_END)
+        flask_main.VIEWS.invalidate(lambda view: view == key)
+        missed = client.get("/_free")
+        # the miss asked for the view to be built in the background
+        for i in range(200):
+            if flask_main.VIEWS.get(key) is not None:
+                break
+            time.sleep(0.01)
+        hits = flask_main.VIEWS.stats()["hits"]
+        hit = client.get("/_free")
+        assert flask_main.VIEWS.stats()["hits"] == hits + 1
+        return missed, hit
+
+    missed, hit = stubbed({"valid_credentials": Credentials,
+                           "query_busy": lambda *args: periods}, free_twice)
+    assert missed.status_code == hit.status_code == 200
+    assert b"no description for this event" in missed.data
+    assert missed.data == hit.data
+
+
+class BobsCredentials(Credentials):
+    id_token = {"sub": "bob"}
+
+
+def test_free_page_etags():
+    window = flask_main.session_range(REAL_START, REAL_END)
+    client = flask_main.app.test_client()
+    stored_session(client, [list(flask_main.slim_events(ITEMS, window))])
+    with client.session_transaction() as session:
+        session["events_version"] = "v1"
+
+    def requests():
+        plain = client.get("/_free")
+        assert plain.status_code == 200 and plain.headers["ETag"]
+        etag = plain.headers["ETag"]
+        again = client.get("/_free", headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.headers["ETag"] == etag
+        # the form POSTs, and is sent on to the listing as a GET
+        posted = client.post("/_free", data={"mark": ["a", "c"]})
+        assert posted.status_code == 302
+        assert posted.location.endswith("/_free?mark=a&mark=c")
+        marked = client.get("/_free?mark=a")
+        assert marked.headers["ETag"] not in (etag, None)
+        assert client.post("/_free", data={"always": "b"}).location.endswith("/_free")
+        ruled = client.get("/_free")
+        assert ruled.headers["ETag"] != etag
+        return ruled
+
+    ruled = stubbed({"valid_credentials": BobsCredentials}, requests)
+    assert b"2017/11/17-13:30" not in ruled.data
+
+
+def test_select_redirects_to_revalidated_page():
+    window = flask_main.session_range(REAL_START, REAL_END)
+    client = flask_main.app.test_client()
+    stored_session(client)
+    fetched = []
+
+    def fetch_calendars(credentials, tokens, real_start, real_end):
+        fetched.append(tokens)
+        return [list(flask_main.slim_events(ITEMS, window))]
+
+    def requests():
+        posted = client.post("/_select", data={"token": "primary"})
+        assert posted.status_code == 302 and posted.location.endswith("/_select")
+        page = client.get("/_select")
+        assert page.status_code == 200 and b"no description for this event" in page.data
+        again = client.get("/_select", headers={"If-None-Match": page.headers["ETag"]})
+        assert again.status_code == 304
+        # what was fetched on POST is only listed, however often
+        assert fetched == [["primary"]]
+
+    stubbed({"valid_credentials": Credentials, "fetch_calendars": fetch_calendars}, requests)
+
+
+def test_flashed_pages_not_kept():
+    client = flask_main.app.test_client()
+    stored_session(client, [[]])
+    with client.session_transaction() as session:
+        session["events_version"] = "v2"
+        session["_flashes"] = [("message", "calendar left out")]
+    kept = flask_main.PAGES.stats()["entries"]
+    response = client.get("/_free")
+    assert response.status_code == 200
+    assert b"calendar left out" in response.data
+    assert "ETag" not in response.headers
+    assert flask_main.PAGES.stats()["entries"] == kept
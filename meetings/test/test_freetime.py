@@ -0,0 +1,119 @@
+"""
+Nose tests for the free time engine
+"""
+import sys
+sys.path.append("..")
+import datetime
+import random
+
+import freetime
+from Model.CalendarEvent import Appt, Agenda
+
+day1 = datetime.date(2017, 11, 16)
+window = Appt(day1, datetime.time(8, 0), datetime.time(17, 0), None, "FREE")
+
+
+def per_day(busy, days):
+    """The old day-by-day computation, used as the reference"""
+    result = []
+    for i in range(days):
+        day = day1 + datetime.timedelta(days=i)
+        block = Appt(day, datetime.time(8, 0), datetime.time(17, 0), None, "FREE")
+        agenda = Agenda()
+        for appt in busy:
+            if appt.begin.date() == day:
+                agenda.append(appt)
+        result += agenda.complement(block).toList()
+    return result
+
+
+def test_empty_days():
+    free = freetime.free_times([], window, 3)
+    assert len(free) == 3
+    assert free[2].begin == datetime.datetime(2017, 11, 18, 8, 0)
+    assert free[2].end == datetime.datetime(2017, 11, 18, 17, 0)
+    assert free[0].status == "FREE"
+
+
+def test_overlapping_and_out_of_window():
+    busy = [Appt(day1, datetime.time(7, 0), datetime.time(9, 0), "a", "BUSY"),
+            Appt(day1, datetime.time(12, 0), datetime.time(13, 0), "b", "BUSY"),
+            Appt(day1, datetime.time(12, 30), datetime.time(14, 0), "c", "BUSY"),
+            Appt(day1, datetime.time(18, 0), datetime.time(19, 0), "d", "BUSY")]
+    free = freetime.free_times(busy, window, 1)
+    assert [(a.begin.hour, a.end.hour) for a in free] == [(9, 12), (14, 17)]
+
+
+def test_matches_per_day_complement():
+    rand = random.Random(322)
+    busy = []
+    for i in range(500):
+        day = day1 + datetime.timedelta(days=rand.randrange(30))
+        begin = rand.randrange(0, 23 * 60)
+        end = rand.randrange(begin + 1, 24 * 60)
+        busy.append(Appt(day, datetime.time(begin // 60, begin % 60),
+                         datetime.time(end // 60, end % 60), "busy", "BUSY"))
+    expected = per_day(busy, 30)
+    free = freetime.free_times(busy, window, 30)
+    assert [(a.begin, a.end) for a in free] == [(a.begin, a.end) for a in expected]
+
+
+def test_split_days():
+    begin = window.begin_min + 15 * 60  # 23:00 on day1
+    appts = freetime.split_days(begin, begin + 26 * 60, "busy", "BUSY")
+    assert [(a.begin, a.end) for a in appts] == [
+        (datetime.datetime(2017, 11, 16, 23, 0), datetime.datetime(2017, 11, 17, 0, 0)),
+        (datetime.datetime(2017, 11, 17, 0, 0), datetime.datetime(2017, 11, 18, 0, 0)),
+        (datetime.datetime(2017, 11, 18, 0, 0), datetime.datetime(2017, 11, 18, 1, 0))]
+
+
+def test_iter_days_groups_busy_by_day():
+    busy = [Appt(day1 + datetime.timedelta(days=1), datetime.time(9, 0), datetime.time(10, 0), "b", "BUSY"),
+            Appt(day1, datetime.time(12, 0), datetime.time(13, 0), "a", "BUSY")]
+    days = list(freetime.iter_days(busy, window, 3))
+    assert [day for day, b, f in days] == [day1 + datetime.timedelta(days=i) for i in range(3)]
+    assert [[a.desc for a in b] for day, b, f in days] == [["a"], ["b"], []]
+    assert [len(f) for day, b, f in days] == [2, 2, 1]
+    later = Appt(day1 + datetime.timedelta(days=4), datetime.time(9, 0), datetime.time(10, 0), "c", "BUSY")
+    days = list(freetime.iter_days(busy + [later], window, 3))
+    assert days[-1] == (day1 + datetime.timedelta(days=4), [later], [])
+
+
+def test_free_entries_match_sweep():
+    rand = random.Random(325)
+    busy = []
+    for i in range(300):
+        day = day1 + datetime.timedelta(days=rand.randrange(60))
+        begin = rand.choice([0, 7 * 60, 9 * 60, 9 * 60 + 30, 12 * 60, 16 * 60 + 45, 22 * 60])
+        end = min(begin + rand.choice([15, 60, 90, 240]), 24 * 60 - 1)
+        busy.append(Appt(day, datetime.time(begin // 60, begin % 60),
+                         datetime.time(end // 60, end % 60), "busy", "BUSY"))
+    busy += freetime.split_days(window.begin_min + 14 * 60, window.begin_min + 40 * 60, "trip", "BUSY")
+    expected = [appt.translator_classToDict() for appt in freetime.free_times(busy, window, 60)]
+    cache = freetime.DayCache(16)
+    for i in range(2):
+        assert freetime.free_entries(busy, window, 60, cache) == expected
+    stats = cache.stats()
+    assert stats["entries"] <= 16
+    assert stats["hits"] + stats["misses"] == 120
+
+
+def test_day_cache_recurring_days_hit():
+    standup = [Appt(day1 + datetime.timedelta(days=i), datetime.time(9, 0), datetime.time(9, 15),
+                    "standup", "BUSY") for i in range(0, 28) if i % 7 < 5]
+    cache = freetime.DayCache()
+    free = freetime.free_entries(standup, window, 28, cache)
+    # one shape for the standup days, one for the days without
+    assert cache.stats() == {"hits": 26, "misses": 2, "evictions": 0, "entries": 2}
+    assert free[0] == {"start_time": "2017/11/16-08:00", "end_time": "2017/11/16-09:00",
+                       "description": None, "status": "FREE"}
+    assert free[1]["start_time"] == "2017/11/16-09:15"
+    assert free[-1]["start_time"] == "2017/12/13-08:00"
+
+
+def test_day_cache_bounded():
+    cache = freetime.DayCache(2)
+    for start in range(5):
+        cache.slots((start, 600))
+    assert cache.stats() == {"hits": 0, "misses": 5, "evictions": 3, "entries": 2}
+    assert cache.slots((480, 1020, 540, 555)) == (("-08:00", "-09:00"), ("-09:15", "-17:00"))
@@ -0,0 +1,58 @@
+"""
+Nose tests for the asyncio Calendar client, against bench/fake_gcal.py
+"""
+import sys
+sys.path.append("..")
+import asyncio
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+import fake_gcal
+import gcal_async
+
+FAKE = fake_gcal.FakeCalendar(calendars=3, per_day=8)
+SERVER, ROOT = fake_gcal.serve(FAKE, port=0)
+RANGE = {"timeMin": "2017-11-20T08:00:00-08:00", "timeMax": "2017-11-27T17:00:00-08:00",
+         "singleEvents": True, "orderBy": "startTime"}
+
+
+def run(coroutine_fn):
+    async def go():
+        calendar = gcal_async.AsyncCalendar(ROOT, concurrency=2)
+        try:
+            return await coroutine_fn(calendar)
+        finally:
+            await calendar.aclose()
+    return asyncio.run(go())
+
+
+def test_calendar_list():
+    calendars = run(lambda calendar: calendar.calendar_list("token"))
+    assert [c["id"] for c in calendars] == FAKE.ids
+
+
+def test_events_paged_and_in_order():
+    ids = [FAKE.ids[2], FAKE.ids[0]]
+    # pages of 5, so each calendar takes several calls
+    pages = run(lambda calendar: calendar.events("token", ids, dict(RANGE, maxResults=5)))
+    for calendar_id, items in zip(ids, pages):
+        expected = FAKE.events(calendar_id, fake_gcal.parse_time(RANGE["timeMin"]),
+                               fake_gcal.parse_time(RANGE["timeMax"]))
+        assert len(expected) > 5
+        assert [item["id"] for item in items] == [event["id"] for event in expected]
+
+
+def test_freebusy():
+    bodies = [{"timeMin": RANGE["timeMin"], "timeMax": RANGE["timeMax"],
+               "items": [{"id": calendar_id}]} for calendar_id in FAKE.ids[:2]]
+    responses = run(lambda calendar: calendar.freebusy("token", bodies))
+    assert [list(response["calendars"]) for response in responses] == [[FAKE.ids[0]], [FAKE.ids[1]]]
+
+
+def test_errors_raise():
+    try:
+        run(lambda calendar: calendar.events("token", ["nobody@example.com"], RANGE))
+    except gcal_async.httpx.HTTPStatusError as error:
+        assert error.response.status_code == 404
+    else:
+        assert False, "expected a 404"
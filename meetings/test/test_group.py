@@ -0,0 +1,45 @@
+"""
+Nose tests for group free time
+"""
+import sys
+sys.path.append("..")
+import datetime
+import random
+
+import group
+from Model.CalendarEvent import Appt, Agenda
+
+day1 = datetime.date(2017, 11, 16)
+window = Appt(day1, datetime.time(8, 0), datetime.time(17, 0), None, "FREE")
+
+
+def random_busy(rand, count):
+    busy = []
+    for i in range(count):
+        begin = window.begin_min + rand.randrange(3) * 24 * 60 + rand.randrange(0, 23 * 60)
+        busy.append((begin, begin + rand.randrange(15, 180)))
+    return sorted(busy)
+
+
+def test_merge_busy():
+    streams = [[(0, 10), (20, 30)], [(5, 15), (30, 40)], [(50, 60)]]
+    assert list(group.merge_busy(streams)) == [(0, 15), (20, 30), (30, 40), (50, 60)]
+    assert list(group.merge_busy([])) == []
+
+
+def test_group_free_is_intersection_of_free():
+    rand = random.Random(42)
+    streams = [random_busy(rand, 10) for person in range(8)]
+    free = group.group_free(streams, window, 3)
+    expected = []
+    for day in range(3):
+        block = Appt.from_minutes(window.begin_min + day * 24 * 60,
+                                  window.end_min + day * 24 * 60, None)
+        agendas = []
+        for stream in streams:
+            agenda = Agenda()
+            for appt in group.group_busy([stream]):
+                agenda.append(appt)
+            agendas.append(agenda.complement(block))
+        expected += Agenda.intersect_all(agendas).toList()
+    assert [(a.begin, a.end) for a in free] == [(a.begin, a.end) for a in expected]
@@ -0,0 +1,69 @@
+"""
+Nose tests for the pooled HTTP transport
+"""
+import sys
+sys.path.append("..")
+import http.server
+import threading
+
+from oauth2client.client import AccessTokenCredentials
+
+from http_pool import HttpPool
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.headers.get("Authorization", "none").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}/".format(server.server_port)
+
+
+def test_connections_are_reused():
+    server, url = serve()
+    pool = HttpPool(size=2)
+    for i in range(5):
+        http = pool.acquire()
+        http.request(url)
+        pool.release(http)
+    server.shutdown()
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert (stats["handshakes"], stats["reused"]) == (1, 4)
+
+
+def test_release_drops_credentials():
+    server, url = serve()
+    pool = HttpPool()
+    http = pool.authorize(AccessTokenCredentials("secret", "test"))
+    response, content = http.request(url)
+    assert content == b"Bearer secret"
+    pool.release(http)
+    again = pool.acquire()
+    assert again is http
+    response, content = again.request(url)
+    assert content == b"none"
+    server.shutdown()
+
+
+def test_idle_connections_are_closed():
+    server, url = serve()
+    pool = HttpPool(idle_timeout=-1)
+    for i in range(2):
+        http = pool.acquire()
+        http.request(url)
+        pool.release(http)
+    server.shutdown()
+    assert pool.stats()["handshakes"] == 2
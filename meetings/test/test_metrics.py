@@ -0,0 +1,60 @@
+"""
+Nose tests for request phase timing and the Prometheus text output
+"""
+import sys
+sys.path.append("..")
+import threading
+
+import metrics
+
+
+def test_phase_without_timer():
+    metrics.stop()
+    with metrics.phase("google"):
+        pass
+    assert metrics.current() is None
+
+
+def test_phases_add_up_across_threads():
+    timer = metrics.start()
+    with metrics.phase("google"):
+        pass
+
+    def work():
+        with metrics.bind(timer):
+            with metrics.phase("google"):
+                pass
+            with metrics.phase("translate"):
+                pass
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    worker.join()
+    metrics.stop()
+    assert [name for name, seconds in timer.items()] == ["google", "translate"]
+    header = timer.server_timing(0.5)
+    assert header.startswith("google;dur=")
+    assert header.endswith("total;dur=500.0")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    histogram = registry.histogram("t_seconds", "test", ["route"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/_free")
+    histogram.observe(0.1, "/_free")
+    histogram.observe(3, "/_free")
+    counter = registry.counter("t_total", "test")
+    counter.inc(amount=4)
+    text = registry.render(metrics.stats_lines("t_pool", {"idle": 2, "name": "x"}))
+    assert 't_seconds_bucket{route="/_free",le="0.1"} 2' in text
+    assert 't_seconds_bucket{route="/_free",le="1.0"} 2' in text
+    assert 't_seconds_bucket{route="/_free",le="+Inf"} 3' in text
+    assert 't_seconds_count{route="/_free"} 3' in text
+    assert "t_total 4" in text
+    assert "t_pool_idle 2" in text
+    assert "t_pool_name" not in text
+    assert histogram.count("/_free") == 3
+
+
+def test_label_escaping():
+    assert metrics.label_text(["a"], ['say "hi"\n']) == '{a="say \\"hi\\"\\n"}'
@@ -0,0 +1,45 @@
+"""
+Nose tests for rendered pages kept by a hash of their inputs
+"""
+import sys
+sys.path.append("..")
+
+import page_cache
+
+
+def test_fingerprint_stable():
+    a = page_cache.fingerprint("free", "ann", {"b": 1, "a": [1, 2]})
+    b = page_cache.fingerprint("free", "ann", {"a": [1, 2], "b": 1})
+    assert a == b
+    assert a != page_cache.fingerprint("free", "ann", {"a": [2, 1], "b": 1})
+    assert a != page_cache.fingerprint("select", "ann", {"a": [1, 2], "b": 1})
+
+
+def test_get_put():
+    cache = page_cache.PageCache(100)
+    assert cache.get("k") is None
+    cache.put("k", b"page")
+    assert cache.get("k") == b"page"
+    cache.put("k", b"longer page")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 11)
+
+
+def test_bounded_by_bytes():
+    cache = page_cache.PageCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")  # b is now the least recently used
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+
+def test_off():
+    cache = page_cache.PageCache(0)
+    cache.put("a", b"1")
+    assert cache.get("a") is None
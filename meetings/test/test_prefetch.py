@@ -0,0 +1,58 @@
+"""
+Nose tests for fetching calendars before they are asked for
+"""
+import sys
+sys.path.append("..")
+import threading
+import time
+
+import prefetch
+
+
+def test_take_once():
+    fetcher = prefetch.Prefetcher(workers=2)
+    assert fetcher.start("cal", lambda n: [n] * n, 3)
+    assert not fetcher.start("cal", lambda n: [], 0)
+    assert fetcher.take("cal") == [3, 3, 3]
+    assert fetcher.take("cal") is None
+    stats = fetcher.stats()
+    assert (stats["started"], stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1, 0)
+
+
+def test_waits_for_running_fetch():
+    go = threading.Event()
+
+    def slow():
+        go.wait(5)
+        return ["event"]
+    fetcher = prefetch.Prefetcher(workers=1)
+    fetcher.start("cal", slow)
+    threading.Timer(0.05, go.set).start()
+    assert fetcher.take("cal") == ["event"]
+    assert fetcher.stats()["waited"] == 1
+
+
+def test_too_old_is_wasted():
+    fetcher = prefetch.Prefetcher(ttl=0.01)
+    fetcher.start("cal", list)
+    time.sleep(0.05)
+    assert fetcher.take("cal") is None
+    assert fetcher.stats()["wasted"] == 1
+
+
+def test_bounded():
+    fetcher = prefetch.Prefetcher(max_entries=2)
+    for key in "abc":
+        fetcher.start(key, list)
+    assert fetcher.take("a") is None
+    assert fetcher.take("c") == []
+    assert fetcher.stats()["wasted"] == 1
+
+
+def test_failure_is_a_miss():
+    def broken():
+        raise RuntimeError("no")
+    fetcher = prefetch.Prefetcher()
+    fetcher.start("cal", broken)
+    assert fetcher.take("cal") is None
+    assert fetcher.stats()["failed"] == 1
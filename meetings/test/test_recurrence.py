@@ -0,0 +1,91 @@
+"""
+Nose tests for expanding recurring events locally
+"""
+import sys
+sys.path.append("..")
+
+import recurrence
+import timeparse
+
+
+def master(rules, start="2017-11-20T09:00:00-08:00", end="2017-11-20T10:00:00-08:00", **more):
+    event = {"id": "weekly", "status": "confirmed", "summary": "Standup",
+             "start": {"dateTime": start, "timeZone": "America/Los_Angeles"},
+             "end": {"dateTime": end, "timeZone": "America/Los_Angeles"},
+             "recurrence": rules}
+    event.update(more)
+    return event
+
+
+def single(id, start, end):
+    return {"id": id, "status": "confirmed", "summary": id,
+            "start": {"dateTime": start}, "end": {"dateTime": end}}
+
+
+def window(begin="2017-11-20T00:00:00-08:00", end="2017-11-25T00:00:00-08:00"):
+    return timeparse.parse(begin), timeparse.parse(end)
+
+
+def starts(events):
+    return [event["start"]["dateTime"] for event in events]
+
+
+def test_daily_with_exdate():
+    rules = ["RRULE:FREQ=DAILY", "EXDATE;TZID=America/Los_Angeles:20171122T090000"]
+    events = list(recurrence.expand_items([master(rules)], *window()))
+    assert starts(events) == ["2017-11-20T09:00:00-08:00", "2017-11-21T09:00:00-08:00",
+                              "2017-11-23T09:00:00-08:00", "2017-11-24T09:00:00-08:00"]
+    assert events[0]["id"] == "weekly_20171120T170000Z"
+    assert events[0]["recurringEventId"] == "weekly"
+    assert events[0]["end"]["dateTime"] == "2017-11-20T10:00:00-08:00"
+    assert "recurrence" not in events[0]
+
+
+def test_clipped_to_window():
+    # a series started long ago, and one running into the window's first day
+    rules = ["RRULE:FREQ=DAILY"]
+    old = master(rules, "2016-01-01T23:30:00-08:00", "2016-01-02T00:30:00-08:00")
+    events = list(recurrence.expand_items([old], *window(end="2017-11-22T00:00:00-08:00")))
+    assert starts(events) == ["2017-11-19T23:30:00-08:00", "2017-11-20T23:30:00-08:00",
+                              "2017-11-21T23:30:00-08:00"]
+
+
+def test_overrides_and_cancelled():
+    rules = ["RRULE:FREQ=DAILY;COUNT=4"]
+    moved = single("weekly_20171121T170000Z", "2017-11-21T13:00:00-08:00",
+                   "2017-11-21T14:00:00-08:00")
+    moved["recurringEventId"] = "weekly"
+    moved["originalStartTime"] = {"dateTime": "2017-11-21T09:00:00-08:00"}
+    cancelled = {"id": "weekly_20171122T170000Z", "status": "cancelled",
+                 "recurringEventId": "weekly",
+                 "originalStartTime": {"dateTime": "2017-11-22T17:00:00Z"}}
+    # an override may come before its master in the listing
+    events = list(recurrence.expand_items([moved, cancelled, master(rules)], *window()))
+    assert starts(events) == ["2017-11-20T09:00:00-08:00", "2017-11-21T13:00:00-08:00",
+                              "2017-11-23T09:00:00-08:00"]
+
+
+def test_merged_in_order():
+    rules = ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20171231T000000Z"]
+    items = [single("late", "2017-11-24T15:00:00-08:00", "2017-11-24T16:00:00-08:00"),
+             master(rules),
+             single("early", "2017-11-20T08:00:00-08:00", "2017-11-20T08:30:00-08:00"),
+             {"id": "gone", "status": "cancelled"}]
+    events = list(recurrence.expand_items(items, *window()))
+    assert [event["id"] for event in events] == [
+        "early", "weekly_20171120T170000Z", "weekly_20171122T170000Z", "late"]
+
+
+def test_wall_clock_across_dst():
+    # 9am Pacific stays 9am after daylight saving time ends (November 5, 2017)
+    rules = ["RRULE:FREQ=WEEKLY"]
+    summer = master(rules, "2017-10-30T09:00:00-07:00", "2017-10-30T10:00:00-07:00")
+    events = list(recurrence.expand_items([summer], *window()))
+    assert starts(events) == ["2017-11-20T09:00:00-08:00"]
+
+
+def test_all_day_and_bad_rules_skipped():
+    all_day = {"id": "holiday", "status": "confirmed", "recurrence": ["RRULE:FREQ=YEARLY"],
+               "start": {"date": "2017-11-23"}, "end": {"date": "2017-11-24"}}
+    broken = master(["RRULE:FREQ=SOMETIMES"])
+    assert list(recurrence.expand_items([all_day, broken], *window())) == []
@@ -0,0 +1,53 @@
+"""
+Nose tests for the server-side result stores
+"""
+import sys
+sys.path.append("..")
+import os
+import tempfile
+
+from result_store import MemoryStore, SQLiteStore, make_store
+
+
+def check_store(store):
+    key = store.put([[{"id": "a"}]])
+    assert store.get(key) == [[{"id": "a"}]]
+    assert store.get("nope") is None
+    assert store.get(None) is None
+    assert store.put([1], key) == key
+    assert store.get(key) == [1]
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+
+
+def check_lru(store):
+    first = store.put(1)
+    second = store.put(2)
+    store.get(first)
+    store.put(3)  # pushes out second, the least recently used
+    assert store.get(second) is None
+    assert store.get(first) == 1
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["entries"] == 2
+
+
+def test_memory_store():
+    check_store(MemoryStore())
+    check_lru(MemoryStore(max_entries=2))
+
+
+def test_sqlite_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_store(SQLiteStore(os.path.join(tmp, "a.db")))
+        store = SQLiteStore(os.path.join(tmp, "b.db"), max_entries=2)
+        check_lru(store)
+        # a second process sees the same results
+        other = make_store("sqlite:" + os.path.join(tmp, "b.db"), 3600, 2)
+        assert other.stats()["entries"] == 2
+
+
+def test_ttl():
+    store = MemoryStore(ttl=-1)
+    key = store.put("old")
+    assert store.get(key) is None
+    assert store.stats()["evictions"] == 1
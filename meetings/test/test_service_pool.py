@@ -0,0 +1,66 @@
+"""
+Nose tests for the discovery document cache and the service pool
+"""
+import sys
+sys.path.append("..")
+import json
+import os
+import tempfile
+
+import service_pool
+
+
+class Credentials:
+    def __init__(self, token):
+        self.access_token = token
+
+
+def test_reuse_per_token():
+    built = []
+
+    def build(credentials):
+        built.append(credentials.access_token)
+        return object()
+
+    pool = service_pool.ServicePool(build)
+    with pool.service(Credentials("a")) as first:
+        # busy services are never handed out twice
+        with pool.service(Credentials("a")) as second:
+            assert first is not second
+    with pool.service(Credentials("a")) as again:
+        assert again is first or again is second
+    with pool.service(Credentials("b")):
+        pass
+    assert built == ["a", "a", "b"]
+    assert pool.stats()["reused"] == 1
+
+
+def test_idle_eviction():
+    pool = service_pool.ServicePool(lambda c: object(), max_idle=1, idle_timeout=300)
+    with pool.service(Credentials("a")):
+        with pool.service(Credentials("b")):
+            pass
+    assert pool.stats()["idle"] == 1
+    assert pool.stats()["evicted"] == 1
+    pool.idle_timeout = -1
+    pool.acquire(Credentials("c"))
+    assert pool.stats()["idle"] == 0
+
+
+def test_discovery_from_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calendar.json")
+        with open(path, "w") as f:
+            json.dump({"name": "calendar", "version": "v3"}, f)
+        assert service_pool.load_discovery(path)["version"] == "v3"
+
+
+def test_discovery_root():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calendar.json")
+        with open(path, "w") as f:
+            json.dump({"rootUrl": "https://www.googleapis.com/",
+                       "servicePath": "calendar/v3/"}, f)
+        doc = service_pool.load_discovery(path, root="http://127.0.0.1:8089/")
+        assert doc["rootUrl"] == "http://127.0.0.1:8089/"
+        assert doc["baseUrl"] == "http://127.0.0.1:8089/calendar/v3/"
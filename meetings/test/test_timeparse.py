@@ -0,0 +1,44 @@
+"""
+Nose tests for the timestamp parser
+"""
+import sys
+sys.path.append("..")
+import datetime
+
+import timeparse
+
+
+def reference(text):
+    return int(datetime.datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp())
+
+
+def test_parse_matches_fromisoformat():
+    for text in ["2017-11-16T09:30:00-08:00",
+                 "2017-11-16T17:30:00Z",
+                 "2017-11-16T23:59:59+05:30",
+                 "2017-03-12T02:30:00-07:00",
+                 "1999-12-31T23:00:00-01:00"]:
+        assert timeparse.parse(text) == reference(text), text
+
+
+def test_split_keeps_offset():
+    assert timeparse.split("2017-11-16T09:30:00-08:00") == (1510853400, -8 * 3600)
+    # fractions of a second are dropped
+    assert timeparse.split("2017-11-16T09:30:00.250-08:00") == (1510853400, -8 * 3600)
+    assert timeparse.split("2017-11-16T17:30:00Z") == (1510853400, 0)
+
+
+def test_other_layouts_fall_back():
+    assert timeparse.parse("2017-11-16") == timeparse.day_seconds("2017-11-16")
+    assert timeparse.parse("2017-11-16T09:30-08:00") == 1510853400
+
+
+def test_local_frame():
+    epoch, offset = timeparse.split("2017-11-16T09:30:00-08:00")
+    minutes = timeparse.local_minutes(epoch, offset)
+    assert minutes % (24 * 60) == 9 * 60 + 30
+    # the same instant written in UTC lands on the same local minute
+    assert timeparse.local_minutes(timeparse.parse("2017-11-16T17:30:00Z"), offset) == minutes
+    assert timeparse.format_local(epoch, offset) == "2017-11-16T09:30:00-08:00"
+    assert timeparse.offset_text(offset) == "-08:00"
+    assert timeparse.offset_text(19800) == "+05:30"
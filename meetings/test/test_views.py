@@ -0,0 +1,89 @@
+"""
+Nose tests for free time views built in the background
+"""
+import sys
+sys.path.append("..")
+import threading
+
+import views
+
+
+def test_refresh_then_get():
+    built = []
+    materializer = views.ViewMaterializer(lambda key, source: source * 2,
+                                          on_built=built.append, background=False)
+    materializer.refresh("k", 21, fetched=100.0)
+    materializer.work(materializer.queue.get_nowait())
+    view = materializer.get("k")
+    assert view.value == 42 and view.fetched == 100.0
+    assert len(built) == 1
+    assert materializer.get("other") is None
+    stats = materializer.stats()
+    assert (stats["hits"], stats["misses"], stats["built"], stats["views"]) == (1, 1, 1, 1)
+
+
+def test_refresh_drops_old_view_and_dedupes():
+    materializer = views.ViewMaterializer(lambda key, source: source, background=False)
+    materializer.views["k"] = views.View("old", 0, 0)
+    materializer.generations["k"] = 1
+    materializer.refresh("k", "newer")
+    materializer.refresh("k", "newest")
+    assert materializer.get("k") is None
+    assert materializer.stats()["queued"] == 1
+    materializer.work(materializer.queue.get_nowait())
+    assert materializer.get("k").value == "newest"
+
+
+def test_want_leaves_kept_views():
+    materializer = views.ViewMaterializer(lambda key, source: source, background=False)
+    materializer.refresh("k", 1)
+    materializer.work(materializer.queue.get_nowait())
+    materializer.want("k", 2)
+    assert materializer.get("k").value == 1
+    assert materializer.stats()["queued"] == 0
+
+
+def test_invalidated_while_building():
+    materializer = views.ViewMaterializer(None, background=False)
+
+    def build(key, source):
+        # the user's rules change while the view is being built
+        materializer.invalidate(lambda key: key[0] == "ann")
+        return source
+    materializer.build = build
+    materializer.refresh(("ann", "cal"), "events")
+    materializer.work(materializer.queue.get_nowait())
+    assert materializer.get(("ann", "cal")) is None
+    assert materializer.generations == {}
+
+
+def test_bounded():
+    materializer = views.ViewMaterializer(lambda key, source: source, max_views=2, max_queue=1,
+                                          background=False)
+    assert materializer.refresh("a", 1)
+    assert not materializer.refresh("b", 2)
+    assert materializer.stats()["dropped"] == 1
+    for key in "abc":
+        materializer.refresh(key, key)
+        materializer.work(materializer.queue.get_nowait())
+    assert materializer.get("a") is None
+    assert materializer.stats()["evictions"] == 1
+
+
+def test_failures_counted():
+    def build(key, source):
+        raise RuntimeError("no")
+    materializer = views.ViewMaterializer(build, background=False)
+    materializer.refresh("k", 1)
+    materializer.work(materializer.queue.get_nowait())
+    assert materializer.get("k") is None
+    assert materializer.stats()["failed"] == 1
+
+
+def test_background_thread():
+    done = threading.Event()
+    materializer = views.ViewMaterializer(lambda key, source: source,
+                                          on_built=lambda seconds: done.set())
+    materializer.refresh("k", "v")
+    assert done.wait(5)
+    assert materializer.get("k").value == "v"
@@ -0,0 +1,101 @@
+"""
+Timestamps, parsed once.
+
+Google sends times as RFC 3339 text: "2017-11-16T09:30:00-08:00",
+"2017-11-17T01:30:00Z", sometimes with fractions of a second. They are
+parsed once, when events come in, into UTC epoch seconds (plus the utc
+offset they were written in, for display), and everything after that
+works on ints; strings come back only when a page is rendered.
+
+The parser slices the fixed layout directly. The days since 1970 of each
+date and the seconds of each utc offset are cached, since the events of
+a calendar share a handful of each. Anything not in that layout goes to
+datetime.fromisoformat.
+
+The daily windows are worked out in a local frame: minutes of wall
+clock time since 1970 (the "epoch minutes" of the Agenda code). Each
+time goes onto the wall clock of its own date, at the utc offset it was
+written in or the user's zone has then, so a range across a daylight
+saving change keeps its hours on both sides.
+"""
+import datetime
+import functools
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+DAY_SECONDS = 24 * 60 * 60
+
+
+@functools.lru_cache(maxsize=4096)
+def day_seconds(date):
+    """"2017-11-16" -> UTC epoch seconds of that day's midnight"""
+    day = datetime.date(int(date[0:4]), int(date[5:7]), int(date[8:10]))
+    return (day.toordinal() - EPOCH_ORDINAL) * DAY_SECONDS
+
+
+@functools.lru_cache(maxsize=256)
+def offset_seconds(suffix):
+    """"-08:00" (or "+0530", "Z", "") -> seconds east of UTC"""
+    if suffix in ("", "Z", "z"):
+        return 0
+    digits = suffix[1:].replace(":", "")
+    if suffix[0] not in "+-" or len(digits) != 4 or not digits.isdigit():
+        raise ValueError("Bad utc offset {!r}".format(suffix))
+    seconds = int(digits[0:2]) * 3600 + int(digits[2:4]) * 60
+    return -seconds if suffix[0] == "-" else seconds
+
+
+def split(text):
+    """RFC 3339 text -> (UTC epoch seconds, utc offset in seconds)"""
+    if len(text) >= 19 and text[10] in "Tt " and text[13] == ":" and text[16] == ":":
+        tail = text[19:]
+        if tail.startswith("."):
+            # fractions of a second; we only keep whole seconds
+            digits = 1
+            while digits < len(tail) and tail[digits].isdigit():
+                digits += 1
+            tail = tail[digits:]
+        try:
+            offset = offset_seconds(tail)
+            local = (day_seconds(text[:10]) + int(text[11:13]) * 3600 +
+                     int(text[14:16]) * 60 + int(text[17:19]))
+            return local - offset, offset
+        except ValueError:
+            pass
+    moment = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp()), int(moment.utcoffset().total_seconds())
+
+
+def parse(text):
+    """RFC 3339 text -> UTC epoch seconds"""
+    return split(text)[0]
+
+
+def local_minutes(epoch, offset):
+    """UTC epoch seconds -> epoch minutes of the wall clock at offset"""
+    return (epoch + offset) // 60
+
+
+def zone_offset(epoch, tzinfo):
+    """UTC epoch seconds -> the utc offset (seconds) of tzinfo's clock then"""
+    moment = datetime.datetime.fromtimestamp(epoch, tzinfo)
+    return int(moment.utcoffset().total_seconds())
+
+
+@functools.lru_cache(maxsize=256)
+def zone(offset):
+    """A tzinfo for a fixed utc offset in seconds"""
+    return datetime.timezone(datetime.timedelta(seconds=offset))
+
+
+def offset_text(offset):
+    """seconds east of UTC -> "-08:00" """
+    sign = "-" if offset < 0 else "+"
+    minutes = abs(offset) // 60
+    return "{}{:02d}:{:02d}".format(sign, minutes // 60, minutes % 60)
+
+
+def format_local(epoch, offset):
+    """UTC epoch seconds -> "2017-11-16T09:30:00-08:00" on the clock at offset"""
+    return datetime.datetime.fromtimestamp(epoch, zone(offset)).isoformat()
@@ -0,0 +1,173 @@
+"""
+Free time views, worked out ahead of time.
+
+A user tends to look at the same view (their calendars, "the next two
+weeks, 8am to 5pm") over and over. A ViewMaterializer keeps the finished
+listing of each such view, keyed by (user, calendars, start, end) where
+start and end carry the daily window too, and builds it on a background
+thread whenever what it is built from changes: when /_select stores newly
+fetched events, or the user's rules change. A request then only looks
+the view up; on a miss it works the listing out itself, as before.
+
+Refreshes wait in a bounded queue. When it is full a refresh is dropped
+(and counted); the next miss asks again. A view whose refresh is queued
+is gone until the refresh is done, so nothing out of date is served.
+stats() gives the counters and queue depth; each View carries the time
+its events were fetched, so callers can tell how old what they serve is.
+"""
+import collections
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# value: the listing; built: when it was worked out; fetched: when the
+# events behind it were fetched (time.time() both)
+View = collections.namedtuple("View", "value built fetched")
+
+
+class ViewMaterializer:
+    """Finished views, kept up to date by one background thread."""
+
+    def __init__(self, build, max_views=256, max_queue=64, on_built=None, background=True):
+        """
+        Args:
+            build: build(key, source) -> the view's value, or None if it
+                can't be built (e.g. the events are gone); runs on the
+                background thread
+            max_views: most views kept; the least recently used go first
+            max_queue: most refreshes waiting
+            on_built: on_built(seconds) after each view is built, the
+                time from asking for it to having it
+            background: False to leave the queue to whoever calls work()
+        """
+        self.build = build
+        self.max_views = max_views
+        self.on_built = on_built
+        self.views = collections.OrderedDict()  # key -> View
+        self.generations = {}  # key -> count of refreshes asked for
+        self.pending = {}  # key -> (source, fetched, asked) of its queued refresh
+        self.building = set()
+        self.queue = queue.Queue(max_queue)
+        self.lock = threading.Lock()
+        self.background = background
+        self.thread = None
+        self.hits = 0
+        self.misses = 0
+        self.built = 0
+        self.dropped = 0
+        self.failed = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """The View for key, or None if there is none yet"""
+        with self.lock:
+            view = self.views.get(key)
+            if view is None:
+                self.misses += 1
+            else:
+                self.views.move_to_end(key)
+                self.hits += 1
+            return view
+
+    def refresh(self, key, source, fetched=None):
+        """
+        Build key's view again in the background, from source (passed on
+        to build), whose events were fetched at time fetched (default now).
+        The old view is dropped right away; a refresh already waiting
+        for key just takes the newer source.
+        Returns False if the queue was full and the refresh was dropped.
+        """
+        with self.lock:
+            self.views.pop(key, None)
+            self.generations[key] = self.generations.get(key, 0) + 1
+            waiting = key in self.pending
+            self.pending[key] = (source, fetched or time.time(), time.time())
+            self._start()
+        if waiting:
+            return True
+        try:
+            self.queue.put_nowait(key)
+        except queue.Full:
+            with self.lock:
+                del self.pending[key]
+                self.dropped += 1
+            return False
+        return True
+
+    def want(self, key, source, fetched=None):
+        """refresh, unless key's view is kept, waiting or being built already"""
+        with self.lock:
+            if key in self.views or key in self.pending or key in self.building:
+                return True
+        return self.refresh(key, source, fetched)
+
+    def invalidate(self, match):
+        """
+        Drop the views whose key match(key) is true, e.g. all of one
+        user's, and throw away any of them being built right now
+        """
+        with self.lock:
+            for key in [key for key in self.generations if match(key)]:
+                self.views.pop(key, None)
+                if key in self.pending or key in self.building:
+                    self.generations[key] += 1
+                else:
+                    del self.generations[key]
+
+    def stats(self):
+        """Counters, views kept and refreshes waiting, as a dict"""
+        with self.lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "built": self.built,
+                    "dropped": self.dropped,
+                    "failed": self.failed,
+                    "evictions": self.evictions,
+                    "views": len(self.views),
+                    "queued": self.queue.qsize()}
+
+    def _start(self):
+        """Start the background thread, if it isn't running (lock held)"""
+        if self.background and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="views", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            self.work(self.queue.get())
+
+    def work(self, key):
+        """Build one queued view and keep it, unless it was refreshed or dropped meanwhile"""
+        with self.lock:
+            source, fetched, asked = self.pending.pop(key)
+            generation = self.generations.get(key)
+            self.building.add(key)
+        try:
+            value = self.build(key, source)
+        except Exception:
+            log.exception("Building view %s failed", key)
+            value = None
+            with self.lock:
+                self.failed += 1
+        with self.lock:
+            self.building.discard(key)
+            if self.generations.get(key) != generation:
+                # refreshed or invalidated meanwhile
+                if key not in self.pending:
+                    self.generations.pop(key, None)
+                return
+            if value is None:
+                self.generations.pop(key, None)
+                return
+            self.views[key] = View(value, time.time(), fetched)
+            self.views.move_to_end(key)
+            self.built += 1
+            while len(self.views) > self.max_views:
+                old, view = self.views.popitem(last=False)
+                self.generations.pop(old, None)
+                self.evictions += 1
+        if self.on_built is not None:
+            self.on_built(time.time() - asked)